@@ -9,6 +9,7 @@ import pandas as pd
 from rbac import Role, Resource, Permission, has_permission
 from datetime import datetime, timedelta
 from config import DATA_WAREHOUSE_CONN_STRING
+from async_warehouse import gather_records
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
@@ -197,8 +198,8 @@ def get_fex_analytics():
             AVG(CASE WHEN fg.exam_status = 'FEX' THEN fg.grade ELSE NULL END) as avg_fex_score,
             {select_cols}
         FROM fact_grade fg
-        JOIN dim_student ds ON fg.student_id = ds.student_id
-        JOIN dim_course dc ON fg.course_code = dc.course_code
+        JOIN dim_student ds ON fg.student_key = ds.student_key
+        JOIN dim_course dc ON fg.course_key = dc.course_key
         LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
         LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
         LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
@@ -303,7 +304,7 @@ def get_high_school_analytics():
             COUNT(DISTINCT CASE WHEN ds.status = 'Active' THEN ds.student_id END) as active_students,
             COUNT(DISTINCT CASE WHEN ds.status = 'Graduated' THEN ds.student_id END) as graduated_students,
             COUNT(DISTINCT CASE WHEN ds.status = 'Withdrawn' THEN ds.student_id END) as withdrawn_students,
-            COUNT(DISTINCT fe.student_id) as enrolled_students,
+            COUNT(DISTINCT fe.student_key) as enrolled_students,
             COUNT(DISTINCT dp.program_id) as programs_enrolled,
             -- Performance metrics
             AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade,
@@ -321,7 +322,7 @@ def get_high_school_analytics():
             COALESCE(SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END), 0) as total_paid,
             COALESCE(SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END), 0) as total_pending,
             COALESCE(SUM(fp.amount), 0) as total_required,
-            COUNT(DISTINCT CASE WHEN fp.status = 'Pending' AND fp.amount > 500000 THEN fp.student_id END) as students_with_significant_balance,
+            COUNT(DISTINCT CASE WHEN fp.status = 'Pending' AND fp.amount > 500000 THEN fp.student_key END) as students_with_significant_balance,
             CASE 
                 WHEN COALESCE(SUM(fp.amount), 0) > 0 
                 THEN COALESCE(SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END), 0) / COALESCE(SUM(fp.amount), 1) * 100
@@ -334,10 +335,10 @@ def get_high_school_analytics():
             COUNT(CASE WHEN fg.absence_reason LIKE '%Tuition%' OR fg.absence_reason LIKE '%Financial%' THEN 1 END) as tuition_related_missed_exams,
             COUNT(CASE WHEN fp.status = 'Pending' AND fg.exam_status = 'MEX' THEN 1 END) as missed_exams_with_pending_fees
         FROM dim_student ds
-        LEFT JOIN fact_enrollment fe ON ds.student_id = fe.student_id
-        LEFT JOIN fact_grade fg ON ds.student_id = fg.student_id
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
+        LEFT JOIN fact_enrollment fe ON ds.student_key = fe.student_key
+        LEFT JOIN fact_grade fg ON ds.student_key = fg.student_key
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+        LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
         LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
         LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
         LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
@@ -552,12 +553,11 @@ def get_high_school_analytics():
 
 @analytics_bp.route('/filter-options', methods=['GET'])
 @jwt_required()
-def get_filter_options():
+async def get_filter_options():
     """Get available filter options based on user role with cascading support"""
     try:
         claims = get_jwt()
         user_scope = get_user_scope(claims)
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
         
         # Get filter parameters for cascading
         faculty_id = request.args.get('faculty_id', type=int)
@@ -565,6 +565,7 @@ def get_filter_options():
         program_id = request.args.get('program_id', type=int)
         
         options = {}
+        queries = {}
         role = user_scope['role']
         
         # Get faculties - role-based access
@@ -579,8 +580,7 @@ def get_filter_options():
                 JOIN dim_faculty f ON d.faculty_id = f.faculty_id
                 WHERE d.department_id = :dept_id
             """
-            faculties = pd.read_sql_query(text(faculty_query), engine, params={'dept_id': user_scope['department_id']})
-            options['faculties'] = faculties.to_dict('records')
+            queries['faculties'] = (faculty_query, {'dept_id': user_scope['department_id']})
         elif role == Role.DEAN and user_scope.get('faculty_id'):
             # Dean sees only their faculty
             faculty_query = """
@@ -588,13 +588,11 @@ def get_filter_options():
                 FROM dim_faculty
                 WHERE faculty_id = :fac_id
             """
-            faculties = pd.read_sql_query(text(faculty_query), engine, params={'fac_id': user_scope['faculty_id']})
-            options['faculties'] = faculties.to_dict('records')
+            queries['faculties'] = (faculty_query, {'fac_id': user_scope['faculty_id']})
         else:
             # Staff, Senate, Analyst, Finance, HR, SYSADMIN - see all faculties
             faculty_query = "SELECT DISTINCT faculty_id, faculty_name FROM dim_faculty ORDER BY faculty_name"
-            faculties = pd.read_sql_query(text(faculty_query), engine)
-            options['faculties'] = faculties.to_dict('records')
+            queries['faculties'] = faculty_query
         
         # Get departments - filtered by faculty if provided, with role-based scoping
         dept_query = """
@@ -626,8 +624,7 @@ def get_filter_options():
         dept_query += " ORDER BY d.department_name"
         
         if role != Role.STUDENT:
-            departments = pd.read_sql_query(text(dept_query), engine)
-            options['departments'] = departments.to_dict('records')
+            queries['departments'] = dept_query
         else:
             options['departments'] = []
         
@@ -657,8 +654,7 @@ def get_filter_options():
                     JOIN dim_student ds ON p.program_id = ds.program_id
                     WHERE ds.student_id = :student_id
                 """
-                programs = pd.read_sql_query(text(student_prog_query), engine, params={'student_id': user_scope['student_id']})
-                options['programs'] = programs.to_dict('records')
+                queries['programs'] = (student_prog_query, {'student_id': user_scope['student_id']})
             else:
                 options['programs'] = []
         
@@ -673,8 +669,7 @@ def get_filter_options():
                 prog_query += " WHERE " + " AND ".join(prog_where)
             prog_query += " ORDER BY p.program_name"
             
-            programs = pd.read_sql_query(text(prog_query), engine)
-            options['programs'] = programs.to_dict('records')
+            queries['programs'] = prog_query
         
         # Get courses - filtered by department if provided, or by faculty if department not provided
         # Role-based scoping for courses
@@ -683,14 +678,13 @@ def get_filter_options():
             course_query = """
                 SELECT DISTINCT c.course_code, c.course_name
                 FROM dim_course c
-                JOIN fact_enrollment fe ON c.course_code = fe.course_code
-                JOIN dim_student ds ON fe.student_id = ds.student_id
+                JOIN fact_enrollment fe ON c.course_key = fe.course_key
+                JOIN dim_student ds ON fe.student_key = ds.student_key
                 WHERE ds.student_id = :student_id
                 ORDER BY c.course_code
             """
             if user_scope.get('student_id'):
-                courses = pd.read_sql_query(text(course_query), engine, params={'student_id': user_scope['student_id']})
-                options['courses'] = courses.to_dict('records')
+                queries['courses'] = (course_query, {'student_id': user_scope['student_id']})
             else:
                 options['courses'] = []
         elif role == Role.STAFF:
@@ -703,7 +697,7 @@ def get_filter_options():
                     WHERE c.department = (SELECT department_name FROM dim_department WHERE department_id = :dept_id)
                     ORDER BY c.course_code
                 """
-                courses = pd.read_sql_query(text(course_query), engine, params={'dept_id': department_id})
+                queries['courses'] = (course_query, {'dept_id': department_id})
             elif faculty_id:
                 course_query = """
                     SELECT DISTINCT c.course_code, c.course_name
@@ -712,11 +706,10 @@ def get_filter_options():
                     WHERE d.faculty_id = :fac_id
                     ORDER BY c.course_code
                 """
-                courses = pd.read_sql_query(text(course_query), engine, params={'fac_id': faculty_id})
+                queries['courses'] = (course_query, {'fac_id': faculty_id})
             else:
                 course_query = "SELECT DISTINCT course_code, course_name FROM dim_course ORDER BY course_code"
-                courses = pd.read_sql_query(text(course_query), engine)
-            options['courses'] = courses.to_dict('records')
+                queries['courses'] = course_query
         else:
             # Other roles (Dean, HOD, Senate, Analyst, Finance, HR) - filtered by selection
             if department_id:
@@ -726,7 +719,7 @@ def get_filter_options():
                     WHERE c.department = (SELECT department_name FROM dim_department WHERE department_id = :dept_id)
                     ORDER BY c.course_code
                 """
-                courses = pd.read_sql_query(text(course_query), engine, params={'dept_id': department_id})
+                queries['courses'] = (course_query, {'dept_id': department_id})
             elif faculty_id:
                 course_query = """
                     SELECT DISTINCT c.course_code, c.course_name
@@ -735,7 +728,7 @@ def get_filter_options():
                     WHERE d.faculty_id = :fac_id
                     ORDER BY c.course_code
                 """
-                courses = pd.read_sql_query(text(course_query), engine, params={'fac_id': faculty_id})
+                queries['courses'] = (course_query, {'fac_id': faculty_id})
             else:
                 # Apply role-based scoping if no filters
                 if role == Role.HOD and user_scope.get('department_id'):
@@ -745,7 +738,7 @@ def get_filter_options():
                         WHERE c.department = (SELECT department_name FROM dim_department WHERE department_id = :dept_id)
                         ORDER BY c.course_code
                     """
-                    courses = pd.read_sql_query(text(course_query), engine, params={'dept_id': user_scope['department_id']})
+                    queries['courses'] = (course_query, {'dept_id': user_scope['department_id']})
                 elif role == Role.DEAN and user_scope.get('faculty_id'):
                     course_query = """
                         SELECT DISTINCT c.course_code, c.course_name
@@ -754,18 +747,13 @@ def get_filter_options():
                         WHERE d.faculty_id = :fac_id
                         ORDER BY c.course_code
                     """
-                    courses = pd.read_sql_query(text(course_query), engine, params={'fac_id': user_scope['faculty_id']})
+                    queries['courses'] = (course_query, {'fac_id': user_scope['faculty_id']})
                 else:
                     course_query = "SELECT DISTINCT course_code, course_name FROM dim_course ORDER BY course_code"
-                    courses = pd.read_sql_query(text(course_query), engine)
-            options['courses'] = courses.to_dict('records')
+                    queries['courses'] = course_query
         
         # Get semesters
-        semesters = pd.read_sql_query(
-            "SELECT semester_id, semester_name FROM dim_semester ORDER BY semester_id",
-            engine
-        )
-        options['semesters'] = semesters.to_dict('records')
+        queries['semesters'] = "SELECT semester_id, semester_name FROM dim_semester ORDER BY semester_id"
         
         # Get high schools - role-based scoping
         if role == Role.STUDENT:
@@ -785,8 +773,7 @@ def get_filter_options():
                     JOIN dim_department d ON p.department_id = d.department_id
                     WHERE ds.high_school IS NOT NULL AND d.faculty_id = :fac_id
                 """
-                high_schools = pd.read_sql_query(text(high_school_query), engine, params={'fac_id': user_scope['faculty_id']})
-                options['high_schools'] = high_schools.to_dict('records')
+                queries['high_schools'] = (high_school_query, {'fac_id': user_scope['faculty_id']})
             elif role == Role.HOD and user_scope.get('department_id') and not department_id:
                 high_school_query = """
                     SELECT DISTINCT ds.high_school, ds.high_school_district
@@ -794,12 +781,10 @@ def get_filter_options():
                     JOIN dim_program p ON ds.program_id = p.program_id
                     WHERE ds.high_school IS NOT NULL AND p.department_id = :dept_id
                 """
-                high_schools = pd.read_sql_query(text(high_school_query), engine, params={'dept_id': user_scope['department_id']})
-                options['high_schools'] = high_schools.to_dict('records')
+                queries['high_schools'] = (high_school_query, {'dept_id': user_scope['department_id']})
             else:
                 high_school_query += " ORDER BY high_school"
-                high_schools = pd.read_sql_query(text(high_school_query), engine)
-                options['high_schools'] = high_schools.to_dict('records')
+                queries['high_schools'] = high_school_query
         
         # Get intake years - role-based scoping
         if role == Role.STUDENT:
@@ -810,8 +795,7 @@ def get_filter_options():
                     FROM dim_student 
                     WHERE student_id = :student_id AND admission_date IS NOT NULL
                 """
-                intake_years = pd.read_sql_query(text(intake_query), engine, params={'student_id': user_scope['student_id']})
-                options['intake_years'] = intake_years['year'].tolist() if not intake_years.empty else []
+                queries['intake_years'] = (intake_query, {'student_id': user_scope['student_id']})
             else:
                 options['intake_years'] = []
         else:
@@ -826,8 +810,7 @@ def get_filter_options():
                     JOIN dim_department d ON p.department_id = d.department_id
                     WHERE ds.admission_date IS NOT NULL AND d.faculty_id = :fac_id
                 """
-                intake_years = pd.read_sql_query(text(intake_query), engine, params={'fac_id': user_scope['faculty_id']})
-                options['intake_years'] = intake_years['year'].tolist() if not intake_years.empty else []
+                queries['intake_years'] = (intake_query, {'fac_id': user_scope['faculty_id']})
             elif role == Role.HOD and user_scope.get('department_id') and not department_id:
                 intake_query = """
                     SELECT DISTINCT YEAR(ds.admission_date) as year
@@ -835,14 +818,16 @@ def get_filter_options():
                     JOIN dim_program p ON ds.program_id = p.program_id
                     WHERE ds.admission_date IS NOT NULL AND p.department_id = :dept_id
                 """
-                intake_years = pd.read_sql_query(text(intake_query), engine, params={'dept_id': user_scope['department_id']})
-                options['intake_years'] = intake_years['year'].tolist() if not intake_years.empty else []
+                queries['intake_years'] = (intake_query, {'dept_id': user_scope['department_id']})
             else:
                 intake_query += " ORDER BY year DESC"
-                intake_years = pd.read_sql_query(text(intake_query), engine)
-                options['intake_years'] = intake_years['year'].tolist() if not intake_years.empty else []
+                queries['intake_years'] = intake_query
         
-        engine.dispose()
+        # The option lists are independent; fetch them concurrently
+        for key, records in (await gather_records(queries)).items():
+            if isinstance(records, Exception):
+                raise records
+            options[key] = [r['year'] for r in records] if key == 'intake_years' else records
         
         return jsonify(options), 200
         
@@ -893,7 +878,7 @@ def get_student_analytics():
             ddept.department_name,
             df.faculty_name,
             -- Academic stats
-            COUNT(DISTINCT fe.course_code) as total_courses,
+            COUNT(DISTINCT fe.course_key) as total_courses,
             COUNT(DISTINCT fg.grade_id) as total_grades,
             AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade,
             COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as failed_exams,
@@ -910,10 +895,10 @@ def get_student_analytics():
         LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
         LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
         LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
-        LEFT JOIN fact_enrollment fe ON ds.student_id = fe.student_id
-        LEFT JOIN fact_grade fg ON ds.student_id = fg.student_id
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
+        LEFT JOIN fact_enrollment fe ON ds.student_key = fe.student_key
+        LEFT JOIN fact_grade fg ON ds.student_key = fg.student_key
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+        LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
         {where_clause}
         GROUP BY ds.student_id, ds.access_number, ds.reg_no, ds.first_name, ds.last_name,
                  ds.gender, ds.nationality, ds.high_school, ds.year_of_study, ds.status,
@@ -934,7 +919,7 @@ def get_student_analytics():
             letter_grade,
             COUNT(*) as count
         FROM fact_grade fg
-        JOIN dim_student ds ON fg.student_id = ds.student_id
+        JOIN dim_student ds ON fg.student_key = ds.student_key
         {where_clause}
         AND fg.exam_status = 'Completed'
         GROUP BY letter_grade
@@ -960,7 +945,7 @@ def get_student_analytics():
             CONCAT(dt.month_name, ' ', CAST(dt.year AS CHAR)) as period,
             AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade
         FROM fact_grade fg
-        JOIN dim_student ds ON fg.student_id = ds.student_id
+        JOIN dim_student ds ON fg.student_key = ds.student_key
         JOIN dim_time dt ON fg.date_key = dt.date_key
         {where_clause}
         GROUP BY dt.year, dt.month, dt.month_name
@@ -2,7 +2,7 @@
 Export API for Excel and PDF generation
 """
 from flask import Blueprint, request, jsonify, send_file
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from sqlalchemy import create_engine, text
 import pandas as pd
 import io
@@ -38,10 +38,116 @@ def get_user_scope(claims):
 
 export_bp = Blueprint('export', __name__, url_prefix='/api/export')
 
+EXPORT_TYPES = ('dashboard', 'fex')
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def build_excel_export(export_type):
+    """Build an Excel export in memory; returns (BytesIO, download name).
+    Shared by the request handler and the background job runner (jobs.py)."""
+    engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+    
+    # Build query based on export type
+    if export_type == 'dashboard':
+        # Export dashboard stats
+        query = """
+        SELECT 
+            'Total Students' as Metric,
+            COUNT(DISTINCT student_id) as Value
+        FROM dim_student
+        UNION ALL
+        SELECT 
+            'Total Courses' as Metric,
+            COUNT(*) as Value
+        FROM dim_course
+        UNION ALL
+        SELECT 
+            'Total Enrollments' as Metric,
+            COUNT(*) as Value
+        FROM fact_enrollment
+        UNION ALL
+        SELECT 
+            'Average Grade' as Metric,
+            ROUND(AVG(grade), 2) as Value
+        FROM fact_grade
+        WHERE exam_status = 'Completed'
+        """
+
+        df = pd.read_sql_query(text(query), engine)
+
+        # Create Excel in memory
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='Dashboard Stats', index=False)
+
+            # Add department breakdown
+            dept_query = """
+            SELECT 
+                dc.department,
+                COUNT(DISTINCT fe.student_key) as student_count
+            FROM fact_enrollment fe
+            JOIN dim_course dc ON fe.course_key = dc.course_key
+            GROUP BY dc.department
+            ORDER BY student_count DESC
+            """
+            dept_df = pd.read_sql_query(text(dept_query), engine)
+            dept_df.to_excel(writer, sheet_name='By Department', index=False)
+
+            # Add grade distribution
+            grade_query = """
+            SELECT 
+                letter_grade,
+                COUNT(*) as count
+            FROM fact_grade
+            GROUP BY letter_grade
+            ORDER BY letter_grade
+            """
+            grade_df = pd.read_sql_query(text(grade_query), engine)
+            grade_df.to_excel(writer, sheet_name='Grade Distribution', index=False)
+
+        output.seek(0)
+        engine.dispose()
+        return output, f'dashboard_export_{datetime.now().strftime("%Y%m%d")}.xlsx'
+
+    elif export_type == 'fex':
+        # Export FEX analytics
+        query = """
+        SELECT 
+            df.faculty_name,
+            dc.department,
+            dp.program_name,
+            dc.course_name,
+            COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as total_fex,
+            COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as total_mex,
+            COUNT(CASE WHEN fg.exam_status = 'FCW' THEN 1 END) as total_fcw,
+            COUNT(CASE WHEN fg.exam_status = 'Completed' THEN 1 END) as total_completed,
+            COUNT(*) as total_exams
+        FROM fact_grade fg
+        JOIN dim_student ds ON fg.student_key = ds.student_key
+        JOIN dim_course dc ON fg.course_key = dc.course_key
+        LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
+        LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
+        LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
+        GROUP BY df.faculty_name, dc.department, dp.program_name, dc.course_name
+        """
+
+        df = pd.read_sql_query(text(query), engine)
+
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='FEX Analytics', index=False)
+
+        output.seek(0)
+        engine.dispose()
+        return output, f'fex_analytics_{datetime.now().strftime("%Y%m%d")}.xlsx'
+
+    engine.dispose()
+    raise ValueError(f"Invalid export type: {export_type}")
+
 @export_bp.route('/excel', methods=['GET', 'POST'])
 @jwt_required()
 def export_excel():
-    """Export data to Excel format"""
+    """Export data to Excel format (pass async=true to run it as a background job)"""
     try:
         claims = get_jwt()
         user_scope = get_user_scope(claims)
@@ -50,119 +156,23 @@ def export_excel():
         if not has_permission(user_scope['role'], Resource.ANALYTICS, Permission.EXPORT, user_scope):
             return jsonify({'error': 'Permission denied'}), 403
         
-        filters = request.args.to_dict() if request.method == 'GET' else request.get_json().get('filters', {})
-        export_type = request.args.get('type', 'dashboard') if request.method == 'GET' else request.get_json().get('type', 'dashboard')
-        
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
-        
-        # Build query based on export type
-        if export_type == 'dashboard':
-            # Export dashboard stats
-            query = """
-            SELECT 
-                'Total Students' as Metric,
-                COUNT(DISTINCT student_id) as Value
-            FROM dim_student
-            UNION ALL
-            SELECT 
-                'Total Courses' as Metric,
-                COUNT(*) as Value
-            FROM dim_course
-            UNION ALL
-            SELECT 
-                'Total Enrollments' as Metric,
-                COUNT(*) as Value
-            FROM fact_enrollment
-            UNION ALL
-            SELECT 
-                'Average Grade' as Metric,
-                ROUND(AVG(grade), 2) as Value
-            FROM fact_grade
-            WHERE exam_status = 'Completed'
-            """
-            
-            df = pd.read_sql_query(text(query), engine)
-            
-            # Create Excel in memory
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Dashboard Stats', index=False)
-                
-                # Add department breakdown
-                dept_query = """
-                SELECT 
-                    dc.department,
-                    COUNT(DISTINCT fe.student_id) as student_count
-                FROM fact_enrollment fe
-                JOIN dim_course dc ON fe.course_code = dc.course_code
-                GROUP BY dc.department
-                ORDER BY student_count DESC
-                """
-                dept_df = pd.read_sql_query(text(dept_query), engine)
-                dept_df.to_excel(writer, sheet_name='By Department', index=False)
-                
-                # Add grade distribution
-                grade_query = """
-                SELECT 
-                    letter_grade,
-                    COUNT(*) as count
-                FROM fact_grade
-                GROUP BY letter_grade
-                ORDER BY letter_grade
-                """
-                grade_df = pd.read_sql_query(text(grade_query), engine)
-                grade_df.to_excel(writer, sheet_name='Grade Distribution', index=False)
-            
-            output.seek(0)
-            engine.dispose()
-            
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'dashboard_export_{datetime.now().strftime("%Y%m%d")}.xlsx'
-            )
+        params = request.args.to_dict() if request.method == 'GET' else (request.get_json() or {})
+        export_type = params.get('type', 'dashboard')
+        if export_type not in EXPORT_TYPES:
+            return jsonify({'error': 'Invalid export type'}), 400
         
-        elif export_type == 'fex':
-            # Export FEX analytics
-            query = """
-            SELECT 
-                df.faculty_name,
-                dc.department,
-                dp.program_name,
-                dc.course_name,
-                COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as total_fex,
-                COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as total_mex,
-                COUNT(CASE WHEN fg.exam_status = 'FCW' THEN 1 END) as total_fcw,
-                COUNT(CASE WHEN fg.exam_status = 'Completed' THEN 1 END) as total_completed,
-                COUNT(*) as total_exams
-            FROM fact_grade fg
-            JOIN dim_student ds ON fg.student_id = ds.student_id
-            JOIN dim_course dc ON fg.course_code = dc.course_code
-            LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
-            LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
-            LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
-            GROUP BY df.faculty_name, dc.department, dp.program_name, dc.course_name
-            """
-            
-            df = pd.read_sql_query(text(query), engine)
-            
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='FEX Analytics', index=False)
-            
-            output.seek(0)
-            engine.dispose()
-            
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'fex_analytics_{datetime.now().strftime("%Y%m%d")}.xlsx'
-            )
+        if str(params.get('async', '')).lower() in ('1', 'true', 'yes'):
+            from jobs import job_queue
+            job = job_queue.submit('excel_export', get_jwt_identity(), {'export_type': export_type})
+            return jsonify(job), 202
         
-        else:
-            return jsonify({'error': 'Invalid export type'}), 400
+        output, download_name = build_excel_export(export_type)
+        return send_file(
+            output,
+            mimetype=XLSX_MIMETYPE,
+            as_attachment=True,
+            download_name=download_name
+        )
             
     except Exception as e:
         import traceback
@@ -0,0 +1,81 @@
+"""
+Jobs API: status, progress and artifact download for background jobs (jobs.py)
+"""
+from flask import Blueprint, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from pathlib import Path
+import sys
+backend_dir = Path(__file__).parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from jobs import job_queue, public_job, SUCCEEDED
+from rbac import Role
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+def get_owned_job(job_id):
+    """The job if the caller submitted it (system admins see every job), else None"""
+    job = job_queue.get(job_id)
+    if not job:
+        return None
+    if job['owner'] != get_jwt_identity() and str(get_jwt().get('role', '')).lower() != Role.SYSADMIN.value:
+        return None
+    return job
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """Recent jobs submitted by the caller"""
+    try:
+        jobs = job_queue.store.list(owner=get_jwt_identity())
+        return jsonify({'jobs': [public_job(job) for job in jobs]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Job status and progress"""
+    try:
+        job = get_owned_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(public_job(job)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>/download', methods=['GET'])
+@jwt_required()
+def download_job_artifact(job_id):
+    """Download the report, export or prediction file produced by a finished job"""
+    try:
+        job = get_owned_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job['status'] != SUCCEEDED:
+            return jsonify({'error': f"Job is {job['status']}", 'job': public_job(job)}), 409
+        if not job['artifact_path'] or not Path(job['artifact_path']).exists():
+            return jsonify({'error': 'Job artifact has expired'}), 410
+        return send_file(
+            job['artifact_path'],
+            mimetype=job['mimetype'],
+            as_attachment=True,
+            download_name=job['download_name']
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_job(job_id):
+    """Cancel a job that is still queued"""
+    try:
+        job = get_owned_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if not job_queue.cancel(job_id):
+            return jsonify({'error': f"Job is {job['status']} and can no longer be cancelled"}), 409
+        return jsonify(job_queue.status(job_id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
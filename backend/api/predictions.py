@@ -2,7 +2,7 @@
 Prediction API with multiple ML models and scenario analysis
 """
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from sqlalchemy import create_engine, text
 import pandas as pd
 import numpy as np
@@ -15,27 +15,24 @@ if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
 from rbac import Role, Resource, Permission, has_permission
-from ml_models import MultiModelPredictor
+from predictor_service import predictor_service
+from model_registry import model_registry
+from prediction_cache import prediction_cache
 try:
-    from enhanced_predictions import EnhancedPredictor
-    enhanced_predictor = EnhancedPredictor()
-    try:
-        enhanced_predictor.load_all_models()
-    except:
-        print("Enhanced models not loaded. Train models first.")
+    from enhanced_predictions import enrollment_series_cache, load_tuition_attendance_features
 except ImportError:
-    enhanced_predictor = None
-    print("Enhanced predictions module not available")
+    enrollment_series_cache = None
+    load_tuition_attendance_features = None
 from config import DATA_WAREHOUSE_CONN_STRING
 
 predictions_bp = Blueprint('predictions', __name__, url_prefix='/api/predictions')
 
-# Initialize predictor
-predictor = MultiModelPredictor()
-try:
-    predictor.load_models()
-except:
-    print("Models not loaded. Train models first.")
+def get_standard_predictor():
+    """The process-wide MultiModelPredictor; raises when no models have been trained"""
+    predictor = predictor_service.standard
+    if predictor is None:
+        raise RuntimeError('Models not trained. Train models first.')
+    return predictor
 
 def safe_float(value, default=0.0):
     """Safely convert value to float, handling various edge cases"""
@@ -133,7 +130,10 @@ def predict_student_performance():
                 student_id = result['student_id'].iloc[0]
             engine.dispose()
         
-        prediction = predictor.predict(student_id, model_type)
+        predictor = get_standard_predictor()
+        prediction = prediction_cache.get_or_compute(
+            student_id, model_type, getattr(predictor, 'model_version', None),
+            lambda: float(predictor.predict(student_id, model_type)))
         
         return jsonify({
             'student_id': student_id,
@@ -200,7 +200,7 @@ def predict_scenario():
             END as has_significant_balance,
             COALESCE(SUM(fa.total_hours), 0) as total_attendance_hours,
             COALESCE(SUM(fa.days_present), 0) as total_days_present,
-            COALESCE(COUNT(DISTINCT fa.course_code), 0) as courses_attended,
+            COALESCE(COUNT(DISTINCT fa.course_key), 0) as courses_attended,
             CASE 
                 WHEN COUNT(fa.attendance_id) > 0 
                 THEN (SUM(fa.days_present) / COUNT(fa.attendance_id)) * 100
@@ -208,8 +208,8 @@ def predict_scenario():
             END as attendance_rate,
             AVG(fa.total_hours) as avg_hours_per_course
         FROM dim_student ds
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+        LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
         WHERE ds.student_id = :student_id
         GROUP BY ds.student_id
         """)
@@ -281,6 +281,10 @@ def predict_scenario():
         # Use tuition-attendance model if available, otherwise use standard models
         predictions = {}
         
+        # One reference per request, so a hot reload cannot mix model versions mid-scenario
+        enhanced_predictor = predictor_service.enhanced
+        predictor = predictor_service.standard
+        
         # Try tuition-attendance model first (most accurate for scenario analysis)
         if enhanced_predictor and 'tuition_attendance_performance' in enhanced_predictor.models:
             try:
@@ -309,8 +313,7 @@ def predict_scenario():
                     scaler = enhanced_predictor.scalers.get('tuition_attendance_performance')
                     if scaler:
                         X_scaled = scaler.transform(X)
-                        model = enhanced_predictor.models['tuition_attendance_performance']
-                        pred = model.predict(X_scaled)[0]
+                        pred = enhanced_predictor.predict_model('tuition_attendance_performance', X_scaled)[0]
                         
                         pred_float = safe_float(pred, 0.0)
                         predictions['tuition_attendance_performance'] = {
@@ -324,6 +327,8 @@ def predict_scenario():
         for model_type in ['random_forest', 'gradient_boosting', 'neural_network']:
             try:
                 # For standard models, we adjust the prediction based on scenario changes
+                if predictor is None:
+                    raise RuntimeError('Models not trained. Train models first.')
                 base_pred = predictor.predict(student_id, model_type)
                 
                 # Apply scenario-based adjustments
@@ -383,10 +388,82 @@ def predict_scenario():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def scoped_student_ids(user_scope, student_ids):
+    """Restrict requested student IDs to the ones the caller's role may predict for"""
+    # Apply role-based filtering
+    engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+
+    if user_scope['role'] == Role.STAFF:
+        # Staff can only predict for their classes
+        query = text("""
+        SELECT DISTINCT ds.student_id
+        FROM fact_enrollment fe
+        JOIN fact_attendance fa ON fe.student_key = fa.student_key
+        JOIN dim_student ds ON fe.student_key = ds.student_key
+        WHERE fa.staff_id = :staff_id
+        """)
+        allowed_students = pd.read_sql_query(query, engine, params={'staff_id': user_scope['staff_id']})
+        student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
+
+    elif user_scope['role'] == Role.HOD:
+        # HOD can predict for their department
+        query = text("""
+        SELECT DISTINCT ds.student_id
+        FROM dim_student ds
+        JOIN dim_program dp ON ds.program_id = dp.program_id
+        WHERE dp.department_id = :department_id
+        """)
+        allowed_students = pd.read_sql_query(query, engine, params={'department_id': user_scope['department_id']})
+        student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
+
+    elif user_scope['role'] == Role.DEAN:
+        # Dean can predict for their faculty
+        query = text("""
+        SELECT DISTINCT ds.student_id
+        FROM dim_student ds
+        JOIN dim_program dp ON ds.program_id = dp.program_id
+        JOIN dim_department ddept ON dp.department_id = ddept.department_id
+        WHERE ddept.faculty_id = :faculty_id
+        """)
+        allowed_students = pd.read_sql_query(query, engine, params={'faculty_id': user_scope['faculty_id']})
+        student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
+
+    engine.dispose()
+    return student_ids
+
+def batch_prediction_results(student_ids, model_type, progress=None):
+    """Predict each student in turn; progress(done, total) is called as the batch advances"""
+    predictor = get_standard_predictor()
+    results = []
+    for done, student_id in enumerate(student_ids, start=1):
+        try:
+            prediction = prediction_cache.get_or_compute(
+                student_id, model_type, getattr(predictor, 'model_version', None),
+                lambda: float(predictor.predict(student_id, model_type)))
+            results.append({
+                'student_id': student_id,
+                'predicted_grade': round(float(prediction), 2),
+                'predicted_letter_grade': get_letter_grade(prediction)
+            })
+        except Exception as e:
+            results.append({
+                'student_id': student_id,
+                'error': str(e)
+            })
+        if progress:
+            progress(done, len(student_ids))
+    
+    return {
+        'model_type': model_type,
+        'total_students': len(student_ids),
+        'successful_predictions': len([r for r in results if 'error' not in r]),
+        'results': results
+    }
+
 @predictions_bp.route('/batch-predict', methods=['POST'])
 @jwt_required()
 def batch_predict():
-    """Batch prediction for multiple students"""
+    """Batch prediction for multiple students (pass "async": true to run it as a background job)"""
     try:
         claims = get_jwt()
         user_scope = get_user_scope(claims)
@@ -398,68 +475,19 @@ def batch_predict():
         
         student_ids = data.get('student_ids', [])
         model_type = data.get('model_type', 'ensemble')
-        filters = data.get('filters', {})
         
-        # Apply role-based filtering
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        if data.get('async'):
+            # Role scoping queries the warehouse, so it runs in the worker as well
+            from jobs import job_queue
+            job = job_queue.submit('batch_predict', get_jwt_identity(), {
+                'user_scope': user_scope,
+                'student_ids': student_ids,
+                'model_type': model_type,
+            })
+            return jsonify(job), 202
         
-        if user_scope['role'] == Role.STAFF:
-            # Staff can only predict for their classes
-            query = text("""
-            SELECT DISTINCT fe.student_id 
-            FROM fact_enrollment fe
-            JOIN fact_attendance fa ON fe.student_id = fa.student_id
-            WHERE fa.staff_id = :staff_id
-            """)
-            allowed_students = pd.read_sql_query(query, engine, params={'staff_id': user_scope['staff_id']})
-            student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
-        
-        elif user_scope['role'] == Role.HOD:
-            # HOD can predict for their department
-            query = text("""
-            SELECT DISTINCT ds.student_id
-            FROM dim_student ds
-            JOIN dim_program dp ON ds.program_id = dp.program_id
-            WHERE dp.department_id = :department_id
-            """)
-            allowed_students = pd.read_sql_query(query, engine, params={'department_id': user_scope['department_id']})
-            student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
-        
-        elif user_scope['role'] == Role.DEAN:
-            # Dean can predict for their faculty
-            query = text("""
-            SELECT DISTINCT ds.student_id
-            FROM dim_student ds
-            JOIN dim_program dp ON ds.program_id = dp.program_id
-            JOIN dim_department ddept ON dp.department_id = ddept.department_id
-            WHERE ddept.faculty_id = :faculty_id
-            """)
-            allowed_students = pd.read_sql_query(query, engine, params={'faculty_id': user_scope['faculty_id']})
-            student_ids = [s for s in student_ids if s in allowed_students['student_id'].tolist()]
-        
-        engine.dispose()
-        
-        results = []
-        for student_id in student_ids:
-            try:
-                prediction = predictor.predict(student_id, model_type)
-                results.append({
-                    'student_id': student_id,
-                    'predicted_grade': round(float(prediction), 2),
-                    'predicted_letter_grade': get_letter_grade(prediction)
-                })
-            except Exception as e:
-                results.append({
-                    'student_id': student_id,
-                    'error': str(e)
-                })
-        
-        return jsonify({
-            'model_type': model_type,
-            'total_students': len(student_ids),
-            'successful_predictions': len([r for r in results if 'error' not in r]),
-            'results': results
-        }), 200
+        student_ids = scoped_student_ids(user_scope, student_ids)
+        return jsonify(batch_prediction_results(student_ids, model_type)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -631,6 +659,80 @@ def analyze_scenario(scenario, predictions):
     
     return analysis
 
+def tuition_attendance_prediction(enhanced_predictor, student_id):
+    """Tuition-attendance-performance prediction for one student; None if the student does not exist"""
+    # Get student features
+    student_data = load_tuition_attendance_features(student_id)
+    
+    if student_data.empty:
+        return None
+    
+    # Prepare features - ensure all values are numeric
+    feature_cols = enhanced_predictor.feature_cols['tuition_attendance_performance']
+    
+    # Check for missing columns and add them with default values
+    missing_cols = set(feature_cols) - set(student_data.columns)
+    if missing_cols:
+        print(f"Warning: Missing columns in prediction data: {missing_cols}")
+        for col in missing_cols:
+            student_data[col] = 0  # Add missing columns with default value 0
+    
+    X_df = student_data[feature_cols].copy()
+    # Convert all columns to numeric, coercing errors to NaN then filling with 0
+    for col in X_df.columns:
+        X_df[col] = pd.to_numeric(X_df[col], errors='coerce').fillna(0)
+    X = X_df.values.astype(np.float64)
+    
+    # Scale and predict
+    scaler = enhanced_predictor.scalers['tuition_attendance_performance']
+    X_scaled = scaler.transform(X)
+    prediction = enhanced_predictor.predict_model('tuition_attendance_performance', X_scaled)[0]
+    
+    # Safely convert all values
+    pred_float = safe_float(prediction, 0.0)
+    
+    # Get the actual values and ensure they're properly calculated
+    payment_completion = safe_float(student_data['payment_completion_rate'].iloc[0], 0.0)
+    attendance_rate = safe_float(student_data['attendance_rate'].iloc[0], 0.0)
+    
+    # Ensure attendance rate doesn't exceed 100%
+    attendance_rate = min(100.0, max(0.0, attendance_rate))
+    
+    # If there's no attendance data but student exists, set to 0 instead of showing 100%
+    total_attendance_records = safe_float(student_data.get('total_attendance_records', pd.Series([0])).iloc[0], 0.0)
+    total_days_present = safe_float(student_data.get('total_days_present', pd.Series([0])).iloc[0], 0.0)
+    
+    # Recalculate attendance rate properly: if no records, it's 0%
+    if total_attendance_records == 0:
+        attendance_rate = 0.0
+    else:
+        # Calculate as percentage: (days_present / total_possible_days) * 100
+        # Since we don't have total_possible_days, use a more meaningful calculation
+        # Attendance rate = (days_present / attendance_records) * 100, capped at 100%
+        # But this assumes each record is one day, which might not be accurate
+        # For now, use the calculated rate but ensure it's between 0 and 100
+        calculated_rate = (total_days_present / total_attendance_records) * 100 if total_attendance_records > 0 else 0.0
+        attendance_rate = min(100.0, max(0.0, calculated_rate))
+    
+    # If there's no payment data, payment completion should be 0, not showing incorrectly
+    total_paid = safe_float(student_data.get('total_paid', pd.Series([0])).iloc[0], 0.0)
+    total_required = safe_float(student_data.get('total_required', pd.Series([0])).iloc[0], 0.0)
+    if total_required == 0 and total_paid == 0:
+        payment_completion = 0.0
+    
+    return {
+        'student_id': student_id,
+        'model_type': 'tuition_attendance_performance',
+        'predicted_grade': round(pred_float, 2),
+        'predicted_letter_grade': get_letter_grade(pred_float),
+        'payment_completion_rate': round(payment_completion, 2),
+        'attendance_rate': round(attendance_rate, 2),
+        'attendance_payment_score': safe_float(student_data['attendance_payment_score'].iloc[0], 0.0),
+        'total_paid': round(total_paid, 2),
+        'total_required': round(total_required, 2),
+        'total_attendance_records': int(total_attendance_records)
+    }
+
 @predictions_bp.route('/tuition-attendance-performance', methods=['POST'])
 @jwt_required()
 def predict_tuition_attendance_performance():
@@ -642,6 +744,7 @@ def predict_tuition_attendance_performance():
         if not has_permission(user_scope['role'], Resource.PREDICTIONS, Permission.READ, user_scope):
             return jsonify({'error': 'Permission denied'}), 403
         
+        enhanced_predictor = predictor_service.enhanced
         if not enhanced_predictor or 'tuition_attendance_performance' not in enhanced_predictor.models:
             return jsonify({'error': 'Model not trained. Please train the tuition-attendance-performance model first.'}), 503
         
@@ -651,132 +754,29 @@ def predict_tuition_attendance_performance():
         if not student_id:
             return jsonify({'error': 'Student ID or Access Number required'}), 400
         
-        # Get student features
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
-        # Use the same query structure as in enhanced_predictions.py
-        query = text("""
-        SELECT 
-            ds.student_id,
-            -- Tuition Features (must match training query exactly)
-            COALESCE(SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END), 0) as total_paid,
-            COALESCE(SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END), 0) as total_pending,
-            COALESCE(SUM(fp.amount), 0) as total_required,
-            CASE 
-                WHEN SUM(fp.amount) > 0 
-                THEN SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) / SUM(fp.amount) * 100
-                ELSE 0 
-            END as payment_completion_rate,
-            COUNT(CASE WHEN fp.status = 'Completed' THEN 1 END) as completed_payments,
-            DATEDIFF(CURDATE(), MAX(CASE WHEN fp.status = 'Completed' THEN fp.date_key ELSE NULL END)) as days_since_last_payment,
-            CASE 
-                WHEN SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END) > 500000 
-                THEN 1 ELSE 0 
-            END as has_significant_balance,
-            -- Attendance Features
-            COALESCE(SUM(fa.total_hours), 0) as total_attendance_hours,
-            COALESCE(SUM(fa.days_present), 0) as total_days_present,
-            COALESCE(COUNT(fa.attendance_id), 0) as total_attendance_records,
-            CASE 
-                WHEN COUNT(fa.attendance_id) > 0 AND SUM(COALESCE(fa.days_present, 0)) > 0
-                THEN LEAST(100.0, (SUM(COALESCE(fa.days_present, 0)) / NULLIF(COUNT(fa.attendance_id), 0)) * 100.0)
-                ELSE 0.0 
-            END as attendance_rate,
-            COALESCE(COUNT(DISTINCT fa.course_code), 0) as courses_attended,
-            COALESCE(AVG(fa.total_hours), 0) as avg_hours_per_course,
-            -- Combined Features
-            CASE 
-                WHEN COUNT(fa.attendance_id) > 0 AND SUM(fp.amount) > 0
-                THEN ((SUM(fa.days_present) / COUNT(fa.attendance_id)) * 100) * 
-                     (SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) / SUM(fp.amount) * 100) / 100
-                ELSE 0 
-            END as attendance_payment_score
-        FROM dim_student ds
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
-        WHERE ds.student_id = :student_id OR ds.access_number = :student_id
-        GROUP BY ds.student_id
-        """)
-        
-        student_data = pd.read_sql_query(query, engine, params={'student_id': student_id})
-        engine.dispose()
-        
-        if student_data.empty:
+        model_version = getattr(enhanced_predictor, 'model_version', None)
+        result = prediction_cache.get_or_compute(
+            student_id, 'tuition_attendance_performance', model_version,
+            lambda: tuition_attendance_prediction(enhanced_predictor, student_id))
+        if result is None:
             return jsonify({'error': 'Student not found'}), 404
-        
-        # Prepare features - ensure all values are numeric
-        feature_cols = enhanced_predictor.feature_cols['tuition_attendance_performance']
-        
-        # Check for missing columns and add them with default values
-        missing_cols = set(feature_cols) - set(student_data.columns)
-        if missing_cols:
-            print(f"Warning: Missing columns in prediction data: {missing_cols}")
-            for col in missing_cols:
-                student_data[col] = 0  # Add missing columns with default value 0
-        
-        X_df = student_data[feature_cols].copy()
-        # Convert all columns to numeric, coercing errors to NaN then filling with 0
-        for col in X_df.columns:
-            X_df[col] = pd.to_numeric(X_df[col], errors='coerce').fillna(0)
-        X = X_df.values.astype(np.float64)
-        
-        # Scale and predict
-        scaler = enhanced_predictor.scalers['tuition_attendance_performance']
-        X_scaled = scaler.transform(X)
-        model = enhanced_predictor.models['tuition_attendance_performance']
-        prediction = model.predict(X_scaled)[0]
-        
-        # Safely convert all values
-        pred_float = safe_float(prediction, 0.0)
-        
-        # Get the actual values and ensure they're properly calculated
-        payment_completion = safe_float(student_data['payment_completion_rate'].iloc[0], 0.0)
-        attendance_rate = safe_float(student_data['attendance_rate'].iloc[0], 0.0)
-        
-        # Ensure attendance rate doesn't exceed 100%
-        attendance_rate = min(100.0, max(0.0, attendance_rate))
-        
-        # If there's no attendance data but student exists, set to 0 instead of showing 100%
-        total_attendance_records = safe_float(student_data.get('total_attendance_records', pd.Series([0])).iloc[0], 0.0)
-        total_days_present = safe_float(student_data.get('total_days_present', pd.Series([0])).iloc[0], 0.0)
-        
-        # Recalculate attendance rate properly: if no records, it's 0%
-        if total_attendance_records == 0:
-            attendance_rate = 0.0
-        else:
-            # Calculate as percentage: (days_present / total_possible_days) * 100
-            # Since we don't have total_possible_days, use a more meaningful calculation
-            # Attendance rate = (days_present / attendance_records) * 100, capped at 100%
-            # But this assumes each record is one day, which might not be accurate
-            # For now, use the calculated rate but ensure it's between 0 and 100
-            calculated_rate = (total_days_present / total_attendance_records) * 100 if total_attendance_records > 0 else 0.0
-            attendance_rate = min(100.0, max(0.0, calculated_rate))
-        
-        # If there's no payment data, payment completion should be 0, not showing incorrectly
-        total_paid = safe_float(student_data.get('total_paid', pd.Series([0])).iloc[0], 0.0)
-        total_required = safe_float(student_data.get('total_required', pd.Series([0])).iloc[0], 0.0)
-        if total_required == 0 and total_paid == 0:
-            payment_completion = 0.0
-        
-        return jsonify({
-            'student_id': student_id,
-            'model_type': 'tuition_attendance_performance',
-            'predicted_grade': round(pred_float, 2),
-            'predicted_letter_grade': get_letter_grade(pred_float),
-            'payment_completion_rate': round(payment_completion, 2),
-            'attendance_rate': round(attendance_rate, 2),
-            'attendance_payment_score': safe_float(student_data['attendance_payment_score'].iloc[0], 0.0),
-            'total_paid': round(total_paid, 2),
-            'total_required': round(total_required, 2),
-            'total_attendance_records': int(total_attendance_records)
-        }), 200
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Longest forecast horizon served in one request (quarters)
+MAX_ENROLLMENT_HORIZON = 12
+# Latest start year served, in years past the last observed quarter (or the current year);
+# every quarter in between is forecast too, so an unbounded year ties up the worker
+MAX_ENROLLMENT_YEARS_AHEAD = 5
+
 @predictions_bp.route('/enrollment-trend', methods=['POST'])
 @jwt_required()
 def predict_enrollment_trend():
-    """Predict enrollment trends for resource allocation"""
+    """Predict enrollment trends for resource allocation.
+    Forecasts every selected program for `horizon` quarters from (year, quarter);
+    programs are chosen by program_ids/program_id, department_id or faculty_id."""
     try:
         claims = get_jwt()
         user_scope = get_user_scope(claims)
@@ -784,28 +784,239 @@ def predict_enrollment_trend():
         if user_scope['role'] not in [Role.ANALYST, Role.SYSADMIN, Role.SENATE, Role.DEAN, Role.HOD]:
             return jsonify({'error': 'Permission denied'}), 403
         
+        enhanced_predictor = predictor_service.enhanced
         if not enhanced_predictor or 'enrollment_trend' not in enhanced_predictor.models:
             return jsonify({'error': 'Model not trained'}), 503
         
-        data = request.get_json()
-        year = data.get('year', datetime.now().year + 1)
-        quarter = data.get('quarter', 1)
-        program_id = data.get('program_id')
+        data = request.get_json() or {}
+        year = safe_int(data.get('year'), datetime.now().year + 1)
+        quarter = safe_int(data.get('quarter'), 1)
+        horizon = safe_int(data.get('horizon'), 1)
+        if quarter not in (1, 2, 3, 4) or not 1 <= horizon <= MAX_ENROLLMENT_HORIZON:
+            return jsonify({'error': f'quarter must be 1-4 and horizon 1-{MAX_ENROLLMENT_HORIZON}'}), 400
+        
+        program_ids = data.get('program_ids') or ([data['program_id']] if data.get('program_id') else None)
         department_id = data.get('department_id')
         faculty_id = data.get('faculty_id')
         
-        # Get historical data for lag features
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
-        # Implementation would fetch historical data and create lag features
-        # Then use the model to predict
+        # Deans and HODs only forecast their own faculty / department
+        if user_scope['role'] == Role.DEAN:
+            faculty_id = user_scope['faculty_id']
+        elif user_scope['role'] == Role.HOD:
+            department_id = user_scope['department_id']
+        
+        series, generation = enrollment_series_cache.get()
+        if not series.empty:
+            first_year = int(series['year'].min())
+            max_year = max(int(series['year'].max()), datetime.now().year) + MAX_ENROLLMENT_YEARS_AHEAD
+            if not first_year <= year <= max_year:
+                return jsonify({'error': f'year must be {first_year}-{max_year}'}), 400
+        programs = series[['program_id', 'department_id', 'faculty_id']].drop_duplicates('program_id')
+        if department_id:
+            programs = programs[programs['department_id'] == safe_int(department_id)]
+        if faculty_id:
+            programs = programs[programs['faculty_id'] == safe_int(faculty_id)]
+        selected = programs['program_id'].tolist()
+        if program_ids:
+            requested_ids = [safe_int(p) for p in program_ids]
+            allowed = set(selected)
+            selected = [p for p in requested_ids if p in allowed] if (department_id or faculty_id) else requested_ids
+        
+        forecasts, unknown = enhanced_predictor.forecast_enrollment(series, selected, year, quarter, horizon)
+        forecasts['predicted_enrollment'] = forecasts['predicted_enrollment'].round(1)
+        totals = (forecasts.groupby(['year', 'quarter'])['predicted_enrollment'].sum().round(1)
+                  .reset_index().to_dict('records'))
         
         return jsonify({
             'message': 'Enrollment trend prediction',
             'year': year,
             'quarter': quarter,
-            'predicted_enrollment': 0  # Placeholder
+            'horizon': horizon,
+            'generation': generation,
+            # Total for the first quarter of the horizon (single-cell callers)
+            'predicted_enrollment': totals[0]['predicted_enrollment'] if totals else 0,
+            'totals': totals,
+            'forecasts': forecasts.to_dict('records'),
+            'unknown_programs': unknown
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Page size limits of the ranked at-risk lists
+DEFAULT_AT_RISK_PAGE_SIZE = 50
+MAX_AT_RISK_PAGE_SIZE = 500
+
+@predictions_bp.route('/at-risk', methods=['GET'])
+@jwt_required()
+def get_at_risk_students():
+    """Students ranked by predicted grade (lowest first) from the nightly scores in fact_prediction.
+    Filters: model (default ensemble), department_id, faculty_id, program_id, risk_level
+    (comma-separated); paged with page and page_size. HODs see their department, deans their faculty."""
+    try:
+        from async_warehouse import get_warehouse_engine
+        from risk_scoring import PREDICTION_TABLE, RISK_LEVEL_NAMES
+        
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] not in [Role.ANALYST, Role.SYSADMIN, Role.SENATE, Role.DEAN, Role.HOD]:
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        params = request.args
+        page = max(safe_int(params.get('page'), 1), 1)
+        page_size = min(max(safe_int(params.get('page_size'), DEFAULT_AT_RISK_PAGE_SIZE), 1), MAX_AT_RISK_PAGE_SIZE)
+        filters = {
+            'model': params.get('model', 'ensemble'),
+            'department_id': params.get('department_id'),
+            'faculty_id': params.get('faculty_id'),
+            'program_id': params.get('program_id'),
+        }
+        if user_scope['role'] == Role.DEAN:
+            filters['faculty_id'] = user_scope['faculty_id']
+        elif user_scope['role'] == Role.HOD:
+            filters['department_id'] = user_scope['department_id']
+        
+        clauses = ["fp.model = :model"]
+        query_params = {'model': filters['model']}
+        for column in ('department_id', 'faculty_id', 'program_id'):
+            if filters[column] not in (None, ''):
+                clauses.append(f"fp.{column} = :{column}")
+                query_params[column] = safe_int(filters[column])
+        risk_filter = [level.strip() for level in params.get('risk_level', '').split(',') if level.strip()]
+        unknown_levels = [level for level in risk_filter if level not in RISK_LEVEL_NAMES]
+        if unknown_levels:
+            return jsonify({'error': f"Unknown risk_level {unknown_levels}; expected {RISK_LEVEL_NAMES}"}), 400
+        if risk_filter:
+            names = [f":risk_{i}" for i in range(len(risk_filter))]
+            clauses.append(f"fp.risk_level IN ({', '.join(names)})")
+            query_params.update({f"risk_{i}": level for i, level in enumerate(risk_filter)})
+        where = " AND ".join(clauses)
+        
+        engine = get_warehouse_engine()
+        with engine.connect() as conn:
+            summary = conn.execute(text(f"""
+                SELECT COUNT(*) AS total, MAX(fp.scored_at) AS scored_at,
+                       MAX(fp.generation) AS generation, MAX(fp.model_version) AS model_version
+                FROM {PREDICTION_TABLE} fp WHERE {where}
+            """), query_params).mappings().one()
+            rows = conn.execute(text(f"""
+                SELECT fp.student_id, ds.access_number, ds.first_name, ds.last_name,
+                       fp.program_id, dp.program_name, fp.department_id, fp.faculty_id,
+                       fp.predicted_grade, fp.risk_level
+                FROM {PREDICTION_TABLE} fp
+                LEFT JOIN dim_student ds ON ds.student_id = fp.student_id
+                LEFT JOIN dim_program dp ON dp.program_id = fp.program_id
+                WHERE {where}
+                ORDER BY fp.predicted_grade ASC, fp.student_id ASC
+                LIMIT :limit OFFSET :offset
+            """), {**query_params, 'limit': page_size, 'offset': (page - 1) * page_size}).mappings().all()
+        
+        offset = (page - 1) * page_size
+        students = []
+        for rank, row in enumerate(rows, start=offset + 1):
+            grade = safe_float(row['predicted_grade'])
+            students.append({
+                'rank': rank,
+                'student_id': row['student_id'],
+                'access_number': row['access_number'],
+                'name': ' '.join(part for part in (row['first_name'], row['last_name']) if part),
+                'program_id': row['program_id'],
+                'program_name': row['program_name'],
+                'department_id': row['department_id'],
+                'faculty_id': row['faculty_id'],
+                'predicted_grade': round(grade, 2),
+                'predicted_letter_grade': get_letter_grade(grade),
+                'risk_level': row['risk_level'],
+            })
+        total = int(summary['total'] or 0)
+        return jsonify({
+            'model': filters['model'],
+            'model_version': summary['model_version'],
+            'generation': summary['generation'],
+            'scored_at': summary['scored_at'].isoformat() if summary['scored_at'] else None,
+            'filters': {k: v for k, v in filters.items() if k != 'model' and v not in (None, '')},
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'total_pages': (total + page_size - 1) // page_size,
+            'students': students,
+        }), 200
+    except Exception as e:
+        import traceback
+        print(f"Error listing at-risk students: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/models', methods=['GET'])
+@jwt_required()
+def get_model_status():
+    """Which model versions this server process has loaded"""
+    try:
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] not in [Role.SYSADMIN, Role.ANALYST]:
+            return jsonify({'error': 'Permission denied'}), 403
+        return jsonify(predictor_service.status()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/models/reload', methods=['POST'])
+@jwt_required()
+def reload_models():
+    """Load newly trained models now instead of waiting for the next periodic check.
+    Only reaches the worker that serves the request; the other workers pick the
+    new files up within MODEL_RELOAD_CHECK_SECONDS."""
+    try:
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] != Role.SYSADMIN:
+            return jsonify({'error': 'Permission denied'}), 403
+        reloaded = predictor_service.reload()
+        return jsonify({'reloaded': reloaded, **predictor_service.status()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/models/rollback', methods=['POST'])
+@jwt_required()
+def rollback_models():
+    """Serve an earlier registry version of a model set: {"model_set": "standard", "version": "v6"}.
+    Every worker switches within MODEL_RELOAD_CHECK_SECONDS; this one switches now."""
+    try:
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] != Role.SYSADMIN:
+            return jsonify({'error': 'Permission denied'}), 403
+        data = request.get_json() or {}
+        model_set = data.get('model_set')
+        version = data.get('version')
+        if model_set not in ('standard', 'enhanced') or not version:
+            return jsonify({'error': 'model_set (standard or enhanced) and version are required'}), 400
+        try:
+            model_registry.activate(model_set, version)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+        reloaded = predictor_service.reload(force=False)
+        return jsonify({'reloaded': reloaded, **predictor_service.status()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/cache', methods=['GET'])
+@jwt_required()
+def get_prediction_cache_stats():
+    """Prediction cache size and hit ratio of this server process"""
+    try:
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] not in [Role.SYSADMIN, Role.ANALYST]:
+            return jsonify({'error': 'Permission denied'}), 403
+        return jsonify(prediction_cache.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@predictions_bp.route('/cache', methods=['DELETE'])
+@jwt_required()
+def clear_prediction_cache():
+    """Drop cached predictions (pass ?model=<name> to drop only one model's)"""
+    try:
+        user_scope = get_user_scope(get_jwt())
+        if user_scope['role'] != Role.SYSADMIN:
+            return jsonify({'error': 'Permission denied'}), 403
+        prediction_cache.invalidate(request.args.get('model'))
+        return jsonify(prediction_cache.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
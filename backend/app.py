@@ -6,10 +6,18 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required
 import pandas as pd
+import contextvars
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine, text
-from config import DATA_WAREHOUSE_CONN_STRING, SECRET_KEY, JWT_SECRET_KEY
-from ml_models import MultiModelPredictor
+from config import (DATA_WAREHOUSE_CONN_STRING, SECRET_KEY, JWT_SECRET_KEY, QUERY_WORKLOAD_CAPTURE,
+                    DASHBOARD_BUNDLE_WORKERS)
+from predictor_service import predictor_service
+from prediction_cache import prediction_cache
+from gold_layer import get_gold_engine
+from async_warehouse import gather_records, get_warehouse_engine
 
 # Import blueprints
 from api.auth import auth_bp
@@ -27,6 +35,12 @@ try:
 except ImportError:
     export_bp = None
 
+# Import background jobs blueprint
+try:
+    from api.jobs import jobs_bp
+except ImportError:
+    jobs_bp = None
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = SECRET_KEY
 app.config['JWT_SECRET_KEY'] = JWT_SECRET_KEY
@@ -36,6 +50,11 @@ app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
 CORS(app, supports_credentials=True)
 jwt = JWTManager(app)
 
+# Record the warehouse query workload for index_advisor.py
+if QUERY_WORKLOAD_CAPTURE:
+    from query_workload import enable_capture
+    enable_capture()
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(analytics_bp)
@@ -43,13 +62,20 @@ if predictions_bp:
     app.register_blueprint(predictions_bp)
 if export_bp:
     app.register_blueprint(export_bp)
+if jobs_bp:
+    app.register_blueprint(jobs_bp)
 
-# Initialize ML model
-predictor = MultiModelPredictor()
-try:
-    predictor.load_models()
-except:
-    print("Models not loaded. Train models first.")
+
+def date_key_range_clauses(fact_alias, filters):
+    """from_year/to_year filters as date_key bounds on the fact itself.
+    Filtering dim_time.year cannot prune the date_key partitions of the facts; this can."""
+    clauses = []
+    for param, template in (('from_year', "{alias}.date_key >= {year}0101"),
+                            ('to_year', "{alias}.date_key < {next_year}0101")):
+        value = str(filters.get(param, '')).strip()
+        if value.isdigit() and len(value) == 4:
+            clauses.append(template.format(alias=fact_alias, year=value, next_year=int(value) + 1))
+    return clauses
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
@@ -60,164 +86,87 @@ def get_status():
         'timestamp': datetime.now().isoformat()
     }), 200
 
+# Independent counts behind the dashboard cards; run concurrently by get_dashboard_stats
+DASHBOARD_STAT_QUERIES = {
+    'total_students': "SELECT COUNT(DISTINCT student_id) as count FROM dim_student",
+    'total_courses': "SELECT COUNT(*) as count FROM dim_course",
+    'total_enrollments': "SELECT COUNT(*) as count FROM fact_enrollment",
+    # Average grade (only completed exams)
+    'avg_grade': "SELECT AVG(grade) as avg FROM fact_grade WHERE exam_status = 'Completed'",
+    'mex_count': "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'MEX'",
+    'fex_count': "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'FEX'",
+    # Tuition-related missed exams
+    'tuition_mex_count': "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'MEX' AND (absence_reason LIKE '%Tuition%' OR absence_reason LIKE '%Financial%')",
+    'total_payments': "SELECT SUM(amount) as total FROM fact_payment WHERE status = 'Completed'",
+    'avg_attendance': "SELECT AVG(total_hours) as avg FROM fact_attendance",
+    'total_high_schools': "SELECT COUNT(DISTINCT high_school) as count FROM dim_student WHERE high_school IS NOT NULL AND high_school != ''",
+    # Retention (Active / total) and graduation (Graduated / total) rates
+    'avg_retention_rate': """
+        SELECT 
+            COUNT(DISTINCT CASE WHEN status = 'Active' THEN student_id END) as part,
+            COUNT(DISTINCT student_id) as total
+        FROM dim_student
+    """,
+    'avg_graduation_rate': """
+        SELECT 
+            COUNT(DISTINCT CASE WHEN status = 'Graduated' THEN student_id END) as part,
+            COUNT(DISTINCT student_id) as total
+        FROM dim_student
+    """,
+    # Outstanding Payments (Pending payments total)
+    'outstanding_payments': "SELECT SUM(amount) as total FROM fact_payment WHERE status = 'Pending'",
+}
+
 @app.route('/api/dashboard/stats', methods=['GET'])
 @jwt_required()
-def get_dashboard_stats():
+async def get_dashboard_stats():
     """Get dashboard statistics"""
-    engine = None
-    try:
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
-        
-        # Total students - with error handling
-        try:
-            total_students_result = pd.read_sql_query("SELECT COUNT(DISTINCT student_id) as count FROM dim_student", engine)
-            total_students = int(total_students_result['count'][0]) if not total_students_result.empty and pd.notna(total_students_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting total_students: {e}")
-            total_students = 0
-        
-        # Total courses
-        try:
-            total_courses_result = pd.read_sql_query("SELECT COUNT(*) as count FROM dim_course", engine)
-            total_courses = int(total_courses_result['count'][0]) if not total_courses_result.empty and pd.notna(total_courses_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting total_courses: {e}")
-            total_courses = 0
-        
-        # Total enrollments
-        try:
-            total_enrollments_result = pd.read_sql_query("SELECT COUNT(*) as count FROM fact_enrollment", engine)
-            total_enrollments = int(total_enrollments_result['count'][0]) if not total_enrollments_result.empty and pd.notna(total_enrollments_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting total_enrollments: {e}")
-            total_enrollments = 0
-        
-        # Average grade (only completed exams)
-        try:
-            avg_grade_result = pd.read_sql_query(
-                "SELECT AVG(grade) as avg FROM fact_grade WHERE exam_status = 'Completed'", engine
-            )
-            avg_grade = float(avg_grade_result['avg'][0]) if not avg_grade_result.empty and pd.notna(avg_grade_result['avg'][0]) else 0.0
-        except Exception as e:
-            print(f"Error getting avg_grade: {e}")
-            avg_grade = 0.0
-        
-        # MEX/FEX statistics
-        try:
-            mex_count_result = pd.read_sql_query(
-                "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'MEX'", engine
-            )
-            mex_count = int(mex_count_result['count'][0]) if not mex_count_result.empty and pd.notna(mex_count_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting mex_count: {e}")
-            mex_count = 0
-        
-        try:
-            fex_count_result = pd.read_sql_query(
-                "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'FEX'", engine
-            )
-            fex_count = int(fex_count_result['count'][0]) if not fex_count_result.empty and pd.notna(fex_count_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting fex_count: {e}")
-            fex_count = 0
-        
-        # Tuition-related missed exams
-        try:
-            tuition_mex_result = pd.read_sql_query(
-                "SELECT COUNT(*) as count FROM fact_grade WHERE exam_status = 'MEX' AND (absence_reason LIKE '%%Tuition%%' OR absence_reason LIKE '%%Financial%%')", engine
-            )
-            tuition_mex_count = int(tuition_mex_result['count'][0]) if not tuition_mex_result.empty and pd.notna(tuition_mex_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting tuition_mex_count: {e}")
-            tuition_mex_count = 0
-        
-        # Total payments
-        try:
-            total_payments_result = pd.read_sql_query(
-                "SELECT SUM(amount) as total FROM fact_payment WHERE status = 'Completed'", engine
-            )
-            total_payments = float(total_payments_result['total'][0]) if not total_payments_result.empty and pd.notna(total_payments_result['total'][0]) else 0.0
-        except Exception as e:
-            print(f"Error getting total_payments: {e}")
-            total_payments = 0.0
-        
-        # Average attendance
-        try:
-            avg_attendance_result = pd.read_sql_query(
-                "SELECT AVG(total_hours) as avg FROM fact_attendance", engine
-            )
-            avg_attendance = float(avg_attendance_result['avg'][0]) if not avg_attendance_result.empty and pd.notna(avg_attendance_result['avg'][0]) else 0.0
-        except Exception as e:
-            print(f"Error getting avg_attendance: {e}")
-            avg_attendance = 0.0
-        
-        # Total High Schools
-        try:
-            high_schools_result = pd.read_sql_query(
-                "SELECT COUNT(DISTINCT high_school) as count FROM dim_student WHERE high_school IS NOT NULL AND high_school != ''", engine
-            )
-            total_high_schools = int(high_schools_result['count'][0]) if not high_schools_result.empty and pd.notna(high_schools_result['count'][0]) else 0
-        except Exception as e:
-            print(f"Error getting total_high_schools: {e}")
-            total_high_schools = 0
-        
-        # Average Retention Rate (Active students / Total students)
-        try:
-            retention_result = pd.read_sql_query(
-                """
-                SELECT 
-                    COUNT(DISTINCT CASE WHEN status = 'Active' THEN student_id END) as active,
-                    COUNT(DISTINCT student_id) as total
-                FROM dim_student
-                """, engine
-            )
-            if not retention_result.empty and pd.notna(retention_result['total'][0]) and retention_result['total'][0] > 0:
-                avg_retention_rate = (retention_result['active'][0] / retention_result['total'][0]) * 100
-            else:
-                avg_retention_rate = 0.0
-        except Exception as e:
-            print(f"Error getting avg_retention_rate: {e}")
-            avg_retention_rate = 0.0
-        
-        # Average Graduation Rate (Graduated students / Total students)
+    gold = get_gold_engine()
+    if gold is not None:
         try:
-            graduation_result = pd.read_sql_query(
-                """
-                SELECT 
-                    COUNT(DISTINCT CASE WHEN status = 'Graduated' THEN student_id END) as graduated,
-                    COUNT(DISTINCT student_id) as total
-                FROM dim_student
-                """, engine
-            )
-            if not graduation_result.empty and pd.notna(graduation_result['total'][0]) and graduation_result['total'][0] > 0:
-                avg_graduation_rate = (graduation_result['graduated'][0] / graduation_result['total'][0]) * 100
-            else:
-                avg_graduation_rate = 0.0
+            return jsonify(gold.dashboard_stats())
         except Exception as e:
-            print(f"Error getting avg_graduation_rate: {e}")
-            avg_graduation_rate = 0.0
-        
-        # Outstanding Payments (Pending payments total)
-        try:
-            outstanding_result = pd.read_sql_query(
-                "SELECT SUM(amount) as total FROM fact_payment WHERE status = 'Pending'", engine
-            )
-            outstanding_payments = float(outstanding_result['total'][0]) if not outstanding_result.empty and pd.notna(outstanding_result['total'][0]) else 0.0
-        except Exception as e:
-            print(f"Error getting outstanding_payments: {e}")
-            outstanding_payments = 0.0
+            print(f"Gold layer unavailable for dashboard stats, falling back to MySQL: {e}")
+    
+    try:
+        results = await gather_records(DASHBOARD_STAT_QUERIES)
+        
+        # A failing query only zeroes its own card
+        def value(name, column, cast):
+            rows = results[name]
+            if isinstance(rows, Exception):
+                print(f"Error getting {name}: {rows}")
+                return cast(0)
+            return cast(rows[0][column]) if rows and rows[0][column] is not None else cast(0)
+        
+        def rate(name):
+            rows = results[name]
+            if isinstance(rows, Exception):
+                print(f"Error getting {name}: {rows}")
+                return 0.0
+            if rows and rows[0]['total']:
+                return (rows[0]['part'] / rows[0]['total']) * 100
+            return 0.0
+        
+        avg_grade = value('avg_grade', 'avg', float)
+        total_payments = value('total_payments', 'total', float)
+        outstanding_payments = value('outstanding_payments', 'total', float)
+        avg_attendance = value('avg_attendance', 'avg', float)
+        total_high_schools = value('total_high_schools', 'count', int)
+        avg_retention_rate = rate('avg_retention_rate')
+        avg_graduation_rate = rate('avg_graduation_rate')
         
         return jsonify({
-            'total_students': total_students,
-            'total_courses': total_courses,
-            'total_enrollments': total_enrollments,
+            'total_students': value('total_students', 'count', int),
+            'total_courses': value('total_courses', 'count', int),
+            'total_enrollments': value('total_enrollments', 'count', int),
             'avg_grade': round(avg_grade, 2),
             'total_payments': round(total_payments, 2),
             'outstanding_payments': round(outstanding_payments, 2),
             'avg_attendance': round(avg_attendance, 2),
-            'missed_exams': mex_count,
-            'failed_exams': fex_count,
-            'tuition_related_missed': tuition_mex_count,
+            'missed_exams': value('mex_count', 'count', int),
+            'failed_exams': value('fex_count', 'count', int),
+            'tuition_related_missed': value('tuition_mex_count', 'count', int),
             'total_high_schools': total_high_schools,
             'high_schools_count': total_high_schools,
             'avg_retention_rate': round(avg_retention_rate, 2),
@@ -230,9 +179,6 @@ def get_dashboard_stats():
         print(f"Error in get_dashboard_stats: {e}")
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
-    finally:
-        if engine:
-            engine.dispose()
 
 @app.route('/api/dashboard/students-by-department', methods=['GET'])
 @jwt_required()
@@ -249,7 +195,7 @@ def get_students_by_department():
         except:
             role = Role.STUDENT
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on role and filters
@@ -286,14 +232,13 @@ def get_students_by_department():
         JOIN dim_program dp ON ds.program_id = dp.program_id
         JOIN dim_department ddept ON dp.department_id = ddept.department_id
         JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
-        LEFT JOIN fact_enrollment fe ON ds.student_id = fe.student_id
+        LEFT JOIN fact_enrollment fe ON ds.student_key = fe.student_key
         {where_clause}
         GROUP BY ddept.department_name, df.faculty_name
         ORDER BY student_count DESC
         """
         
         df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
         
         return jsonify({
             'departments': df['department'].tolist(),
@@ -321,7 +266,7 @@ def get_grades_over_time():
         except:
             role = Role.STUDENT
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on role
@@ -352,6 +297,8 @@ def get_grades_over_time():
             where_clauses.append(f"ds.program_id = {filters['program_id']}")
         if filters.get('semester_id') and str(filters['semester_id']).strip() and str(filters['semester_id']).lower() != 'all':
             where_clauses.append(f"fg.semester_id = {filters['semester_id']}")
+        # Year window (prunes date_key partitions when the facts are partitioned)
+        where_clauses.extend(date_key_range_clauses('fg', filters))
         
         where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
         
@@ -377,11 +324,11 @@ def get_grades_over_time():
             COUNT(CASE WHEN fg.exam_status = 'Completed' THEN 1 END) as completed_exams,
             COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as missed_exams,
             COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as failed_exams,
-            COUNT(DISTINCT fg.student_id) as total_students,
-            COUNT(DISTINCT fg.course_code) as total_courses
+            COUNT(DISTINCT fg.student_key) as total_students,
+            COUNT(DISTINCT fg.course_key) as total_courses
         FROM fact_grade fg
         INNER JOIN dim_time dt ON fg.date_key = dt.date_key
-        INNER JOIN dim_student ds ON fg.student_id = ds.student_id
+        INNER JOIN dim_student ds ON fg.student_key = ds.student_key
         {join_clause}
         {where_clause}
         GROUP BY dt.year, dt.quarter
@@ -393,8 +340,11 @@ def get_grades_over_time():
         print(f"DEBUG: WHERE clause: {where_clause}")
         print(f"DEBUG: JOIN clause present: {bool(join_clause)}")
         
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
+        gold = get_gold_engine() if not where_clauses else None
+        if gold is not None:
+            df = gold.grades_over_time()
+        else:
+            df = pd.read_sql_query(text(query), engine)
         
         print(f"DEBUG: Query returned {len(df)} rows")
         
@@ -449,7 +399,7 @@ def get_payment_status():
         except:
             role = Role.STUDENT
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on role
@@ -462,7 +412,7 @@ def get_payment_status():
             where_clauses.append(f"ddept.department_id = {claims['department_id']}")
         elif role == Role.STUDENT:
             if claims.get('student_id'):
-                where_clauses.append(f"fp.student_id = '{claims['student_id']}'")
+                where_clauses.append(f"ds.student_id = '{claims['student_id']}'")
             elif claims.get('access_number'):
                 where_clauses.append(f"ds.access_number = '{claims['access_number']}'")
         
@@ -482,7 +432,7 @@ def get_payment_status():
         join_clause = ""
         if role in [Role.DEAN, Role.HOD] or filters.get('faculty_id') or filters.get('department_id') or role == Role.STUDENT:
             join_clause = """
-            JOIN dim_student ds ON fp.student_id = ds.student_id
+            JOIN dim_student ds ON fp.student_key = ds.student_key
             LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
             LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
             LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
@@ -498,8 +448,12 @@ def get_payment_status():
         GROUP BY fp.status
         """
         
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
+        # Semester-only filters are answered from the pre-aggregated gold layer
+        gold = get_gold_engine() if not join_clause and not filters.get('program_id') else None
+        if gold is not None:
+            df = gold.payment_status(filters.get('semester_id'))
+        else:
+            df = pd.read_sql_query(text(query), engine)
         
         return jsonify({
             'statuses': df['status'].tolist(),
@@ -516,7 +470,7 @@ def get_payment_status():
 def get_attendance_by_course():
     """Get attendance statistics by course"""
     try:
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         
         query = """
         SELECT 
@@ -524,14 +478,17 @@ def get_attendance_by_course():
             AVG(fa.total_hours) as avg_hours,
             SUM(fa.days_present) as total_days
         FROM fact_attendance fa
-        JOIN dim_course dc ON fa.course_code = dc.course_code
+        JOIN dim_course dc ON fa.course_key = dc.course_key
         GROUP BY dc.course_name
         ORDER BY avg_hours DESC
         LIMIT 10
         """
         
-        df = pd.read_sql_query(query, engine)
-        engine.dispose()
+        gold = get_gold_engine()
+        if gold is not None:
+            df = gold.attendance_by_course(limit=10)
+        else:
+            df = pd.read_sql_query(query, engine)
         
         return jsonify({
             'courses': df['course_name'].tolist(),
@@ -547,7 +504,7 @@ def get_attendance_by_course():
 def get_grade_distribution():
     """Get grade distribution"""
     try:
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on filters
@@ -568,7 +525,7 @@ def get_grade_distribution():
             fg.letter_grade,
             COUNT(*) as count
         FROM fact_grade fg
-        JOIN dim_student ds ON fg.student_id = ds.student_id
+        JOIN dim_student ds ON fg.student_key = ds.student_key
         {where_clause}
         GROUP BY fg.letter_grade
         ORDER BY 
@@ -585,8 +542,11 @@ def get_grade_distribution():
             END
         """
         
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
+        gold = get_gold_engine() if not (filters.get('faculty_id') or filters.get('department_id') or filters.get('program_id')) else None
+        if gold is not None:
+            df = gold.grade_distribution(filters.get('semester_id'))
+        else:
+            df = pd.read_sql_query(text(query), engine)
         
         return jsonify({
             'grades': df['letter_grade'].tolist(),
@@ -611,7 +571,7 @@ def get_top_students_filtered():
         except:
             role = Role.STUDENT
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         limit = int(filters.get('limit', 10))
         
@@ -653,7 +613,7 @@ def get_top_students_filtered():
             CONCAT(ds.first_name, ' ', ds.last_name) as student_name,
             AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade
         FROM fact_grade fg
-        JOIN dim_student ds ON fg.student_id = ds.student_id
+        JOIN dim_student ds ON fg.student_key = ds.student_key
         {join_clause}
         {where_clause}
         GROUP BY ds.student_id, ds.first_name, ds.last_name
@@ -663,7 +623,6 @@ def get_top_students_filtered():
         """
         
         df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
         
         return jsonify({
             'students': df['student_name'].tolist(),
@@ -690,7 +649,7 @@ def get_attendance_trends():
         except:
             role = Role.STUDENT
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on role
@@ -707,7 +666,7 @@ def get_attendance_trends():
             where_clauses.append(f"df.faculty_id = {claims['faculty_id']}")
         elif role == Role.STUDENT:
             if claims.get('student_id'):
-                where_clauses.append(f"fa.student_id = '{claims['student_id']}'")
+                where_clauses.append(f"ds.student_id = '{claims['student_id']}'")
             elif claims.get('access_number'):
                 where_clauses.append(f"ds.access_number = '{claims['access_number']}'")
         
@@ -718,6 +677,8 @@ def get_attendance_trends():
             where_clauses.append(f"ddept.department_id = {filters['department_id']}")
         if filters.get('program_id') and str(filters['program_id']).strip() and str(filters['program_id']).lower() != 'all':
             where_clauses.append(f"ds.program_id = {filters['program_id']}")
+        # Year window (prunes date_key partitions when the facts are partitioned)
+        where_clauses.extend(date_key_range_clauses('fa', filters))
         
         where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
         
@@ -729,7 +690,7 @@ def get_attendance_trends():
                      (filters.get('department_id') and str(filters['department_id']).strip() and str(filters['department_id']).lower() != 'all'))
         if needs_join:
             join_clause = """
-            INNER JOIN dim_student ds ON fa.student_id = ds.student_id
+            INNER JOIN dim_student ds ON fa.student_key = ds.student_key
             LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
             LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
             LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
@@ -737,7 +698,7 @@ def get_attendance_trends():
         else:
             # For SENATE role, we still need student join for basic query
             join_clause = """
-            INNER JOIN dim_student ds ON fa.student_id = ds.student_id
+            INNER JOIN dim_student ds ON fa.student_key = ds.student_key
             """
         
         query = f"""
@@ -749,14 +710,14 @@ def get_attendance_trends():
             AVG(fa.days_present) as avg_days_present,
             SUM(fa.total_hours) as total_hours,
             SUM(fa.days_present) as total_days_present,
-            COUNT(DISTINCT fa.student_id) as total_students,
-            COUNT(DISTINCT fa.course_code) as total_courses
+            COUNT(DISTINCT fa.student_key) as total_students,
+            COUNT(DISTINCT fa.course_key) as total_courses
         FROM fact_attendance fa
         INNER JOIN dim_time dt ON fa.date_key = dt.date_key
         {join_clause}
         {where_clause}
         GROUP BY dt.year, dt.quarter
-        HAVING COUNT(DISTINCT fa.student_id) > 0
+        HAVING COUNT(DISTINCT fa.student_key) > 0
         ORDER BY dt.year ASC, dt.quarter ASC
         """
         
@@ -764,8 +725,11 @@ def get_attendance_trends():
         print(f"DEBUG: WHERE clause: {where_clause}")
         print(f"DEBUG: JOIN clause: {join_clause[:100] if join_clause else 'None'}...")
         
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
+        gold = get_gold_engine() if not where_clauses else None
+        if gold is not None:
+            df = gold.attendance_trends()
+        else:
+            df = pd.read_sql_query(text(query), engine)
         
         print(f"DEBUG: Query returned {len(df)} rows")
         
@@ -819,7 +783,7 @@ def get_payment_trends():
         except:
             role = Role.FINANCE
         
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         filters = request.args.to_dict()
         
         # Build WHERE clause based on role
@@ -832,7 +796,7 @@ def get_payment_trends():
             where_clauses.append(f"ddept.department_id = {claims['department_id']}")
         elif role == Role.STUDENT:
             if claims.get('student_id'):
-                where_clauses.append(f"fp.student_id = '{claims['student_id']}'")
+                where_clauses.append(f"ds.student_id = '{claims['student_id']}'")
             elif claims.get('access_number'):
                 where_clauses.append(f"ds.access_number = '{claims['access_number']}'")
         
@@ -845,6 +809,8 @@ def get_payment_trends():
             where_clauses.append(f"ds.program_id = {filters['program_id']}")
         if filters.get('semester_id') and str(filters['semester_id']).strip() and str(filters['semester_id']).lower() != 'all':
             where_clauses.append(f"fp.semester_id = {filters['semester_id']}")
+        # Year window (prunes date_key partitions when the facts are partitioned)
+        where_clauses.extend(date_key_range_clauses('fp', filters))
         
         where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
         
@@ -855,7 +821,7 @@ def get_payment_trends():
                      (filters.get('department_id') and str(filters['department_id']).strip() and str(filters['department_id']).lower() != 'all'))
         if needs_join:
             join_clause = """
-            JOIN dim_student ds ON fp.student_id = ds.student_id
+            JOIN dim_student ds ON fp.student_key = ds.student_key
             LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
             LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
             LEFT JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
@@ -863,7 +829,7 @@ def get_payment_trends():
         else:
             # Still need to join with student for basic query
             join_clause = """
-            JOIN dim_student ds ON fp.student_id = ds.student_id
+            JOIN dim_student ds ON fp.student_key = ds.student_key
             """
         
         query = f"""
@@ -880,8 +846,11 @@ def get_payment_trends():
         ORDER BY dt.year, dt.quarter
         """
         
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
+        gold = get_gold_engine() if not where_clauses else None
+        if gold is not None:
+            df = gold.payment_trends()
+        else:
+            df = pd.read_sql_query(text(query), engine)
         
         if not df.empty:
             return jsonify({
@@ -914,7 +883,12 @@ def predict_performance():
         return jsonify({'error': 'Student ID required'}), 400
     
     try:
-        prediction = predictor.predict(student_id)
+        predictor = predictor_service.standard
+        if predictor is None:
+            return jsonify({'error': 'Models not trained'}), 503
+        prediction = prediction_cache.get_or_compute(
+            student_id, 'ensemble', getattr(predictor, 'model_version', None),
+            lambda: float(predictor.predict(student_id)))
         return jsonify({
             'student_id': student_id,
             'predicted_grade': round(float(prediction), 2)
@@ -927,7 +901,7 @@ def predict_performance():
 def get_mex_fex_analysis():
     """Get MEX/FEX analysis with reasons"""
     try:
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        engine = get_warehouse_engine()
         
         # Overall statistics
         overall_query = """
@@ -967,18 +941,17 @@ def get_mex_fex_analysis():
             COUNT(*) as student_count
         FROM (
             SELECT 
-                fg.student_id,
+                fg.student_key,
                 COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as mex_count,
                 AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade
             FROM fact_grade fg
-            GROUP BY fg.student_id
+            GROUP BY fg.student_key
         ) student_stats
         WHERE avg_grade IS NOT NULL
         GROUP BY category
         """
         performance_df = pd.read_sql_query(performance_query, engine)
         
-        engine.dispose()
         
         return jsonify({
             'overall': {
@@ -1002,14 +975,94 @@ def get_mex_fex_analysis():
         return jsonify({'error': str(e)}), 500
 
 
+# Tiles served by /api/dashboard/bundle; each is the JSON of its own endpoint
+DASHBOARD_TILES = {
+    'stats': get_dashboard_stats,
+    'students-by-department': get_students_by_department,
+    'grades-over-time': get_grades_over_time,
+    'payment-status': get_payment_status,
+    'attendance-by-course': get_attendance_by_course,
+    'grade-distribution': get_grade_distribution,
+    'top-students': get_top_students_filtered,
+    'attendance-trends': get_attendance_trends,
+    'payment-trends': get_payment_trends,
+    'mex-fex-analysis': get_mex_fex_analysis,
+}
+_bundle_executor = ThreadPoolExecutor(max_workers=DASHBOARD_BUNDLE_WORKERS, thread_name_prefix='dashboard-tile')
+
+def _render_tile(tile, filters):
+    """Run a tile's view (without re-verifying the JWT) against the shared filters"""
+    view = DASHBOARD_TILES[tile]
+    with app.test_request_context(f'/api/dashboard/{tile}', query_string=filters):
+        response = app.make_response(app.ensure_sync(view.__wrapped__)())
+    return response.status_code, response.get_data()
+
+@app.route('/api/dashboard/bundle', methods=['GET', 'POST'])
+@jwt_required()
+def get_dashboard_bundle():
+    """Several dashboard tiles in one response, rendered concurrently.
+    GET ?tiles=stats,grade-distribution&<filters>&etags=stats:<etag>,...
+    POST {"tiles": [...], "filters": {...}, "etags": {"stats": "<etag>"}}
+    Tiles whose ETag still matches come back as status 304 without data."""
+    try:
+        if request.method == 'POST':
+            body = request.get_json() or {}
+            tiles = body.get('tiles') or list(DASHBOARD_TILES)
+            filters = body.get('filters', {})
+            etags = body.get('etags', {})
+        else:
+            filters = request.args.to_dict()
+            tiles = [t for t in filters.pop('tiles', '').split(',') if t] or list(DASHBOARD_TILES)
+            etags = dict(pair.split(':', 1) for pair in filters.pop('etags', '').split(',') if ':' in pair)
+        
+        unknown = [t for t in tiles if t not in DASHBOARD_TILES]
+        if unknown:
+            return jsonify({'error': f"Unknown tiles: {', '.join(unknown)}", 'tiles': list(DASHBOARD_TILES)}), 400
+        
+        # Tiles share this request's app context, so they read the already verified JWT
+        futures = {tile: _bundle_executor.submit(contextvars.copy_context().run, _render_tile, tile, filters)
+                   for tile in dict.fromkeys(tiles)}
+        payload = {}
+        for tile, future in futures.items():
+            try:
+                status, body = future.result()
+            except Exception as e:
+                print(f"Error rendering dashboard tile {tile}: {e}")
+                payload[tile] = {'status': 500, 'error': str(e)}
+                continue
+            etag = hashlib.md5(body).hexdigest()
+            if status == 200 and etags.get(tile) == etag:
+                payload[tile] = {'status': 304, 'etag': etag}
+            else:
+                payload[tile] = {'status': status, 'etag': etag, 'data': json.loads(body)}
+        
+        response = jsonify({'tiles': payload, 'generated_at': datetime.now().isoformat()})
+        response.set_etag(hashlib.md5(''.join(t.get('etag', '') for t in payload.values()).encode()).hexdigest())
+        return response.make_conditional(request)
+    except Exception as e:
+        import traceback
+        print(f"Error in get_dashboard_bundle: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/report/generate', methods=['POST', 'GET'])
 @jwt_required()
 def generate_report():
-    """Generate PDF report"""
+    """Generate PDF report (pass async=true to run it as a background job)"""
     from pdf_generator import PDFReportGenerator
     from flask import send_file
     import os
     
+    if request.values.get('async', '').lower() in ('1', 'true', 'yes'):
+        from flask_jwt_extended import get_jwt_identity
+        from jobs import job_queue
+        # The generator reads the dashboard endpoints with the caller's token
+        job = job_queue.submit('report', get_jwt_identity(), {
+            'api_base_url': request.host_url.rstrip('/'),
+            'token': request.headers.get('Authorization', '').replace('Bearer ', ''),
+        })
+        return jsonify(job), 202
+    
     try:
         # Generate PDF
         generator = PDFReportGenerator(
@@ -1049,9 +1102,9 @@ def generate_report():
         dept_query = """
         SELECT 
             dc.department,
-            COUNT(DISTINCT fe.student_id) as student_count
+            COUNT(DISTINCT fe.student_key) as student_count
         FROM fact_enrollment fe
-        JOIN dim_course dc ON fe.course_code = dc.course_code
+        JOIN dim_course dc ON fe.course_key = dc.course_key
         GROUP BY dc.department
         """
         departments = pd.read_sql_query(dept_query, engine).to_dict('records')
@@ -1082,6 +1135,7 @@ if __name__ == '__main__':
     print("  - Auth: /api/auth/login, /api/auth/profile")
     print("  - Analytics: /api/analytics/fex, /api/analytics/high-school")
     print("  - Predictions: /api/predictions/predict, /api/predictions/scenario")
-    print("  - Dashboard: /api/dashboard/stats")
+    print("  - Dashboard: /api/dashboard/stats, /api/dashboard/bundle")
+    print("  - Jobs: /api/jobs/<job_id>, /api/jobs/<job_id>/download")
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,89 @@
+"""
+Async Warehouse Access
+Runs the independent queries of a multi-query endpoint (dashboard stats, filter
+options) concurrently, so the request waits for the slowest query instead of
+the sum of all of them. Uses SQLAlchemy's asyncio extension with the aiomysql
+driver when it is installed and falls back to running the PyMySQL engine in
+threads, so results are identical either way.
+The async views run under the usual threaded WSGI server: Flask gives each one
+an event loop in its request thread, so requests stay as concurrent as before
+and the queries within one request overlap.
+The pooled PyMySQL engine is also shared by the synchronous dashboard views.
+"""
+import asyncio
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from config import (DATA_WAREHOUSE_CONN_STRING, ASYNC_DATA_WAREHOUSE_CONN_STRING, ASYNC_QUERY_CONCURRENCY,
+                    WAREHOUSE_POOL_SIZE)
+
+_async_engine = None
+_sync_engine = None
+_driver_missing = False
+
+
+def _get_async_engine():
+    global _async_engine, _driver_missing
+    if _async_engine is None and not _driver_missing:
+        try:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            # Flask runs every async view on its own event loop; pooled connections
+            # cannot move between loops, so each query opens its own connection
+            _async_engine = create_async_engine(ASYNC_DATA_WAREHOUSE_CONN_STRING, poolclass=NullPool)
+        except ImportError as e:
+            print(f"Async warehouse driver unavailable ({e}); running queries in threads")
+            _driver_missing = True
+    return _async_engine
+
+
+def get_warehouse_engine():
+    """Shared pooled PyMySQL engine for the dashboard views (thread-safe; do not dispose)"""
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(DATA_WAREHOUSE_CONN_STRING, pool_pre_ping=True,
+                                     pool_size=WAREHOUSE_POOL_SIZE, max_overflow=WAREHOUSE_POOL_SIZE)
+    return _sync_engine
+
+
+def _records(result):
+    # Match pandas' coerce_float so the JSON is the same as the read_sql_query endpoints
+    return [{key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+            for row in result.mappings().all()]
+
+
+def _fetch_sync(sql, params):
+    with get_warehouse_engine().connect() as conn:
+        return _records(conn.execute(text(sql), params or {}))
+
+
+async def fetch_records(sql, params=None):
+    """Run one query and return its rows as a list of dicts"""
+    engine = _get_async_engine()
+    if engine is None:
+        return await asyncio.to_thread(_fetch_sync, sql, params)
+    async with engine.connect() as conn:
+        return _records(await conn.execute(text(sql), params or {}))
+
+
+async def gather_records(queries, concurrency=ASYNC_QUERY_CONCURRENCY):
+    """Run {name: sql or (sql, params)} concurrently; failed queries map to their exception"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(query):
+        sql, params = query if isinstance(query, tuple) else (query, None)
+        async with semaphore:
+            return await fetch_records(sql, params)
+
+    results = await asyncio.gather(*(run(query) for query in queries.values()), return_exceptions=True)
+    return dict(zip(queries, results))
+
+
+def current_generation(engine=None):
+    """Latest warehouse generation swapped in by the ETL (etl_generation), or None if unknown"""
+    try:
+        with (engine or get_warehouse_engine()).connect() as conn:
+            return conn.execute(text("SELECT MAX(generation) FROM etl_generation")).scalar()
+    except Exception:
+        # Warehouses loaded before generations were recorded have no marker table
+        return None
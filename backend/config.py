@@ -51,12 +51,104 @@ CSV2_PATH = BASE_DIR / "data" / "source_data2.csv"
 BRONZE_PATH = BASE_DIR / "data" / "bronze"
 SILVER_PATH = BASE_DIR / "data" / "silver"
 GOLD_PATH = BASE_DIR / "data" / "gold"
+# Fact rows rejected by the referential-integrity check during a warehouse load
+QUARANTINE_PATH = BASE_DIR / "data" / "quarantine"
 
 # Create directories
-for path in [BRONZE_PATH, SILVER_PATH, GOLD_PATH]:
+for path in [BRONZE_PATH, SILVER_PATH, GOLD_PATH, QUARANTINE_PATH]:
     path.mkdir(parents=True, exist_ok=True)
 
 # Flask configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
 
+
+# Gold layer serving path (partitioned parquet published by the ETL)
+# MySQL stays the system of record; the gold layer only answers read-only analytics
+GOLD_PUBLISH_ENABLED = os.environ.get('GOLD_PUBLISH_ENABLED', 'true').lower() == 'true'
+GOLD_SERVING_ENABLED = os.environ.get('GOLD_SERVING_ENABLED', 'false').lower() == 'true'
+GOLD_KEEP_GENERATIONS = int(os.environ.get('GOLD_KEEP_GENERATIONS', '2'))
+
+# Data lake retention: number of bronze/silver snapshots kept as individual files
+# Older snapshots are compacted into one deduplicated, zstd-compressed dataset per table
+LAKE_KEEP_SNAPSHOTS = int(os.environ.get('LAKE_KEEP_SNAPSHOTS', '5'))
+
+# Warehouse load profile: facts are created with only a primary key and get their secondary
+# indexes and foreign keys in one ALTER TABLE after the bulk insert (set to false for inline DDL)
+WAREHOUSE_DEFER_INDEXES = os.environ.get('WAREHOUSE_DEFER_INDEXES', 'true').lower() == 'true'
+WAREHOUSE_LOAD_CHUNKSIZE = int(os.environ.get('WAREHOUSE_LOAD_CHUNKSIZE', '1000'))
+# Session variables applied while inserting facts (restored to 1 afterwards)
+WAREHOUSE_LOAD_SESSION = {
+    'unique_checks': int(os.environ.get('WAREHOUSE_LOAD_UNIQUE_CHECKS', '0')),
+    'foreign_key_checks': int(os.environ.get('WAREHOUSE_LOAD_FOREIGN_KEY_CHECKS', '0')),
+}
+# RANGE partitioning of fact_attendance/fact_payment/fact_grade on date_key: none, year or semester
+WAREHOUSE_PARTITIONING = os.environ.get('WAREHOUSE_PARTITIONING', 'none').lower()
+
+# Query workload capture for index_advisor.py (records normalized warehouse SELECTs)
+QUERY_WORKLOAD_CAPTURE = os.environ.get('QUERY_WORKLOAD_CAPTURE', 'false').lower() == 'true'
+QUERY_WORKLOAD_PATH = Path(os.environ.get('QUERY_WORKLOAD_PATH', str(BASE_DIR / "data" / "query_workload.json")))
+
+# Background jobs (jobs.py): long reports, exports and batch predictions run in a local process pool
+# Job state lives in a sqlite table next to the artifacts; no external broker is needed
+JOBS_DB_PATH = Path(os.environ.get('JOBS_DB_PATH', str(BASE_DIR / "data" / "jobs.db")))
+JOBS_ARTIFACT_PATH = Path(os.environ.get('JOBS_ARTIFACT_PATH', str(BASE_DIR / "data" / "jobs")))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Finished jobs and their artifacts are removed after this many hours
+JOB_RESULT_TTL_HOURS = float(os.environ.get('JOB_RESULT_TTL_HOURS', '24'))
+
+# Async warehouse access for the multi-query dashboard endpoints (async_warehouse.py)
+# Uses aiomysql when installed, otherwise runs the PyMySQL engine in threads
+ASYNC_DATA_WAREHOUSE_CONN_STRING = os.environ.get(
+    'ASYNC_DATA_WAREHOUSE_CONN_STRING', DATA_WAREHOUSE_CONN_STRING.replace('mysql+pymysql://', 'mysql+aiomysql://', 1))
+# Maximum warehouse queries one request runs at the same time
+ASYNC_QUERY_CONCURRENCY = int(os.environ.get('ASYNC_QUERY_CONCURRENCY', '6'))
+
+# Connection pool of the shared dashboard engine (async_warehouse.get_warehouse_engine)
+WAREHOUSE_POOL_SIZE = int(os.environ.get('WAREHOUSE_POOL_SIZE', '10'))
+# Threads running the tiles of /api/dashboard/bundle (shared by all bundle requests)
+DASHBOARD_BUNDLE_WORKERS = int(os.environ.get('DASHBOARD_BUNDLE_WORKERS', '8'))
+
+# Trained models (predictor_service.py): seconds between checks for newer model files written by train_models.py
+MODEL_RELOAD_CHECK_SECONDS = float(os.environ.get('MODEL_RELOAD_CHECK_SECONDS', '30'))
+
+# Prediction results cached per (student, model, model version, warehouse generation) (prediction_cache.py)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '10000'))
+# Also keep results in a sqlite table shared by all workers on the host
+PREDICTION_CACHE_PERSIST = os.environ.get('PREDICTION_CACHE_PERSIST', 'false').lower() == 'true'
+PREDICTION_CACHE_DB_PATH = Path(os.environ.get('PREDICTION_CACHE_DB_PATH', str(BASE_DIR / "data" / "prediction_cache.db")))
+# Seconds between checks of etl_generation for a newly swapped-in warehouse
+WAREHOUSE_GENERATION_CHECK_SECONDS = float(os.environ.get('WAREHOUSE_GENERATION_CHECK_SECONDS', '30'))
+
+# Score every active student into fact_prediction after each ETL load (risk_scoring.py)
+RISK_SCORING_AFTER_ETL = os.environ.get('RISK_SCORING_AFTER_ETL', 'true').lower() == 'true'
+
+# Incremental retraining (python train_models.py --incremental, ml_models.train_incremental)
+# Skip retraining when fewer than this fraction of students changed since the last training
+RETRAIN_DRIFT_THRESHOLD = float(os.environ.get('RETRAIN_DRIFT_THRESHOLD', '0.02'))
+# Train from scratch when at least this fraction changed
+RETRAIN_FULL_DRIFT_THRESHOLD = float(os.environ.get('RETRAIN_FULL_DRIFT_THRESHOLD', '0.5'))
+# Trees replaced in the random forest and stages added to gradient boosting per incremental run
+RETRAIN_WARM_START_TREES = int(os.environ.get('RETRAIN_WARM_START_TREES', '20'))
+# Gradient boosting is trained from scratch once warm starts would grow it past this many stages
+RETRAIN_MAX_BOOSTING_STAGES = int(os.environ.get('RETRAIN_MAX_BOOSTING_STAGES', '500'))
+# partial_fit passes of the neural network over the changed students
+RETRAIN_MLP_EPOCHS = int(os.environ.get('RETRAIN_MLP_EPOCHS', '5'))
+
+# Hyperparameter search (model_tuning.py, python train_models.py --tune)
+# Wall-clock limit of one search over all tuned models
+TUNING_TIME_BUDGET_SECONDS = float(os.environ.get('TUNING_TIME_BUDGET_SECONDS', '600'))
+# Random candidates per model at the first successive-halving level
+TUNING_CANDIDATES = int(os.environ.get('TUNING_CANDIDATES', '27'))
+TUNING_CV_FOLDS = int(os.environ.get('TUNING_CV_FOLDS', '5'))
+# Tune on every full training, not only with --tune
+TUNE_ON_RETRAIN = os.environ.get('TUNE_ON_RETRAIN', 'false').lower() == 'true'
+
+# Model registry (model_registry.py): one compressed joblib artifact per model, versioned with a manifest
+MODEL_REGISTRY_PATH = Path(os.environ.get('MODEL_REGISTRY_PATH', str(BASE_DIR / "models" / "registry")))
+# joblib compression level (0-9); higher is smaller on disk but slower to save
+MODEL_REGISTRY_COMPRESS = int(os.environ.get('MODEL_REGISTRY_COMPRESS', '3'))
+# Versions kept per model set for rollback
+MODEL_REGISTRY_KEEP_VERSIONS = int(os.environ.get('MODEL_REGISTRY_KEEP_VERSIONS', '5'))
+# Comma-separated model names this process loads (e.g. random_forest,tuition_attendance_performance); empty loads all
+SERVED_MODELS = [name.strip() for name in os.environ.get('SERVED_MODELS', '').split(',') if name.strip()]
@@ -9,6 +9,7 @@ Includes:
 """
 import pandas as pd
 import numpy as np
+import os
 import pickle
 from pathlib import Path
 from sklearn.model_selection import train_test_split, cross_val_score
@@ -18,7 +19,162 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error, accuracy_score, classification_report
 from sqlalchemy import create_engine, text
 from config import DATA_WAREHOUSE_CONN_STRING
+from model_registry import model_registry
+from tree_compiler import compile_models, predict_with
 from datetime import datetime, timedelta
+import threading
+import time
+
+ENROLLMENT_SERIES_QUERY = """
+SELECT 
+    dp.program_id,
+    ddept.department_id,
+    df.faculty_id,
+    dt.year,
+    dt.quarter,
+    COUNT(DISTINCT fe.student_key) as enrollment_count,
+    COUNT(DISTINCT fe.course_key) as courses_enrolled,
+    AVG(dc.credits) as avg_credits
+FROM fact_enrollment fe
+JOIN dim_time dt ON fe.date_key = dt.date_key
+JOIN dim_student ds ON fe.student_key = ds.student_key
+JOIN dim_program dp ON ds.program_id = dp.program_id
+JOIN dim_department ddept ON dp.department_id = ddept.department_id
+JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
+LEFT JOIN dim_course dc ON fe.course_key = dc.course_key
+GROUP BY dp.program_id, ddept.department_id, df.faculty_id, dt.year, dt.quarter
+ORDER BY dt.year, dt.quarter
+"""
+
+def load_enrollment_series(engine=None):
+    """Historical enrollment per (program, year, quarter)"""
+    own_engine = engine is None
+    engine = engine or create_engine(DATA_WAREHOUSE_CONN_STRING)
+    try:
+        return pd.read_sql_query(text(ENROLLMENT_SERIES_QUERY), engine)
+    finally:
+        if own_engine:
+            engine.dispose()
+
+# Tuition + attendance features as served (per student, no grade join); {where} narrows it to one student
+TUITION_ATTENDANCE_SERVING_QUERY = """
+SELECT 
+    ds.student_id,
+    -- Tuition Features (must match training query exactly)
+    COALESCE(SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END), 0) as total_paid,
+    COALESCE(SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END), 0) as total_pending,
+    COALESCE(SUM(fp.amount), 0) as total_required,
+    CASE 
+        WHEN SUM(fp.amount) > 0 
+        THEN SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) / SUM(fp.amount) * 100
+        ELSE 0 
+    END as payment_completion_rate,
+    COUNT(CASE WHEN fp.status = 'Completed' THEN 1 END) as completed_payments,
+    DATEDIFF(CURDATE(), MAX(CASE WHEN fp.status = 'Completed' THEN fp.date_key ELSE NULL END)) as days_since_last_payment,
+    CASE 
+        WHEN SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END) > 500000 
+        THEN 1 ELSE 0 
+    END as has_significant_balance,
+    -- Attendance Features
+    COALESCE(SUM(fa.total_hours), 0) as total_attendance_hours,
+    COALESCE(SUM(fa.days_present), 0) as total_days_present,
+    COALESCE(COUNT(fa.attendance_id), 0) as total_attendance_records,
+    CASE 
+        WHEN COUNT(fa.attendance_id) > 0 AND SUM(COALESCE(fa.days_present, 0)) > 0
+        THEN LEAST(100.0, (SUM(COALESCE(fa.days_present, 0)) / NULLIF(COUNT(fa.attendance_id), 0)) * 100.0)
+        ELSE 0.0 
+    END as attendance_rate,
+    COALESCE(COUNT(DISTINCT fa.course_key), 0) as courses_attended,
+    COALESCE(AVG(fa.total_hours), 0) as avg_hours_per_course,
+    -- Combined Features
+    CASE 
+        WHEN COUNT(fa.attendance_id) > 0 AND SUM(fp.amount) > 0
+        THEN ((SUM(fa.days_present) / COUNT(fa.attendance_id)) * 100) * 
+             (SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) / SUM(fp.amount) * 100) / 100
+        ELSE 0 
+    END as attendance_payment_score
+FROM dim_student ds
+LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
+{where}
+GROUP BY ds.student_id
+"""
+
+def load_tuition_attendance_features(student_id=None, engine=None):
+    """Serving features of the tuition-attendance-performance model for one student
+    (student_id or access number), or for every student when student_id is None"""
+    own_engine = engine is None
+    engine = engine or create_engine(DATA_WAREHOUSE_CONN_STRING)
+    where = "WHERE ds.student_id = :student_id OR ds.access_number = :student_id" if student_id is not None else ""
+    try:
+        return pd.read_sql_query(text(TUITION_ATTENDANCE_SERVING_QUERY.format(where=where)), engine,
+                                 params={'student_id': student_id} if student_id is not None else None)
+    finally:
+        if own_engine:
+            engine.dispose()
+
+def enrollment_trend_features(series, cells):
+    """Lag features for the (program_id, year, quarter) rows of cells, looked up in series.
+    enrollment_lag1/lag2 are the same quarter one and two years earlier; enrollment_ma3
+    averages the same quarter over the three previous years."""
+    counts = series.groupby(['program_id', 'year', 'quarter'])['enrollment_count'].sum()
+    lags = np.column_stack([
+        counts.reindex(pd.MultiIndex.from_arrays([cells['program_id'], cells['year'] - k, cells['quarter']])).to_numpy(dtype=float)
+        for k in (1, 2, 3)
+    ])
+    cells = cells.copy()
+    cells['enrollment_lag1'] = lags[:, 0]
+    cells['enrollment_lag2'] = lags[:, 1]
+    observed = ~np.isnan(lags)
+    cells['enrollment_ma3'] = np.where(observed.any(axis=1), np.nansum(lags, axis=1) / np.maximum(observed.sum(axis=1), 1), np.nan)
+    return cells
+
+def _shift_quarter(year, quarter, steps):
+    index = int(year) * 4 + int(quarter) - 1 + steps
+    return index // 4, index % 4 + 1
+
+class EnrollmentSeriesCache:
+    """The enrollment series kept in memory until the ETL swaps in a new warehouse generation"""
+    
+    # Without a generation marker the series is re-read after this many seconds
+    UNVERSIONED_TTL = 600
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._loaded_at = 0.0
+        self._series = None
+    
+    def get(self):
+        from async_warehouse import current_generation, get_warehouse_engine
+        generation = current_generation()
+        with self._lock:
+            stale = (self._series is None or generation != self._generation or
+                     (generation is None and time.monotonic() - self._loaded_at > self.UNVERSIONED_TTL))
+            if stale:
+                self._series = load_enrollment_series(get_warehouse_engine())
+                self._generation = generation
+                self._loaded_at = time.monotonic()
+            return self._series, self._generation
+
+enrollment_series_cache = EnrollmentSeriesCache()
+
+MODEL_SET = 'enhanced'
+# Monolithic pickle written before the model registry; still loaded when nothing is registered
+LEGACY_MODEL_FILE = 'enhanced_predictor.pkl'
+# Label encoders stored with each model's registry artifact
+MODEL_LABEL_ENCODERS = {
+    'enrollment_trend': ['enrollment_trend_program', 'enrollment_trend_dept', 'enrollment_trend_faculty'],
+    'foundational_course': ['foundational_course_code', 'foundational_program'],
+}
+# Key of each model's metrics in the train_all_models() results
+MODEL_RESULT_KEYS = {
+    'tuition_attendance_performance': 'tuition_attendance',
+    'enrollment_trend': 'enrollment_trend',
+    'foundational_course': 'foundational_course',
+    'hr_employment_status': 'hr',
+}
+
 
 class EnhancedPredictor:
     """Enhanced prediction models for multiple use cases"""
@@ -30,6 +186,13 @@ class EnhancedPredictor:
         self.model_path = Path(__file__).parent / "models"
         self.model_path.mkdir(parents=True, exist_ok=True)
         self.feature_cols = {}
+        self.compiled_models = {}  # Array-backed copies of the tree-ensemble regressors (tree_compiler.py)
+        self.model_version = None  # Registry version the models were loaded from (model_registry.py)
+        self._training_version = None  # Registry version a running train_all_models() saves into
+    
+    def predict_model(self, name, X_scaled):
+        """Predict with a trained model, through its compiled ensemble when it has one"""
+        return predict_with(self.models[name], self.compiled_models.get(name), X_scaled)
     
     # ==================== 1. TUITION + ATTENDANCE → PERFORMANCE ====================
     
@@ -59,7 +222,7 @@ class EnhancedPredictor:
             -- Attendance Features
             COALESCE(SUM(fa.total_hours), 0) as total_attendance_hours,
             COALESCE(SUM(fa.days_present), 0) as total_days_present,
-            COALESCE(COUNT(DISTINCT fa.course_code), 0) as courses_attended,
+            COALESCE(COUNT(DISTINCT fa.course_key), 0) as courses_attended,
             CASE 
                 WHEN COUNT(fa.attendance_id) > 0 
                 THEN (SUM(fa.days_present) / COUNT(fa.attendance_id)) * 100
@@ -79,9 +242,9 @@ class EnhancedPredictor:
             COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as missed_exams,
             COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as failed_exams
         FROM dim_student ds
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
-        LEFT JOIN fact_grade fg ON ds.student_id = fg.student_id
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+        LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
+        LEFT JOIN fact_grade fg ON ds.student_key = fg.student_key
         GROUP BY ds.student_id
         HAVING COUNT(CASE WHEN fg.exam_status = 'Completed' THEN 1 END) > 0
         """
@@ -146,44 +309,11 @@ class EnhancedPredictor:
     
     # ==================== 2. ENROLLMENT/REGISTRATION TRENDS ====================
     
-    def prepare_enrollment_trend_features(self):
-        """Prepare features for enrollment/registration trend prediction"""
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
-        
-        query = """
-        SELECT 
-            dt.year,
-            dt.quarter,
-            dp.program_id,
-            ddept.department_id,
-            df.faculty_id,
-            ds.high_school,
-            ds.region,
-            COUNT(DISTINCT fe.student_id) as enrollment_count,
-            COUNT(DISTINCT fe.course_code) as courses_enrolled,
-            AVG(dc.credits) as avg_credits,
-            COUNT(DISTINCT fe.semester_id) as semesters_count
-        FROM fact_enrollment fe
-        JOIN dim_time dt ON fe.date_key = dt.date_key
-        JOIN dim_student ds ON fe.student_id = ds.student_id
-        JOIN dim_program dp ON ds.program_id = dp.program_id
-        JOIN dim_department ddept ON dp.department_id = ddept.department_id
-        JOIN dim_faculty df ON ddept.faculty_id = df.faculty_id
-        LEFT JOIN dim_course dc ON fe.course_code = dc.course_code
-        GROUP BY dt.year, dt.quarter, dp.program_id, ddept.department_id, 
-                 df.faculty_id, ds.high_school, ds.region
-        ORDER BY dt.year, dt.quarter
-        """
-        
-        df = pd.read_sql_query(text(query), engine)
-        engine.dispose()
-        
-        # Create lag features for trend prediction
-        df = df.sort_values(['year', 'quarter', 'program_id'])
-        df['enrollment_lag1'] = df.groupby(['program_id', 'quarter'])['enrollment_count'].shift(1)
-        df['enrollment_lag2'] = df.groupby(['program_id', 'quarter'])['enrollment_count'].shift(2)
-        df['enrollment_ma3'] = df.groupby(['program_id', 'quarter'])['enrollment_count'].rolling(3).mean().reset_index(0, drop=True)
-        
+    def prepare_enrollment_trend_features(self, series=None):
+        """Prepare features for enrollment/registration trend prediction (one row per program and quarter)"""
+        if series is None:
+            series = load_enrollment_series()
+        df = enrollment_trend_features(series, series)
         df = df.fillna(0)
         
         return df
@@ -242,44 +372,140 @@ class EnhancedPredictor:
         
         return {'r2': r2, 'rmse': rmse}
     
+    def forecast_enrollment(self, series, program_ids, start_year, start_quarter, horizon=1):
+        """Forecast enrollment for every program and quarter of the horizon in batched model calls.
+        Returns (forecasts DataFrame, program_ids the model has never seen)."""
+        scaler = self.scalers['enrollment_trend']
+        encoders = [('program_id', 'program_encoded', self.label_encoders['enrollment_trend_program']),
+                    ('department_id', 'dept_encoded', self.label_encoders['enrollment_trend_dept']),
+                    ('faculty_id', 'faculty_encoded', self.label_encoders['enrollment_trend_faculty'])]
+        
+        programs = series.sort_values(['year', 'quarter']).groupby('program_id')[['department_id', 'faculty_id']].last()
+        programs = programs[programs.index.isin(program_ids)].reset_index()
+        known_mask = np.ones(len(programs), dtype=bool)
+        for column, _, encoder in encoders:
+            known_mask &= programs[column].astype(str).isin(encoder.classes_)
+        unknown = programs.loc[~known_mask, 'program_id'].tolist() + [p for p in program_ids if p not in set(programs['program_id'])]
+        programs = programs[known_mask]
+        
+        requested = [_shift_quarter(start_year, start_quarter, step) for step in range(horizon)]
+        columns = ['program_id', 'department_id', 'faculty_id', 'year', 'quarter', 'predicted_enrollment']
+        if programs.empty:
+            return pd.DataFrame(columns=columns), unknown
+        
+        # Quarters between the last observed one and the horizon are forecast too, so every lag is filled
+        last_year, last_quarter = series[['year', 'quarter']].sort_values(['year', 'quarter']).iloc[-1]
+        first = min(requested[0], _shift_quarter(last_year, last_quarter, 1))
+        periods = []
+        while not periods or periods[-1] < requested[-1]:
+            periods.append(_shift_quarter(*first, len(periods)))
+        grid = programs.merge(pd.DataFrame(periods, columns=['year', 'quarter']), how='cross')
+        
+        # Courses and credits carry forward from the latest observation of that program and quarter
+        latest = series.sort_values('year').groupby(['program_id', 'quarter'])[['courses_enrolled', 'avg_credits']].last()
+        grid = grid.join(latest, on=['program_id', 'quarter'])
+        for column, encoded, encoder in encoders:
+            grid[encoded] = encoder.transform(grid[column].astype(str))
+        
+        # Lags reach back whole years, so each calendar year is one batch fed by the years before it
+        known = series[['program_id', 'year', 'quarter', 'enrollment_count']]
+        forecasts = []
+        for _, cells in grid.groupby('year', sort=True):
+            cells = enrollment_trend_features(known, cells).fillna(0)
+            X = scaler.transform(cells[self.feature_cols['enrollment_trend']])
+            cells['predicted_enrollment'] = np.clip(self.predict_model('enrollment_trend', X), 0, None)
+            forecasts.append(cells)
+            # Observed quarters keep their actual counts as lags for later years
+            known = pd.concat([known, cells[['program_id', 'year', 'quarter', 'predicted_enrollment']]
+                               .rename(columns={'predicted_enrollment': 'enrollment_count'})], ignore_index=True)
+            known = known.drop_duplicates(['program_id', 'year', 'quarter'], keep='first')
+        
+        result = pd.concat(forecasts, ignore_index=True)
+        requested = set(requested)
+        result = result[[(y, q) in requested for y, q in zip(result['year'], result['quarter'])]]
+        return result[columns].sort_values(['year', 'quarter', 'program_id']).reset_index(drop=True), unknown
+    
     # ==================== 3. COURSE PERFORMANCE (FOUNDATIONAL) ====================
     
     def prepare_foundational_course_features(self):
-        """Prepare features for foundational course performance prediction"""
+        """Prepare features for foundational course performance prediction.
+        Built from per-(student, course) aggregates: the student's performance in
+        their other courses is their total minus this course's contribution, which
+        keeps the cost linear in fact rows instead of self-joining fact_grade."""
         engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
         
-        query = """
+        foundational = "CASE WHEN course_level IN ('100', '101', '102', '103', '104', '105', '106', '107', '108', '109', '110') THEN 1 ELSE 0 END"
+        courses = pd.read_sql_query(text(f"""
+        SELECT course_key, course_code, course_name, credits, {foundational} as is_foundational
+        FROM dim_course
+        WHERE {foundational} = 1
+        """), engine)
+        students = pd.read_sql_query(text("""
+        SELECT student_key, student_id, program_id, year_of_study FROM dim_student
+        """), engine)
+        grades = pd.read_sql_query(text("""
         SELECT 
-            fg.course_code,
-            dc.course_name,
-            dc.credits,
-            CASE WHEN dc.course_level IN ('100', '101', '102', '103', '104', '105', '106', '107', '108', '109', '110') THEN 1 ELSE 0 END as is_foundational,
-            fg.student_id,
-            ds.program_id,
-            ds.year_of_study,
-            -- Student performance history
-            AVG(CASE WHEN fg2.exam_status = 'Completed' THEN fg2.grade ELSE NULL END) as student_avg_grade,
-            COUNT(CASE WHEN fg2.exam_status = 'Completed' THEN 1 END) as student_completed_exams,
-            -- Course-specific features
-            AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as course_avg_grade,
-            COUNT(CASE WHEN fg.exam_status = 'Completed' THEN 1 END) as course_completed_count,
-            COUNT(CASE WHEN fg.exam_status = 'FEX' THEN 1 END) as course_fex_count,
-            COUNT(CASE WHEN fg.exam_status = 'MEX' THEN 1 END) as course_mex_count,
-            -- Attendance for this course
-            AVG(fa.total_hours) as course_attendance_hours,
-            AVG(fa.days_present) as course_days_present
-        FROM fact_grade fg
-        JOIN dim_course dc ON fg.course_code = dc.course_code
-        JOIN dim_student ds ON fg.student_id = ds.student_id
-        LEFT JOIN fact_grade fg2 ON ds.student_id = fg2.student_id AND fg2.course_code != fg.course_code
-        LEFT JOIN fact_attendance fa ON fg.student_id = fa.student_id AND fg.course_code = fa.course_code
-        WHERE CASE WHEN dc.course_level IN ('100', '101', '102', '103', '104', '105', '106', '107', '108', '109', '110') THEN 1 ELSE 0 END = 1
-        GROUP BY fg.course_code, dc.course_name, dc.credits, fg.student_id, ds.program_id, ds.year_of_study
-        """
-        
-        df = pd.read_sql_query(text(query), engine)
+            student_key,
+            course_key,
+            COUNT(*) as grade_rows,
+            SUM(CASE WHEN exam_status = 'Completed' THEN grade ELSE 0 END) as completed_sum,
+            COUNT(CASE WHEN exam_status = 'Completed' THEN 1 END) as completed_count,
+            COUNT(CASE WHEN exam_status = 'FEX' THEN 1 END) as fex_count,
+            COUNT(CASE WHEN exam_status = 'MEX' THEN 1 END) as mex_count
+        FROM fact_grade
+        WHERE student_key IS NOT NULL AND course_key IS NOT NULL
+        GROUP BY student_key, course_key
+        """), engine)
+        attendance = pd.read_sql_query(text("""
+        SELECT 
+            student_key,
+            course_key,
+            COUNT(*) as attendance_rows,
+            SUM(total_hours) as hours_sum,
+            COUNT(total_hours) as hours_count,
+            SUM(days_present) as days_sum,
+            COUNT(days_present) as days_count
+        FROM fact_attendance
+        GROUP BY student_key, course_key
+        """), engine)
         engine.dispose()
         
+        totals = ['grade_rows', 'completed_sum', 'completed_count']
+        student_totals = grades.groupby('student_key')[totals].sum()
+        
+        df = (grades.merge(courses, on='course_key')
+                    .merge(students, on='student_key')
+                    .merge(attendance, on=['student_key', 'course_key'], how='left'))
+        
+        # Student performance history: every other course the student sat
+        other = student_totals.reindex(df['student_key']).to_numpy() - df[totals].to_numpy()
+        other_rows, other_sum, other_count = other[:, 0], other[:, 1], other[:, 2]
+        
+        # The per-row counts below reproduce the row fan-out of the former
+        # fact_grade x fact_grade x fact_attendance join, so the features (and the
+        # models trained on them) are unchanged; averages are unaffected by it
+        attendance_fanout = df['attendance_rows'].fillna(0).clip(lower=1)
+        other_fanout = pd.Series(other_rows, index=df.index).clip(lower=1)
+        
+        df['student_avg_grade'] = pd.Series(other_sum, index=df.index) / pd.Series(other_count, index=df.index).where(other_count > 0)
+        df['student_completed_exams'] = other_count * df['grade_rows'] * attendance_fanout
+        df['course_avg_grade'] = df['completed_sum'] / df['completed_count'].where(df['completed_count'] > 0)
+        df['course_completed_count'] = df['completed_count'] * attendance_fanout * other_fanout
+        df['course_fex_count'] = df['fex_count'] * attendance_fanout * other_fanout
+        df['course_mex_count'] = df['mex_count'] * attendance_fanout * other_fanout
+        df['course_attendance_hours'] = df['hours_sum'] / df['hours_count'].where(df['hours_count'] > 0)
+        df['course_days_present'] = df['days_sum'] / df['days_count'].where(df['days_count'] > 0)
+        count_cols = ['student_completed_exams', 'course_completed_count', 'course_fex_count', 'course_mex_count']
+        df[count_cols] = df[count_cols].round().astype(int)
+        
+        df = df[[
+            'course_code', 'course_name', 'credits', 'is_foundational',
+            'student_id', 'program_id', 'year_of_study',
+            'student_avg_grade', 'student_completed_exams',
+            'course_avg_grade', 'course_completed_count', 'course_fex_count', 'course_mex_count',
+            'course_attendance_hours', 'course_days_present'
+        ]].reset_index(drop=True)
+        
         # Calculate target: Will student pass this foundational course?
         df['will_pass'] = (df['course_avg_grade'] >= 50).astype(int)
         
@@ -434,21 +660,45 @@ class EnhancedPredictor:
     
     # ==================== SAVE/LOAD MODELS ====================
     
-    def save_all_models(self):
-        """Save all trained models"""
-        model_data = {
-            'models': self.models,
-            'scalers': self.scalers,
-            'label_encoders': self.label_encoders,
-            'feature_cols': self.feature_cols
-        }
-        with open(self.model_path / 'enhanced_predictor.pkl', 'wb') as f:
-            pickle.dump(model_data, f)
-        print("All models saved successfully!")
+    def save_all_models(self, metrics=None, activate=True):
+        """Save all trained models to the registry, one artifact per model.
+        Saves made during train_all_models() go into one version, which is only served once complete."""
+        metrics = metrics or {}
+        artifacts = {}
+        for name, model in self.models.items():
+            artifacts[name] = {
+                'payload': {
+                    'model': model,
+                    'scaler': self.scalers.get(name),
+                    'feature_cols': self.feature_cols.get(name),
+                    'label_encoders': {key: self.label_encoders[key]
+                                       for key in MODEL_LABEL_ENCODERS.get(name, []) if key in self.label_encoders},
+                },
+                'metrics': metrics.get(MODEL_RESULT_KEYS.get(name, name)),
+                'feature_cols': self.feature_cols.get(name),
+            }
+        version = model_registry.publish(MODEL_SET, artifacts, version=self._training_version, activate=activate)
+        if activate:
+            self.model_version = version
+            print(f"All models saved successfully as {MODEL_SET} {version}!")
+        return version
     
-    def load_all_models(self):
-        """Load all saved models"""
-        model_file = self.model_path / 'enhanced_predictor.pkl'
+    def load_all_models(self, model_names=None):
+        """Load all saved models (only those in model_names, when given)"""
+        manifest, payloads = model_registry.load(MODEL_SET, names=model_names)
+        if manifest is not None:
+            self.models, self.scalers, self.feature_cols, self.label_encoders = {}, {}, {}, {}
+            for name, payload in payloads.items():
+                self.models[name] = payload['model']
+                self.scalers[name] = payload['scaler']
+                self.feature_cols[name] = payload['feature_cols']
+                self.label_encoders.update(payload['label_encoders'])
+            self.model_version = manifest['version']
+            self.compiled_models = compile_models(self.models)
+            print(f"Loaded {MODEL_SET} models {manifest['version']}: {', '.join(sorted(self.models)) or 'none'}")
+            return True
+        
+        model_file = self.model_path / LEGACY_MODEL_FILE
         if model_file.exists():
             with open(model_file, 'rb') as f:
                 model_data = pickle.load(f)
@@ -456,6 +706,9 @@ class EnhancedPredictor:
                 self.scalers = model_data['scalers']
                 self.label_encoders = model_data.get('label_encoders', {})
                 self.feature_cols = model_data['feature_cols']
+            if model_names is not None:
+                self.models = {name: model for name, model in self.models.items() if name in model_names}
+            self.compiled_models = compile_models(self.models)
             print("All models loaded successfully!")
             return True
         else:
@@ -469,12 +722,13 @@ class EnhancedPredictor:
         print("=" * 60)
         
         results = {}
+        self._training_version = None
         
         # 1. Tuition + Attendance → Performance
         try:
             results['tuition_attendance'] = self.train_tuition_attendance_model()
             # Save after each successful model to ensure it's persisted
-            self.save_all_models()
+            self._training_version = self.save_all_models(results, activate=False)
         except Exception as e:
             print(f"Error training tuition-attendance model: {e}")
             import traceback
@@ -483,7 +737,7 @@ class EnhancedPredictor:
         # 2. Enrollment Trends
         try:
             results['enrollment_trend'] = self.train_enrollment_trend_model()
-            self.save_all_models()
+            self._training_version = self.save_all_models(results, activate=False)
         except Exception as e:
             print(f"Error training enrollment trend model: {e}")
             import traceback
@@ -492,7 +746,7 @@ class EnhancedPredictor:
         # 3. Foundational Course Performance
         try:
             results['foundational_course'] = self.train_foundational_course_model()
-            self.save_all_models()
+            self._training_version = self.save_all_models(results, activate=False)
         except Exception as e:
             print(f"Error training foundational course model: {e}")
             import traceback
@@ -501,14 +755,15 @@ class EnhancedPredictor:
         # 4. HR Predictions
         try:
             results['hr'] = self.train_hr_models()
-            self.save_all_models()
+            self._training_version = self.save_all_models(results, activate=False)
         except Exception as e:
             print(f"Error training HR models: {e}")
             import traceback
             traceback.print_exc()
         
-        # Final save to ensure everything is persisted
-        self.save_all_models()
+        # Final save to ensure everything is persisted, and start serving the new version
+        self.save_all_models(results)
+        self._training_version = None
         
         print("\n" + "=" * 60)
         print("TRAINING COMPLETE")
@@ -10,26 +10,196 @@ from sqlalchemy import create_engine, text
 import pymysql
 import random
 import logging
+import hashlib
+import inspect
+import json
+from lake_manager import LakeManager
+from warehouse_schema import (
+    FACT_SCHEMAS, WORKLOAD_INDEX_VERSION, PARTITIONED_FACTS,
+    create_table_sql, add_constraints_sql, partition_bounds, split_pmax_sql
+)
 from config import (
     DB1_CONN_STRING, DB2_CONN_STRING, CSV1_PATH, CSV2_PATH,
-    BRONZE_PATH, SILVER_PATH, GOLD_PATH,
+    BRONZE_PATH, SILVER_PATH, GOLD_PATH, QUARANTINE_PATH,
     DATA_WAREHOUSE_NAME, DATA_WAREHOUSE_CONN_STRING,
-    MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD
+    MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD,
+    GOLD_PUBLISH_ENABLED, WAREHOUSE_DEFER_INDEXES, WAREHOUSE_LOAD_CHUNKSIZE, WAREHOUSE_LOAD_SESSION,
+    WAREHOUSE_PARTITIONING, RISK_SCORING_AFTER_ETL
 )
 
+# Tables written to the bronze layer by extract(), keyed as in its return value
+BRONZE_TABLES = [
+    'students_db1', 'courses_db1', 'enrollments_db1', 'attendance_db1', 'grades_db1',
+    'student_fees_db1', 'faculties_db1', 'departments_db1', 'programs_db1',
+    'employees_db2', 'payroll_db2', 'payments_csv', 'grades_csv'
+]
+# Tables written to the silver layer by transform()
+SILVER_TABLES = ['students', 'courses', 'enrollments', 'attendance', 'payments', 'grades']
+# Bronze dimension tables that transform() passes through unchanged
+PASSTHROUGH_TABLES = ['faculties_db1', 'departments_db1', 'programs_db1']
+
+# Warehouse tables rebuilt by every load, parents before children. Each load writes
+# <table>_next shadow tables and swaps them in with a single RENAME TABLE.
+WAREHOUSE_TABLES = [
+    'dim_student', 'dim_course', 'dim_time', 'dim_semester',
+    'dim_faculty', 'dim_department', 'dim_program',
+    'fact_enrollment', 'fact_attendance', 'fact_payment', 'fact_grade'
+]
+SHADOW_SUFFIX = '_next'
+OLD_SUFFIX = '_old'
+# Staging table used to rebuild one partition before EXCHANGE PARTITION swaps it in
+EXCHANGE_SUFFIX = '_xchg'
+
+# (natural key, warehouse key) of each dimension referenced by the facts. Facts are built with
+# the natural keys and carry the integer warehouse keys once they pass referential integrity.
+DIMENSION_KEYS = {
+    'dim_student': ('student_id', 'student_key'),
+    'dim_course': ('course_code', 'course_key'),
+    'dim_time': ('date_key', 'date_key'),
+    'dim_semester': ('semester_id', 'semester_id')
+}
+# Foreign keys of each fact table ({column: dimension}), from the warehouse schema
+FACT_FOREIGN_KEYS = {
+    table: {column: parent for column, parent, _ in schema['foreign_keys']}
+    for table, schema in FACT_SCHEMAS.items()
+}
+
+# Source ID column, generated-key prefix and zero padding used when no lookup table is available
+KEY_SOURCES = {
+    'student_id': ('StudentID', 'STU', 6),
+    'course_code': ('CourseID', 'COURSE', 3)
+}
+# Bronze table providing the source ID → business key lookup for each warehouse key
+KEY_LOOKUP_TABLES = {
+    'student_id': ('StudentID', 'RegNo', 'students_db1'),
+    'course_code': ('CourseID', 'CourseCode', 'courses_db1')
+}
+# Sub-directory of the silver layer holding unresolved-key reports
+REJECTS_DIR = '_rejects'
+
+
+def _format_key(ids, prefix, width):
+    """Vectorized f"{prefix}{int(x):0{width}d}" that keeps missing IDs as <NA>"""
+    digits = pd.to_numeric(ids, errors='coerce').astype('Int64').astype('string')
+    return prefix + digits.str.zfill(width)
+
+# Declared dtypes of the silver tables. Low-cardinality strings are categoricals, keys are
+# nullable strings (categorical keys would explode groupbys), missing values are <NA> rather
+# than '' sentinels. Money stays float64 - UGX amounts exceed float32's exact integer range.
+SILVER_SCHEMAS = {
+    'students': {
+        'student_id': 'string', 'reg_no': 'string', 'access_number': 'string',
+        'first_name': 'string', 'last_name': 'string', 'email': 'string',
+        'gender': 'category', 'nationality': 'category', 'high_school': 'category',
+        'high_school_district': 'category', 'program_id': 'Int32', 'year_of_study': 'Int8',
+        'status': 'category'
+    },
+    'courses': {
+        'course_code': 'string', 'course_name': 'string', 'credits': 'Int8', 'department': 'category'
+    },
+    'enrollments': {
+        'enrollment_id': 'Int32', 'student_id': 'string', 'course_code': 'string',
+        'semester': 'category', 'status': 'category'
+    },
+    'attendance': {
+        'student_id': 'string', 'course_code': 'string', 'Status': 'category', 'hours_attended': 'float32'
+    },
+    'payments': {
+        'payment_id': 'Int32', 'student_id': 'string', 'amount': 'float64',
+        'tuition_national': 'float64', 'tuition_international': 'float64', 'functional_fees': 'float64',
+        'year': 'Int16', 'payment_method': 'category', 'status': 'category', 'semester': 'category'
+    },
+    'grades': {
+        'grade_id': 'Int32', 'student_id': 'string', 'course_code': 'string',
+        'coursework_score': 'float32', 'exam_score': 'float32', 'grade': 'float32',
+        'letter_grade': 'category', 'fcw': 'boolean', 'exam_status': 'category',
+        'absence_reason': 'category', 'semester': 'category', 'year': 'Int16'
+    }
+}
+
+# Row count above which aggregate_attendance switches from groupby to bincount on factorized keys
+ATTENDANCE_BINCOUNT_MIN_ROWS = 2_000_000
+ATTENDANCE_KEYS = ['student_id', 'course_code', 'date_key']
+
+
+def aggregate_attendance(attendance, method='auto'):
+    """Aggregate attendance rows to total_hours and days_present per student, course and date
+    
+    method='groupby' uses built-in sum reductions over a precomputed is_present column;
+    method='bincount' factorizes the keys and reduces with np.bincount, which avoids the
+    groupby machinery entirely on very large inputs. 'auto' picks by row count.
+    """
+    status_col = next((col for col in ('Status', 'status') if col in attendance.columns), None)
+    # Rows with a missing key are dropped, as groupby does by default
+    attendance = attendance.dropna(subset=ATTENDANCE_KEYS)
+    hours = attendance['hours_attended'].to_numpy(dtype=np.float64)
+    is_present = (attendance[status_col] == 'Present').to_numpy(dtype=bool) if status_col else None
+    
+    if method == 'auto':
+        method = 'bincount' if len(attendance) >= ATTENDANCE_BINCOUNT_MIN_ROWS else 'groupby'
+    
+    if method == 'groupby':
+        # observed=True: categorical keys only yield combinations that occur, as bincount does
+        frame = attendance[ATTENDANCE_KEYS].assign(total_hours=hours)
+        if is_present is not None:
+            frame['days_present'] = is_present
+            result = frame.groupby(ATTENDANCE_KEYS, sort=True, observed=True).agg(
+                total_hours=('total_hours', 'sum'), days_present=('days_present', 'sum')
+            ).reset_index()
+        else:
+            result = frame.groupby(ATTENDANCE_KEYS, sort=True, observed=True).agg(total_hours=('total_hours', 'sum')).reset_index()
+    elif method == 'bincount':
+        # Combine per-key factor codes into one group code, then reduce each column with bincount
+        codes, levels = [], []
+        for key in ATTENDANCE_KEYS:
+            key_codes, key_levels = pd.factorize(attendance[key], sort=True)
+            codes.append(key_codes.astype(np.int64))
+            levels.append(key_levels)
+        combined = codes[0]
+        for key_codes, key_levels in zip(codes[1:], levels[1:]):
+            combined = combined * len(key_levels) + key_codes
+        group_codes, group_ids = pd.factorize(combined, sort=True)
+        result = {}
+        remainder = group_ids
+        for key, key_levels in reversed(list(zip(ATTENDANCE_KEYS, levels))):
+            remainder, key_codes = np.divmod(remainder, len(key_levels))
+            result[key] = key_levels.take(key_codes)
+        result = pd.DataFrame({key: result[key] for key in ATTENDANCE_KEYS})
+        result['total_hours'] = np.bincount(group_codes, weights=hours, minlength=len(group_ids))
+        if is_present is not None:
+            result['days_present'] = np.bincount(group_codes[is_present], minlength=len(group_ids))
+    else:
+        raise ValueError(f"Unknown attendance aggregation method: {method}")
+    
+    if is_present is None:
+        # If no status column, calculate days_present from hours_attended
+        result['days_present'] = (result['total_hours'] > 0).astype(int)
+    result['days_present'] = result['days_present'].astype(np.int64)
+    return result[ATTENDANCE_KEYS + ['total_hours', 'days_present']]
+
+
 class ETLPipeline:
+    # Methods whose source makes up the transform stage; a change to any of them invalidates cached silver output
+    TRANSFORM_STAGE = ('transform', '_build_key_lookups', '_resolve_keys', '_apply_silver_schema')
+    
     def __init__(self):
         self.bronze_path = BRONZE_PATH
         self.silver_path = SILVER_PATH
         self.gold_path = GOLD_PATH
         self.dw_name = DATA_WAREHOUSE_NAME
+        self.lake = LakeManager(self.bronze_path, self.silver_path)
+        self.bronze_snapshot_id = None
+        # Suffix of the physical tables being loaded ('' = live tables, SHADOW_SUFFIX during a load)
+        self.table_suffix = ''
+        # Run identifier, also used as the gold layer generation
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # Setup logging
         self.log_dir = Path(__file__).parent / "logs"
         self.log_dir.mkdir(parents=True, exist_ok=True)
         
         # Create log file with timestamp
-        log_filename = f"etl_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        log_filename = f"etl_pipeline_{self.run_id}.log"
         self.log_file = self.log_dir / log_filename
         
         # Configure logging
@@ -148,7 +318,9 @@ class ETLPipeline:
         if not grades_csv.empty:
             grades_csv.to_parquet(self.bronze_path / f"bronze_grades_csv_{timestamp}.parquet", index=False)
         
-        self.logger.info(f"Bronze layer files saved to: {self.bronze_path}")
+        self.bronze_snapshot_id = timestamp
+        self.lake.set_latest('bronze', timestamp)
+        self.logger.info(f"Bronze layer files saved to: {self.bronze_path} (snapshot {timestamp})")
         self.logger.info("Bronze layer extraction complete!")
         print("Bronze layer extraction complete!")
         return {
@@ -174,37 +346,40 @@ class ETLPipeline:
         self.logger.info("=" * 60)
         print("Transforming data to Silver layer...")
         
+        # Key lookups are built once and shared by every table that carries source IDs
+        key_lookups = self._build_key_lookups(bronze_data)
+        rejects = []
+        
         # Transform Students (DB1) - map to old format for compatibility
-        students_silver = bronze_data['students_db1'].copy()
-        students_silver = students_silver.fillna('')
+        students_silver = bronze_data['students_db1'].copy(deep=False)
         # Create student_id from RegNo for compatibility
         if 'RegNo' in students_silver.columns:
             students_silver['student_id'] = students_silver['RegNo'].astype(str)
             students_silver['reg_no'] = students_silver['RegNo'].astype(str)
         elif 'StudentID' in students_silver.columns:
-            students_silver['student_id'] = students_silver['StudentID'].apply(lambda x: f"STU{int(x):06d}" if pd.notna(x) else '')
+            students_silver['student_id'] = _format_key(students_silver['StudentID'], *KEY_SOURCES['student_id'][1:])
         # Extract Access Number
         if 'AccessNumber' in students_silver.columns:
-            students_silver['access_number'] = students_silver['AccessNumber'].astype(str)
+            students_silver['access_number'] = students_silver['AccessNumber'].astype('string')
         else:
             # Generate if missing (for backward compatibility)
             students_silver['access_number'] = students_silver['student_id'].apply(
-                lambda x: f"{random.choice(['A', 'B'])}{random.randint(10000, 99999):05d}" if pd.notna(x) else ''
+                lambda x: f"{random.choice(['A', 'B'])}{random.randint(10000, 99999):05d}" if pd.notna(x) else pd.NA
             )
         if 'FullName' in students_silver.columns:
             # Split FullName into first_name and last_name
             names = students_silver['FullName'].str.split(' ', n=1, expand=True)
-            students_silver['first_name'] = names[0].fillna('')
-            students_silver['last_name'] = names[1].fillna('') if len(names.columns) > 1 else ''
+            students_silver['first_name'] = names[0]
+            students_silver['last_name'] = names[1] if len(names.columns) > 1 else pd.NA
         # Extract high school information
         if 'HighSchool' in students_silver.columns:
-            students_silver['high_school'] = students_silver['HighSchool'].astype(str)
+            students_silver['high_school'] = students_silver['HighSchool']
         else:
-            students_silver['high_school'] = ''
+            students_silver['high_school'] = pd.NA
         if 'HighSchoolDistrict' in students_silver.columns:
-            students_silver['high_school_district'] = students_silver['HighSchoolDistrict'].astype(str)
+            students_silver['high_school_district'] = students_silver['HighSchoolDistrict']
         else:
-            students_silver['high_school_district'] = ''
+            students_silver['high_school_district'] = pd.NA
         # Extract program and status
         if 'ProgramID' in students_silver.columns:
             students_silver['program_id'] = students_silver['ProgramID']
@@ -214,18 +389,17 @@ class ETLPipeline:
             students_silver['status'] = students_silver['Status']
         # Add missing columns with defaults
         if 'email' not in students_silver.columns:
-            students_silver['email'] = students_silver.get('access_number', '').astype(str) + '@ucu.ac.ug'
+            students_silver['email'] = students_silver['access_number'].astype('string') + '@ucu.ac.ug'
         if 'gender' not in students_silver.columns:
             students_silver['gender'] = random.choice(['M', 'F'])
         if 'nationality' not in students_silver.columns:
             students_silver['nationality'] = 'Ugandan'
         if 'admission_date' not in students_silver.columns:
             students_silver['admission_date'] = (datetime.now() - timedelta(days=random.randint(0, 1460))).strftime('%Y-%m-%d')
-        students_silver = students_silver.fillna('')
+        self._apply_silver_schema(students_silver, 'students')
         
         # Transform Courses (DB1)
-        courses_silver = bronze_data['courses_db1'].copy()
-        courses_silver = courses_silver.fillna('')
+        courses_silver = bronze_data['courses_db1'].copy(deep=False)
         # Map CourseCode to course_code
         if 'CourseCode' in courses_silver.columns:
             courses_silver['course_code'] = courses_silver['CourseCode']
@@ -234,48 +408,29 @@ class ETLPipeline:
         if 'CreditUnits' in courses_silver.columns:
             courses_silver['credits'] = courses_silver['CreditUnits']
         courses_silver['department'] = 'General'  # Default, can be enhanced
+        self._apply_silver_schema(courses_silver, 'courses')
         
         # Clean enrollments - need to join with students and courses to get proper IDs
-        enrollments_silver = bronze_data['enrollments_db1'].copy()
-        enrollments_silver = enrollments_silver.fillna('')
-        
-        # Join with students to get RegNo
-        if 'StudentID' in enrollments_silver.columns and 'RegNo' in bronze_data['students_db1'].columns:
-            student_map = dict(zip(bronze_data['students_db1']['StudentID'], bronze_data['students_db1']['RegNo']))
-            enrollments_silver['student_id'] = enrollments_silver['StudentID'].map(student_map).fillna('')
-        elif 'StudentID' in enrollments_silver.columns:
-            enrollments_silver['student_id'] = enrollments_silver['StudentID'].apply(lambda x: f"STU{int(x):06d}" if pd.notna(x) else '')
-        
-        # Join with courses to get CourseCode
-        if 'CourseID' in enrollments_silver.columns and 'CourseCode' in bronze_data['courses_db1'].columns:
-            course_map = dict(zip(bronze_data['courses_db1']['CourseID'], bronze_data['courses_db1']['CourseCode']))
-            enrollments_silver['course_code'] = enrollments_silver['CourseID'].map(course_map).fillna('')
-        elif 'CourseID' in enrollments_silver.columns:
-            enrollments_silver['course_code'] = enrollments_silver['CourseID'].apply(lambda x: f"COURSE{int(x):03d}" if pd.notna(x) else '')
+        enrollments_silver = bronze_data['enrollments_db1'].copy(deep=False)
+        
+        # Resolve StudentID → RegNo and CourseID → CourseCode
+        self._resolve_keys(enrollments_silver, 'enrollments', key_lookups, rejects)
         
         if 'AcademicYear' in enrollments_silver.columns:
-            enrollments_silver['semester'] = enrollments_silver['AcademicYear'].astype(str) + ' ' + enrollments_silver.get('Semester', '').astype(str)
+            semester = enrollments_silver.get('Semester', pd.Series('', index=enrollments_silver.index))
+            # fillna(''): a missing part would otherwise make the whole label NA
+            enrollments_silver['semester'] = (enrollments_silver['AcademicYear'].astype('string').fillna('') + ' '
+                                              + semester.astype('string').fillna(''))
         enrollments_silver['enrollment_date'] = pd.to_datetime(datetime.now(), errors='coerce')
         enrollments_silver['status'] = 'Active'
         enrollments_silver['enrollment_id'] = enrollments_silver.get('EnrollmentID', range(1, len(enrollments_silver) + 1))
+        self._apply_silver_schema(enrollments_silver, 'enrollments')
         
         # Clean attendance (DB1)
-        attendance_silver = bronze_data['attendance_db1'].copy()
-        attendance_silver = attendance_silver.fillna('')
-        
-        # Join with students to get RegNo
-        if 'StudentID' in attendance_silver.columns and 'RegNo' in bronze_data['students_db1'].columns:
-            student_map = dict(zip(bronze_data['students_db1']['StudentID'], bronze_data['students_db1']['RegNo']))
-            attendance_silver['student_id'] = attendance_silver['StudentID'].map(student_map).fillna('')
-        elif 'StudentID' in attendance_silver.columns:
-            attendance_silver['student_id'] = attendance_silver['StudentID'].apply(lambda x: f"STU{int(x):06d}" if pd.notna(x) else '')
-        
-        # Join with courses to get CourseCode
-        if 'CourseID' in attendance_silver.columns and 'CourseCode' in bronze_data['courses_db1'].columns:
-            course_map = dict(zip(bronze_data['courses_db1']['CourseID'], bronze_data['courses_db1']['CourseCode']))
-            attendance_silver['course_code'] = attendance_silver['CourseID'].map(course_map).fillna('')
-        elif 'CourseID' in attendance_silver.columns:
-            attendance_silver['course_code'] = attendance_silver['CourseID'].apply(lambda x: f"COURSE{int(x):03d}" if pd.notna(x) else '')
+        attendance_silver = bronze_data['attendance_db1'].copy(deep=False)
+        
+        # Resolve StudentID → RegNo and CourseID → CourseCode
+        self._resolve_keys(attendance_silver, 'attendance', key_lookups, rejects)
         
         if 'Date' in attendance_silver.columns:
             attendance_silver['attendance_date'] = pd.to_datetime(attendance_silver['Date'], errors='coerce')
@@ -286,17 +441,13 @@ class ETLPipeline:
             )
         else:
             attendance_silver['hours_attended'] = 2.0
+        self._apply_silver_schema(attendance_silver, 'attendance')
         
         # Clean payments (from DB1 student_fees or CSV)
         if not bronze_data['student_fees_db1'].empty:
-            payments_silver = bronze_data['student_fees_db1'].copy()
-            payments_silver = payments_silver.fillna('')
-            # Join with students to get RegNo
-            if 'StudentID' in payments_silver.columns and 'RegNo' in bronze_data['students_db1'].columns:
-                student_map = dict(zip(bronze_data['students_db1']['StudentID'], bronze_data['students_db1']['RegNo']))
-                payments_silver['student_id'] = payments_silver['StudentID'].map(student_map).fillna('')
-            elif 'StudentID' in payments_silver.columns:
-                payments_silver['student_id'] = payments_silver['StudentID'].apply(lambda x: f"STU{int(x):06d}" if pd.notna(x) else '')
+            payments_silver = bronze_data['student_fees_db1'].copy(deep=False)
+            # Resolve StudentID → RegNo
+            self._resolve_keys(payments_silver, 'payments', key_lookups, rejects, keys=('student_id',))
             if 'AmountPaid' in payments_silver.columns:
                 payments_silver['amount'] = pd.to_numeric(payments_silver['AmountPaid'], errors='coerce').fillna(0)
             # Extract fee breakdown from database
@@ -348,8 +499,7 @@ class ETLPipeline:
                 payments_silver['semester'] = payments_silver['Semester']
             payments_silver['payment_id'] = payments_silver.get('PaymentID', range(1, len(payments_silver) + 1))
         elif not bronze_data['payments_csv'].empty:
-            payments_silver = bronze_data['payments_csv'].copy()
-            payments_silver = payments_silver.fillna('')
+            payments_silver = bronze_data['payments_csv'].copy(deep=False)
             
             # Extract payment date/timestamp
             if 'payment_timestamp' in payments_silver.columns:
@@ -383,37 +533,25 @@ class ETLPipeline:
             payments_silver['payment_method'] = payments_silver.get('payment_method', 'Bank Transfer')
         else:
             payments_silver = pd.DataFrame()
+        if not payments_silver.empty:
+            self._apply_silver_schema(payments_silver, 'payments')
         
         # Clean grades (from DB1 or CSV)
         if not bronze_data['grades_db1'].empty:
-            grades_silver = bronze_data['grades_db1'].copy()
-            grades_silver = grades_silver.fillna('')
-            # Join with students to get RegNo
-            if 'StudentID' in grades_silver.columns and 'RegNo' in bronze_data['students_db1'].columns:
-                student_map = dict(zip(bronze_data['students_db1']['StudentID'], bronze_data['students_db1']['RegNo']))
-                grades_silver['student_id'] = grades_silver['StudentID'].map(student_map).fillna('')
-            elif 'StudentID' in grades_silver.columns:
-                grades_silver['student_id'] = grades_silver['StudentID'].apply(lambda x: f"STU{int(x):06d}" if pd.notna(x) else '')
-            # Join with courses to get CourseCode
-            if 'CourseID' in grades_silver.columns and 'CourseCode' in bronze_data['courses_db1'].columns:
-                course_map = dict(zip(bronze_data['courses_db1']['CourseID'], bronze_data['courses_db1']['CourseCode']))
-                grades_silver['course_code'] = grades_silver['CourseID'].map(course_map).fillna('')
-            elif 'CourseID' in grades_silver.columns:
-                grades_silver['course_code'] = grades_silver['CourseID'].apply(lambda x: f"COURSE{int(x):03d}" if pd.notna(x) else '')
+            grades_silver = bronze_data['grades_db1'].copy(deep=False)
+            # Resolve StudentID → RegNo and CourseID → CourseCode
+            self._resolve_keys(grades_silver, 'grades', key_lookups, rejects)
             # Extract coursework and exam scores
             if 'CourseworkScore' in grades_silver.columns:
                 grades_silver['coursework_score'] = pd.to_numeric(grades_silver['CourseworkScore'], errors='coerce').fillna(0)
             else:
                 grades_silver['coursework_score'] = 0.0
             if 'ExamScore' in grades_silver.columns:
-                # Replace empty strings with None before converting to numeric
-                grades_silver['ExamScore'] = grades_silver['ExamScore'].replace('', None)
                 grades_silver['exam_score'] = pd.to_numeric(grades_silver['ExamScore'], errors='coerce')
+                # Drop original ExamScore column, exam_score carries it from here on
+                grades_silver.drop(columns=['ExamScore'], inplace=True)
             else:
                 grades_silver['exam_score'] = None
-            # Drop original ExamScore column to avoid parquet conversion issues
-            if 'ExamScore' in grades_silver.columns:
-                grades_silver = grades_silver.drop(columns=['ExamScore'])
             if 'TotalScore' in grades_silver.columns:
                 # Always store numeric score (MEX will have 0, but letter grade will be MEX)
                 grades_silver['grade'] = pd.to_numeric(grades_silver['TotalScore'], errors='coerce')
@@ -422,7 +560,7 @@ class ETLPipeline:
                 grades_silver['letter_grade'] = grades_silver['GradeLetter']
             # Extract FCW flag
             if 'FCW' in grades_silver.columns:
-                grades_silver['fcw'] = grades_silver['FCW'].astype(bool)
+                grades_silver['fcw'] = grades_silver['FCW'].fillna(0).astype(bool)
             else:
                 grades_silver['fcw'] = False
             # Extract exam status and absence reason
@@ -433,28 +571,25 @@ class ETLPipeline:
             if 'AbsenceReason' in grades_silver.columns:
                 grades_silver['absence_reason'] = grades_silver['AbsenceReason']
             else:
-                grades_silver['absence_reason'] = ''
+                grades_silver['absence_reason'] = pd.NA
             grades_silver['exam_date'] = pd.to_datetime(datetime.now(), errors='coerce')
             grades_silver['semester'] = '2023/2024 Sem 1'
             grades_silver['grade_id'] = grades_silver.get('GradeID', range(1, len(grades_silver) + 1))
         elif not bronze_data['grades_csv'].empty:
-            grades_silver = bronze_data['grades_csv'].copy()
-            grades_silver = grades_silver.fillna('')
+            grades_silver = bronze_data['grades_csv'].copy(deep=False)
             # Extract coursework and exam scores from CSV
             if 'coursework_score' in grades_silver.columns:
                 grades_silver['coursework_score'] = pd.to_numeric(grades_silver['coursework_score'], errors='coerce').fillna(0)
             else:
                 grades_silver['coursework_score'] = 0.0
             if 'exam_score' in grades_silver.columns:
-                # Replace empty strings with None before converting to numeric
-                grades_silver['exam_score'] = grades_silver['exam_score'].replace('', None)
                 grades_silver['exam_score'] = pd.to_numeric(grades_silver['exam_score'], errors='coerce')
             else:
                 grades_silver['exam_score'] = None
             grades_silver['grade'] = pd.to_numeric(grades_silver.get('grade', 0), errors='coerce').fillna(0)
             # Extract FCW flag
             if 'fcw' in grades_silver.columns:
-                grades_silver['fcw'] = grades_silver['fcw'].astype(bool)
+                grades_silver['fcw'] = grades_silver['fcw'].fillna(0).astype(bool)
             else:
                 grades_silver['fcw'] = False
             # Extract exam status and absence reason
@@ -465,7 +600,7 @@ class ETLPipeline:
             if 'absence_reason' in grades_silver.columns:
                 grades_silver['absence_reason'] = grades_silver['absence_reason']
             else:
-                grades_silver['absence_reason'] = ''
+                grades_silver['absence_reason'] = pd.NA
             grades_silver['exam_date'] = pd.to_datetime(grades_silver.get('exam_date', datetime.now()), errors='coerce')
             # Extract year if present in CSV
             if 'year' in grades_silver.columns:
@@ -474,9 +609,12 @@ class ETLPipeline:
                 grades_silver['year'] = grades_silver['exam_date'].dt.year.fillna(datetime.now().year)
         else:
             grades_silver = pd.DataFrame()
+        if not grades_silver.empty:
+            self._apply_silver_schema(grades_silver, 'grades')
         
         # Save to Silver layer
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._save_rejects(rejects, timestamp)
         
         students_silver.to_parquet(self.silver_path / f"silver_students_{timestamp}.parquet", index=False)
         courses_silver.to_parquet(self.silver_path / f"silver_courses_{timestamp}.parquet", index=False)
@@ -485,7 +623,8 @@ class ETLPipeline:
         payments_silver.to_parquet(self.silver_path / f"silver_payments_{timestamp}.parquet", index=False)
         grades_silver.to_parquet(self.silver_path / f"silver_grades_{timestamp}.parquet", index=False)
         
-        self.logger.info(f"Silver layer files saved to: {self.silver_path}")
+        self.lake.set_latest('silver', timestamp, source_snapshot=self.bronze_snapshot_id)
+        self.logger.info(f"Silver layer files saved to: {self.silver_path} (snapshot {timestamp})")
         self.logger.info(f"  → Students: {len(students_silver)}")
         self.logger.info(f"  → Courses: {len(courses_silver)}")
         self.logger.info(f"  → Enrollments: {len(enrollments_silver)}")
@@ -507,6 +646,75 @@ class ETLPipeline:
             'programs_db1': bronze_data.get('programs_db1', pd.DataFrame())
         }
     
+    def _build_key_lookups(self, bronze_data):
+        """Build the StudentID → RegNo and CourseID → CourseCode lookup Series once per run"""
+        lookups = {}
+        for key, (source_col, target_col, table) in KEY_LOOKUP_TABLES.items():
+            source = bronze_data.get(table, pd.DataFrame())
+            if source_col in source.columns and target_col in source.columns:
+                # Last row wins for duplicate IDs, as with the old dict(zip()) maps
+                source = source.drop_duplicates(subset=[source_col], keep='last')
+                lookups[key] = pd.Series(source[target_col].astype('string').to_numpy(),
+                                         index=pd.Index(source[source_col]))
+        return lookups
+    
+    def _resolve_keys(self, df, table, lookups, rejects, keys=('student_id', 'course_code')):
+        """Resolve source IDs to warehouse keys in place, collecting unresolved IDs into rejects"""
+        for key in keys:
+            source_col, prefix, width = KEY_SOURCES[key]
+            if source_col not in df.columns:
+                continue
+            source = df[source_col]
+            lookup = lookups.get(key)
+            if lookup is None:
+                df[key] = _format_key(source, prefix, width)
+                continue
+            positions = lookup.index.get_indexer(source)
+            missing = positions == -1
+            resolved = lookup.to_numpy(dtype=object)[positions]
+            resolved[missing] = pd.NA
+            df[key] = pd.array(resolved, dtype='string')
+            unresolved = missing & source.notna().to_numpy()
+            if unresolved.any():
+                counts = source[unresolved].value_counts()
+                rejects.append(pd.DataFrame({
+                    'table': table, 'key': key, 'source_column': source_col,
+                    'source_value': counts.index.astype(str), 'rows': counts.to_numpy()
+                }))
+                self.logger.warning(f"  → {table}: {int(unresolved.sum())} rows with unresolved {source_col} "
+                                    f"({len(counts)} distinct values)")
+        return df
+    
+    def _save_rejects(self, rejects, timestamp):
+        """Write the unresolved-key report for this transform run"""
+        if not rejects:
+            return None
+        rejects_dir = self.silver_path / REJECTS_DIR
+        rejects_dir.mkdir(parents=True, exist_ok=True)
+        report_path = rejects_dir / f"rejects_{timestamp}.parquet"
+        pd.concat(rejects, ignore_index=True).to_parquet(report_path, index=False)
+        self.logger.info(f"Unresolved keys written to {report_path}")
+        return report_path
+    
+    def _apply_silver_schema(self, df, table):
+        """Cast a silver table to its declared dtypes in place and downcast the remaining integer columns"""
+        schema = SILVER_SCHEMAS[table]
+        for col, dtype in schema.items():
+            if col not in df.columns:
+                continue
+            if dtype in ('string', 'category'):
+                values = df[col].astype('string').replace('', pd.NA)
+                df[col] = values.astype('category') if dtype == 'category' else values
+            elif dtype == 'boolean':
+                df[col] = df[col].astype('boolean')
+            else:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        # Source columns carried through unchanged (IDs, counts) only need their integers narrowed
+        for col in df.columns.difference(list(schema)):
+            if pd.api.types.is_integer_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+        return df
+    
     def load_to_warehouse(self, silver_data):
         """Load transformed data into star schema data warehouse (Gold Layer)"""
         self.logger.info("=" * 60)
@@ -519,16 +727,31 @@ class ETLPipeline:
         
         engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
         
-        # Create dimension tables
-        self._create_dimensions(engine, silver_data)
-        
-        # Populate time dimension before facts (facts reference dim_time)
-        self._populate_time_dimension(engine)
-        
-        # Create fact tables
-        self._create_facts(engine, silver_data)
+        # Load into *_next shadow tables; the API keeps serving the live tables until the swap
+        self._drop_stale_tables(engine)
+        self.table_suffix = SHADOW_SUFFIX
+        try:
+            # Create dimension tables
+            dimensions = self._create_dimensions(engine, silver_data)
+            
+            # Populate time dimension before facts (facts reference dim_time)
+            self._populate_time_dimension(engine)
+            
+            # Create fact tables
+            facts = self._create_facts(engine, silver_data)
+        except Exception:
+            self.logger.error("Load failed, live warehouse tables left untouched")
+            self._drop_stale_tables(engine)
+            raise
+        finally:
+            self.table_suffix = ''
         
+        self._swap_shadow_tables(engine)
         engine.dispose()
+        
+        # Publish the loaded generation to the gold layer (read-only analytics path)
+        if GOLD_PUBLISH_ENABLED:
+            self.publish_gold(facts, dimensions)
         self.logger.info("=" * 60)
         self.logger.info("ETL PIPELINE COMPLETED SUCCESSFULLY")
         self.logger.info(f"Log file saved to: {self.log_file}")
@@ -536,6 +759,91 @@ class ETLPipeline:
         print("Gold layer (Data Warehouse) loading complete!")
         print(f"ETL log file: {self.log_file}")
     
+    def _table(self, name):
+        """Physical name of a warehouse table for the load in progress (the shadow copy while loading)"""
+        return f"{name}{self.table_suffix}"
+    
+    def _live_tables(self, conn):
+        return set(pd.read_sql_query(
+            "SELECT table_name AS name FROM information_schema.tables WHERE table_schema = DATABASE()", conn
+        )['name'])
+    
+    def _copy_live_rows(self, engine, table):
+        """Carry a dimension's current rows into its shadow table when this run has no source data for it"""
+        if self._table(table) == table:
+            return
+        with engine.connect() as conn:
+            if table in self._live_tables(conn):
+                conn.execute(text(f"INSERT INTO {self._table(table)} SELECT * FROM {table}"))
+                conn.commit()
+                self.logger.info(f"  -> No source rows for {table}, kept the current generation's rows")
+    
+    def _swap_shadow_tables(self, engine):
+        """Atomically replace the live warehouse tables with the freshly loaded shadow tables"""
+        self.logger.info("Swapping shadow tables into place...")
+        with engine.connect() as conn:
+            live = self._live_tables(conn)
+            # Named explicitly: load_to_warehouse() has already reset table_suffix to the live tables
+            missing = [t for t in WAREHOUSE_TABLES if f"{t}{SHADOW_SUFFIX}" not in live]
+            if missing:
+                raise RuntimeError(f"Shadow tables missing, not swapping: {missing}")
+            # Live → _old and _next → live in one RENAME TABLE, so readers see either generation, never a mix.
+            # InnoDB re-points the foreign keys of both fact generations at their renamed dimensions.
+            renames = [f"{t} TO {t}{OLD_SUFFIX}" for t in WAREHOUSE_TABLES if t in live]
+            renames += [f"{t}{SHADOW_SUFFIX} TO {t}" for t in WAREHOUSE_TABLES]
+            conn.execute(text("RENAME TABLE " + ", ".join(renames)))
+            
+            conn.execute(text("SET FOREIGN_KEY_CHECKS=0"))
+            for t in reversed(WAREHOUSE_TABLES):
+                conn.execute(text(f"DROP TABLE IF EXISTS {t}{OLD_SUFFIX}"))
+            conn.execute(text("SET FOREIGN_KEY_CHECKS=1"))
+            self._record_generation(conn)
+            conn.commit()
+        self.logger.info(f"  → Warehouse generation {self.run_id} is live")
+        self._purge_prediction_cache()
+    
+    def _record_generation(self, conn):
+        """Generation marker read by caches that must invalidate when the warehouse changes"""
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS etl_generation (
+                generation VARCHAR(20) PRIMARY KEY,
+                swapped_at DATETIME NOT NULL
+            ) ENGINE=InnoDB
+        """))
+        conn.execute(text("INSERT INTO etl_generation (generation, swapped_at) VALUES (:generation, NOW())"),
+                     {'generation': self.run_id})
+    
+    def _purge_prediction_cache(self):
+        """Cached predictions of earlier generations can no longer be hit; drop the shared rows"""
+        try:
+            from prediction_cache import prediction_cache
+            purged = prediction_cache.purge_stale(self.run_id)
+            if purged:
+                self.logger.info(f"  → Purged {purged} cached predictions of earlier generations")
+        except Exception as e:
+            self.logger.warning(f"Prediction cache not purged: {e}")
+    
+    def score_students(self):
+        """Refresh fact_prediction for the generation just loaded; a scoring failure does not fail the load"""
+        try:
+            from risk_scoring import run_risk_scoring
+            summary = run_risk_scoring()
+            self.logger.info(f"  → Risk scores published: {summary}")
+        except Exception as e:
+            self.logger.warning(f"Risk scoring skipped: {e}")
+    
+    def _drop_stale_tables(self, engine):
+        """Remove shadow or retired tables left behind by an interrupted run"""
+        with engine.connect() as conn:
+            live = self._live_tables(conn)
+            conn.execute(text("SET FOREIGN_KEY_CHECKS=0"))
+            for t in reversed(WAREHOUSE_TABLES):
+                for suffix in (SHADOW_SUFFIX, OLD_SUFFIX):
+                    if f"{t}{suffix}" in live:
+                        conn.execute(text(f"DROP TABLE {t}{suffix}"))
+            conn.execute(text("SET FOREIGN_KEY_CHECKS=1"))
+            conn.commit()
+    
     def _create_dimensions(self, engine, silver_data):
         """Create dimension tables for star schema"""
         self.logger.info("Creating dimension tables...")
@@ -545,16 +853,20 @@ class ETLPipeline:
             conn.execute(text("SET FOREIGN_KEY_CHECKS=0"))
 
             # Drop fact tables first (they reference dimensions)
-            conn.execute(text("DROP TABLE IF EXISTS fact_grade"))
-            conn.execute(text("DROP TABLE IF EXISTS fact_payment"))
-            conn.execute(text("DROP TABLE IF EXISTS fact_attendance"))
-            conn.execute(text("DROP TABLE IF EXISTS fact_enrollment"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('fact_grade')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('fact_payment')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('fact_attendance')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('fact_enrollment')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_program')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_department')}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_faculty')}"))
 
             # Dim_Student
-            conn.execute(text("DROP TABLE IF EXISTS dim_student"))
-            conn.execute(text("""
-                CREATE TABLE dim_student (
-                    student_id VARCHAR(20) PRIMARY KEY,
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_student')}"))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_student')} (
+                    student_key INT PRIMARY KEY,
+                    student_id VARCHAR(20) NOT NULL UNIQUE,
                     reg_no VARCHAR(50),
                     access_number VARCHAR(10) UNIQUE,
                     first_name VARCHAR(50),
@@ -579,10 +891,11 @@ class ETLPipeline:
             """))
             
             # Dim_Course
-            conn.execute(text("DROP TABLE IF EXISTS dim_course"))
-            conn.execute(text("""
-                CREATE TABLE dim_course (
-                    course_code VARCHAR(20) PRIMARY KEY,
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_course')}"))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_course')} (
+                    course_key INT PRIMARY KEY,
+                    course_code VARCHAR(20) NOT NULL UNIQUE,
                     course_name VARCHAR(100),
                     credits INT,
                     department VARCHAR(50),
@@ -591,10 +904,10 @@ class ETLPipeline:
             """))
             
             # Dim_Time
-            conn.execute(text("DROP TABLE IF EXISTS dim_time"))
-            conn.execute(text("""
-                CREATE TABLE dim_time (
-                    date_key VARCHAR(8) PRIMARY KEY,
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_time')}"))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_time')} (
+                    date_key INT PRIMARY KEY,
                     date DATE,
                     year INT,
                     quarter INT,
@@ -610,15 +923,48 @@ class ETLPipeline:
             """))
             
             # Dim_Semester
-            conn.execute(text("DROP TABLE IF EXISTS dim_semester"))
-            conn.execute(text("""
-                CREATE TABLE dim_semester (
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._table('dim_semester')}"))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_semester')} (
                     semester_id INT PRIMARY KEY,
                     semester_name VARCHAR(50),
                     academic_year VARCHAR(20),
                     INDEX idx_academic_year (academic_year)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """))
+            
+            # Dim_Faculty / Dim_Department / Dim_Program (same DDL as sql/create_data_warehouse.sql)
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_faculty')} (
+                    faculty_id INT PRIMARY KEY,
+                    faculty_name VARCHAR(200),
+                    dean_name VARCHAR(100),
+                    INDEX idx_faculty_name (faculty_name)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_department')} (
+                    department_id INT PRIMARY KEY,
+                    department_name VARCHAR(200),
+                    faculty_id INT,
+                    head_of_department VARCHAR(100),
+                    FOREIGN KEY (faculty_id) REFERENCES {self._table('dim_faculty')}(faculty_id) ON DELETE CASCADE,
+                    INDEX idx_faculty (faculty_id),
+                    INDEX idx_dept_name (department_name)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """))
+            conn.execute(text(f"""
+                CREATE TABLE {self._table('dim_program')} (
+                    program_id INT PRIMARY KEY,
+                    program_name VARCHAR(200),
+                    degree_level VARCHAR(50),
+                    department_id INT,
+                    duration_years INT,
+                    FOREIGN KEY (department_id) REFERENCES {self._table('dim_department')}(department_id) ON DELETE CASCADE,
+                    INDEX idx_department (department_id),
+                    INDEX idx_program_name (program_name)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """))
 
             # Re‑enable foreign key checks
             conn.execute(text("SET FOREIGN_KEY_CHECKS=1"))
@@ -652,24 +998,26 @@ class ETLPipeline:
         students_dim = students_dim.drop_duplicates(subset=['student_id'], keep='first')
         # Also deduplicate by access_number to avoid unique constraint violations
         students_dim = students_dim.drop_duplicates(subset=['access_number'], keep='first')
+        students_dim = self._assign_surrogate_keys(engine, students_dim, 'dim_student')
         
         # Clear existing data first
         with engine.connect() as conn:
-            conn.execute(text("DELETE FROM dim_student"))
+            conn.execute(text(f"DELETE FROM {self._table('dim_student')}"))
             conn.commit()
         
-        students_dim.to_sql('dim_student', engine, if_exists='append', index=False, method='multi', chunksize=100)
+        students_dim.to_sql(self._table('dim_student'), engine, if_exists='append', index=False, method='multi', chunksize=100)
         self.logger.info(f"  → Loaded {len(students_dim)} students into dim_student")
         
         # Dim_Course - deduplicate by course_code
         courses_dim = silver_data['courses'][['course_code', 'course_name', 'credits', 'department']].copy()
         courses_dim.columns = ['course_code', 'course_name', 'credits', 'department']
         courses_dim = courses_dim.drop_duplicates(subset=['course_code'], keep='first')
+        courses_dim = self._assign_surrogate_keys(engine, courses_dim, 'dim_course')
         # Clear existing data first
         with engine.connect() as conn:
-            conn.execute(text("DELETE FROM dim_course"))
+            conn.execute(text(f"DELETE FROM {self._table('dim_course')}"))
             conn.commit()
-        courses_dim.to_sql('dim_course', engine, if_exists='append', index=False)
+        courses_dim.to_sql(self._table('dim_course'), engine, if_exists='append', index=False)
         self.logger.info(f"  → Loaded {len(courses_dim)} courses into dim_course")
         
         # Dim_Semester - UCU Semester Names
@@ -678,11 +1026,13 @@ class ETLPipeline:
             'semester_name': ['Jan (Easter Semester)', 'May (Trinity Semester)', 'September (Advent)'],
             'academic_year': ['2023-2024', '2023-2024', '2023-2024']  # Can be updated based on actual year
         })
-        semesters.to_sql('dim_semester', engine, if_exists='append', index=False)
+        semesters.to_sql(self._table('dim_semester'), engine, if_exists='append', index=False)
         self.logger.info(f"  → Loaded {len(semesters)} semesters into dim_semester")
         
-        # Dim_Faculty - from source database
-        if 'faculties_db1' in silver_data and not silver_data['faculties_db1'].empty:
+        # Dim_Faculty - from source database (keeps the current rows when the source is empty)
+        if 'faculties_db1' not in silver_data or silver_data['faculties_db1'].empty:
+            self._copy_live_rows(engine, 'dim_faculty')
+        else:
             faculties_dim = silver_data['faculties_db1'].copy()
             # Map column names
             if 'FacultyID' in faculties_dim.columns:
@@ -697,14 +1047,16 @@ class ETLPipeline:
             if available_cols:
                 faculties_dim = faculties_dim[available_cols].drop_duplicates(subset=['faculty_id'], keep='first')
                 with engine.connect() as conn:
-                    conn.execute(text("DELETE FROM dim_faculty"))
+                    conn.execute(text(f"DELETE FROM {self._table('dim_faculty')}"))
                     conn.commit()
-                faculties_dim.to_sql('dim_faculty', engine, if_exists='append', index=False)
+                faculties_dim.to_sql(self._table('dim_faculty'), engine, if_exists='append', index=False)
                 self.logger.info(f"  -> Loaded {len(faculties_dim)} faculties into dim_faculty")
                 print(f"  -> Loaded {len(faculties_dim)} faculties into dim_faculty")
         
-        # Dim_Department - from source database
-        if 'departments_db1' in silver_data and not silver_data['departments_db1'].empty:
+        # Dim_Department - from source database (keeps the current rows when the source is empty)
+        if 'departments_db1' not in silver_data or silver_data['departments_db1'].empty:
+            self._copy_live_rows(engine, 'dim_department')
+        else:
             departments_dim = silver_data['departments_db1'].copy()
             # Map column names
             if 'DepartmentID' in departments_dim.columns:
@@ -721,14 +1073,16 @@ class ETLPipeline:
             if available_cols:
                 departments_dim = departments_dim[available_cols].drop_duplicates(subset=['department_id'], keep='first')
                 with engine.connect() as conn:
-                    conn.execute(text("DELETE FROM dim_department"))
+                    conn.execute(text(f"DELETE FROM {self._table('dim_department')}"))
                     conn.commit()
-                departments_dim.to_sql('dim_department', engine, if_exists='append', index=False)
+                departments_dim.to_sql(self._table('dim_department'), engine, if_exists='append', index=False)
                 self.logger.info(f"  -> Loaded {len(departments_dim)} departments into dim_department")
                 print(f"  -> Loaded {len(departments_dim)} departments into dim_department")
         
-        # Dim_Program - from source database
-        if 'programs_db1' in silver_data and not silver_data['programs_db1'].empty:
+        # Dim_Program - from source database (keeps the current rows when the source is empty)
+        if 'programs_db1' not in silver_data or silver_data['programs_db1'].empty:
+            self._copy_live_rows(engine, 'dim_program')
+        else:
             programs_dim = silver_data['programs_db1'].copy()
             # Map column names
             if 'ProgramID' in programs_dim.columns:
@@ -747,12 +1101,33 @@ class ETLPipeline:
             if available_cols:
                 programs_dim = programs_dim[available_cols].drop_duplicates(subset=['program_id'], keep='first')
                 with engine.connect() as conn:
-                    conn.execute(text("DELETE FROM dim_program"))
+                    conn.execute(text(f"DELETE FROM {self._table('dim_program')}"))
                     conn.commit()
-                programs_dim.to_sql('dim_program', engine, if_exists='append', index=False)
+                programs_dim.to_sql(self._table('dim_program'), engine, if_exists='append', index=False)
                 self.logger.info(f"  -> Loaded {len(programs_dim)} programs into dim_program")
                 print(f"  -> Loaded {len(programs_dim)} programs into dim_program")
         
+        return {'dim_student': students_dim, 'dim_course': courses_dim}
+        
+    def _assign_surrogate_keys(self, engine, dim_df, dimension):
+        """Add the integer warehouse key, keeping the key the live dimension already gave each natural key"""
+        natural, key = DIMENSION_KEYS[dimension]
+        existing = pd.DataFrame(columns=[natural, key])
+        with engine.connect() as conn:
+            if dimension in self._live_tables(conn):
+                live_columns = pd.read_sql_query(f"SELECT * FROM {dimension} LIMIT 0", conn).columns
+                if key in live_columns:
+                    existing = pd.read_sql_query(f"SELECT {natural}, {key} FROM {dimension}", conn)
+        
+        known = pd.Series(existing[key].to_numpy(), index=existing[natural].astype(str).to_numpy())
+        keys = dim_df[natural].astype(str).map(known)
+        new = keys.isna().to_numpy()
+        next_key = int(existing[key].max()) + 1 if not existing.empty else 1
+        keys[new] = np.arange(next_key, next_key + new.sum())
+        dim_df.insert(0, key, keys.astype('int64').to_numpy())
+        self.logger.info(f"  → {dimension}: {int(new.sum())} new {key} values, {int((~new).sum())} kept")
+        return dim_df
+    
     def _populate_time_dimension(self, engine):
         """Populate time dimension table"""
         self.logger.info("Populating time dimension...")
@@ -762,7 +1137,7 @@ class ETLPipeline:
         # This ensures we have dates for historical payments (2022) and future dates (2025-2026)
         dates = pd.date_range(start='2022-01-01', end='2026-12-31', freq='D')
         time_dim = pd.DataFrame({
-            'date_key': [d.strftime('%Y%m%d') for d in dates],
+            'date_key': dates.year * 10000 + dates.month * 100 + dates.day,
             'date': dates,
             'year': dates.year,
             'quarter': dates.quarter,
@@ -776,10 +1151,10 @@ class ETLPipeline:
         
         # Clear existing time dimension data first
         with engine.connect() as conn:
-            conn.execute(text("DELETE FROM dim_time"))
+            conn.execute(text(f"DELETE FROM {self._table('dim_time')}"))
             conn.commit()
         
-        time_dim.to_sql('dim_time', engine, if_exists='append', index=False, method='multi', chunksize=1000)
+        time_dim.to_sql(self._table('dim_time'), engine, if_exists='append', index=False, method='multi', chunksize=1000)
         self.logger.info(f"  → Loaded {len(time_dim)} time dimension records")
         print("Time dimension populated!")
         
@@ -787,7 +1162,7 @@ class ETLPipeline:
         """Create time dimension table (helper method)"""
         dates = pd.date_range(start='2023-01-01', end='2025-12-31', freq='D')
         time_dim = pd.DataFrame({
-            'date_key': [d.strftime('%Y%m%d') for d in dates],
+            'date_key': dates.year * 10000 + dates.month * 100 + dates.day,
             'date': dates,
             'year': dates.year,
             'quarter': dates.quarter,
@@ -802,113 +1177,39 @@ class ETLPipeline:
     
     def _create_facts(self, engine, silver_data):
         """Create fact tables for star schema"""
+        partitions = self._fact_partitions(engine)
         
         with engine.connect() as conn:
-            # Fact_Enrollment
-            conn.execute(text("DROP TABLE IF EXISTS fact_enrollment"))
-            conn.execute(text("""
-                CREATE TABLE fact_enrollment (
-                    enrollment_id VARCHAR(20) PRIMARY KEY,
-                    student_id VARCHAR(20),
-                    course_code VARCHAR(20),
-                    date_key VARCHAR(8),
-                    semester_id INT,
-                    status VARCHAR(20),
-                    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-                    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
-                    FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
-                    FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-                    INDEX idx_student (student_id),
-                    INDEX idx_course (course_code),
-                    INDEX idx_date (date_key),
-                    INDEX idx_semester (semester_id)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """))
-            
-            # Fact_Attendance
-            conn.execute(text("DROP TABLE IF EXISTS fact_attendance"))
-            conn.execute(text("""
-                CREATE TABLE fact_attendance (
-                    attendance_id INT AUTO_INCREMENT PRIMARY KEY,
-                    student_id VARCHAR(20),
-                    course_code VARCHAR(20),
-                    date_key VARCHAR(8),
-                    total_hours DECIMAL(10,2),
-                    days_present INT,
-                    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-                    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
-                    FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
-                    INDEX idx_student (student_id),
-                    INDEX idx_course (course_code),
-                    INDEX idx_date (date_key)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """))
-            
-            # Fact_Payment
-            conn.execute(text("DROP TABLE IF EXISTS fact_payment"))
-            conn.execute(text("""
-                CREATE TABLE fact_payment (
-                    payment_id VARCHAR(20) PRIMARY KEY,
-                    student_id VARCHAR(20),
-                    date_key VARCHAR(8),
-                    semester_id INT,
-                    year INT,
-                    tuition_national DECIMAL(15,2),
-                    tuition_international DECIMAL(15,2),
-                    functional_fees DECIMAL(15,2),
-                    amount DECIMAL(15,2),
-                    payment_method VARCHAR(50),
-                    status VARCHAR(20),
-                    student_type VARCHAR(20) DEFAULT 'national',
-                    payment_timestamp DATETIME,
-                    semester_start_date DATE,
-                    deadline_met BOOLEAN DEFAULT FALSE,
-                    deadline_type VARCHAR(50),
-                    weeks_from_deadline DECIMAL(5,2),
-                    late_penalty DECIMAL(15,2) DEFAULT 0,
-                    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-                    FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
-                    FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-                    INDEX idx_student (student_id),
-                    INDEX idx_date (date_key),
-                    INDEX idx_semester (semester_id),
-                    INDEX idx_year (year),
-                    INDEX idx_status (status),
-                    INDEX idx_payment_timestamp (payment_timestamp),
-                    INDEX idx_deadline_met (deadline_met),
-                    INDEX idx_deadline_type (deadline_type)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """))
-            
-            # Fact_Grade
-            conn.execute(text("DROP TABLE IF EXISTS fact_grade"))
-            conn.execute(text("""
-                CREATE TABLE fact_grade (
-                    grade_id VARCHAR(20) PRIMARY KEY,
-                    student_id VARCHAR(20),
-                    course_code VARCHAR(20),
-                    date_key VARCHAR(8),
-                    semester_id INT,
-                    coursework_score DECIMAL(5,2) NOT NULL,
-                    exam_score DECIMAL(5,2),
-                    grade DECIMAL(5,2) NOT NULL,
-                    letter_grade VARCHAR(5) NOT NULL,
-                    fcw BOOLEAN DEFAULT FALSE,
-                    exam_status VARCHAR(10),
-                    absence_reason VARCHAR(200),
-                    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-                    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
-                    FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
-                    FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-                    INDEX idx_student (student_id),
-                    INDEX idx_course (course_code),
-                    INDEX idx_date (date_key),
-                    INDEX idx_semester (semester_id),
-                    INDEX idx_grade (grade)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """))
+            # With deferred indexing the facts start with only their primary key;
+            # secondary indexes and foreign keys are added after the bulk insert
+            for table in FACT_SCHEMAS:
+                conn.execute(text(f"DROP TABLE IF EXISTS {self._table(table)}"))
+                conn.execute(text(create_table_sql(table, self._table, deferred=WAREHOUSE_DEFER_INDEXES,
+                                                   partitions=partitions.get(table))))
+                if table in partitions:
+                    self.logger.info(f"  → {table} partitioned by {WAREHOUSE_PARTITIONING} "
+                                     f"({len(partitions[table]) + 1} partitions)")
             conn.commit()
         
+        facts = self._build_facts(engine, silver_data)
+        self._bulk_load_facts(engine, facts, partitions)
+        return facts
+    
+    def _fact_partitions(self, engine):
+        """Partition bounds per partitioned fact, spanning the years of the time dimension"""
+        if WAREHOUSE_PARTITIONING == 'none':
+            return {}
+        with engine.connect() as conn:
+            years = conn.execute(text(
+                f"SELECT MIN(year), MAX(year) FROM {self._table('dim_time')}"
+            )).fetchone()
+        if years[0] is None:
+            return {}
+        bounds = partition_bounds(int(years[0]), int(years[1]), WAREHOUSE_PARTITIONING)
+        return {table: bounds for table in PARTITIONED_FACTS}
+    
+    def _build_facts(self, engine, silver_data):
+        """Build the fact rows from the silver layer and drop those failing referential integrity"""
         # Fact_Enrollment
         enrollments = silver_data['enrollments'].copy()
         enrollments['date_key'] = pd.to_datetime(enrollments['enrollment_date'], errors='coerce').dt.strftime('%Y%m%d').fillna('')
@@ -925,26 +1226,14 @@ class ETLPipeline:
                 return 3  # September (Advent)
             else:
                 return 1  # Default
-        enrollments['semester_id'] = enrollments['semester'].apply(map_ucu_semester_enroll)
+        # astype(object): a categorical's apply skips NaN, which must map to the default semester
+        enrollments['semester_id'] = enrollments['semester'].astype(object).apply(map_ucu_semester_enroll).astype(int)
         
         # Filter out rows with invalid date_key (must exist in dim_time)
         fact_enrollment = enrollments[['enrollment_id', 'student_id', 'course_code', 
                                       'date_key', 'semester_id', 'status']].copy()
         fact_enrollment = fact_enrollment[fact_enrollment['date_key'] != '']  # Remove invalid dates
         
-        # Filter to only include students that exist in dim_student
-        if not fact_enrollment.empty:
-            with engine.connect() as conn:
-                valid_students = pd.read_sql_query("SELECT student_id FROM dim_student", conn)
-            valid_student_ids = set(valid_students['student_id'].tolist())
-            fact_enrollment = fact_enrollment[fact_enrollment['student_id'].isin(valid_student_ids)]
-        
-        if not fact_enrollment.empty:
-            fact_enrollment.to_sql('fact_enrollment', engine, if_exists='append', index=False, method='multi', chunksize=50)
-            self.logger.info(f"  → Loaded {len(fact_enrollment)} enrollments into fact_enrollment")
-        else:
-            self.logger.warning("  → No enrollment data to load")
-        
         # Fact_Attendance
         attendance = silver_data['attendance'].copy()
         attendance['date_key'] = pd.to_datetime(attendance['attendance_date'], errors='coerce').dt.strftime('%Y%m%d').fillna('')
@@ -952,41 +1241,11 @@ class ETLPipeline:
         # Filter out rows with invalid dates
         attendance = attendance[attendance['date_key'] != '']
         
-        # Filter to only include students that exist in dim_student
-        if not attendance.empty:
-            # Get list of valid student_ids from dim_student
-            with engine.connect() as conn:
-                valid_students = pd.read_sql_query("SELECT student_id FROM dim_student", conn)
-            valid_student_ids = set(valid_students['student_id'].tolist())
-            attendance = attendance[attendance['student_id'].isin(valid_student_ids)]
-        
         if not attendance.empty:
             # Aggregate attendance by student, course, and date
-            # Check which columns exist
-            agg_dict = {'hours_attended': 'sum'}
-            if 'Status' in attendance.columns:
-                agg_dict['Status'] = lambda x: (x == 'Present').sum() if len(x) > 0 and 'Present' in x.values else 0
-            elif 'status' in attendance.columns:
-                agg_dict['status'] = lambda x: (x == 'Present').sum() if len(x) > 0 and 'Present' in x.values else 0
-            
-            attendance_agg = attendance.groupby(['student_id', 'course_code', 'date_key']).agg(agg_dict).reset_index()
-            
-            # Rename columns appropriately
-            if 'Status' in attendance_agg.columns or 'status' in attendance_agg.columns:
-                status_col = 'Status' if 'Status' in attendance_agg.columns else 'status'
-                attendance_agg.columns = ['student_id', 'course_code', 'date_key', 
-                                          'total_hours', 'days_present']
-            else:
-                # If no status column, calculate days_present from hours_attended
-                attendance_agg['days_present'] = (attendance_agg['hours_attended'] > 0).astype(int)
-                attendance_agg.columns = ['student_id', 'course_code', 'date_key', 
-                                          'total_hours', 'days_present']
-            
-            fact_attendance = attendance_agg.copy()
-            fact_attendance.to_sql('fact_attendance', engine, if_exists='append', index=False, method='multi', chunksize=50)
-            self.logger.info(f"  → Loaded {len(fact_attendance)} attendance records into fact_attendance")
+            fact_attendance = aggregate_attendance(attendance)
         else:
-            self.logger.warning("  → No attendance data to load")
+            fact_attendance = pd.DataFrame()
         
         # Fact_Payment
         payments = silver_data['payments'].copy()
@@ -1006,7 +1265,7 @@ class ETLPipeline:
                 return 3  # September (Advent)
             else:
                 return 1  # Default
-        payments['semester_id'] = payments['semester'].apply(map_ucu_semester)
+        payments['semester_id'] = payments['semester'].astype(object).apply(map_ucu_semester).astype(int)
         
         # Extract year if present, otherwise from payment_date
         if 'year' in payments.columns:
@@ -1192,32 +1451,6 @@ class ETLPipeline:
         fact_payment = payments[available_cols].copy()
         fact_payment = fact_payment[fact_payment['date_key'] != '']  # Remove invalid dates
         
-        # Filter to only include date_keys that exist in dim_time
-        if not fact_payment.empty:
-            with engine.connect() as conn:
-                valid_dates = pd.read_sql_query("SELECT date_key FROM dim_time", conn)
-            valid_date_keys = set(valid_dates['date_key'].astype(str).tolist())
-            initial_count = len(fact_payment)
-            fact_payment = fact_payment[fact_payment['date_key'].astype(str).isin(valid_date_keys)]
-            if initial_count > len(fact_payment):
-                self.logger.warning(f"  → Filtered out {initial_count - len(fact_payment)} payment records with invalid date_keys")
-        
-        # Filter to only include students that exist in dim_student
-        if not fact_payment.empty:
-            with engine.connect() as conn:
-                valid_students = pd.read_sql_query("SELECT student_id FROM dim_student", conn)
-            valid_student_ids = set(valid_students['student_id'].tolist())
-            initial_count = len(fact_payment)
-            fact_payment = fact_payment[fact_payment['student_id'].isin(valid_student_ids)]
-            if initial_count > len(fact_payment):
-                self.logger.warning(f"  → Filtered out {initial_count - len(fact_payment)} payment records with invalid student_ids")
-        
-        if not fact_payment.empty:
-            fact_payment.to_sql('fact_payment', engine, if_exists='append', index=False, method='multi', chunksize=50)
-            self.logger.info(f"  → Loaded {len(fact_payment)} payments into fact_payment")
-        else:
-            self.logger.warning("  → No payment data to load")
-        
         # Fact_Grade
         grades = silver_data['grades'].copy()
         grades['date_key'] = pd.to_datetime(grades['exam_date'], errors='coerce').dt.strftime('%Y%m%d').fillna('')
@@ -1234,7 +1467,7 @@ class ETLPipeline:
                 return 3  # September (Advent)
             else:
                 return 1  # Default
-        grades['semester_id'] = grades['semester'].apply(map_ucu_semester_grade)
+        grades['semester_id'] = grades['semester'].astype(object).apply(map_ucu_semester_grade).astype(int)
         
         # Filter out rows with invalid dates
         # Ensure all required columns exist
@@ -1256,33 +1489,348 @@ class ETLPipeline:
         fact_grade = grades[grade_cols].copy()
         fact_grade = fact_grade[fact_grade['date_key'] != '']  # Remove invalid dates
         
-        # Filter to only include students that exist in dim_student
-        if not fact_grade.empty:
-            with engine.connect() as conn:
-                valid_students = pd.read_sql_query("SELECT student_id FROM dim_student", conn)
-            valid_student_ids = set(valid_students['student_id'].tolist())
-            fact_grade = fact_grade[fact_grade['student_id'].isin(valid_student_ids)]
+        # Validate every foreign key of every fact before the first row is written,
+        # so an orphan can no longer abort the load halfway through the fact tables
+        facts = self._enforce_referential_integrity(engine, {
+            'fact_enrollment': fact_enrollment,
+            'fact_attendance': fact_attendance,
+            'fact_payment': fact_payment,
+            'fact_grade': fact_grade
+        })
+        return facts
+    
+    def _bulk_load_facts(self, engine, facts, partitions=None):
+        """Insert the facts on one session tuned for bulk loading, then build indexes and FKs"""
+        with engine.connect() as conn:
+            # Keys were validated by _enforce_referential_integrity, so per-row checks can be relaxed
+            for setting, value in WAREHOUSE_LOAD_SESSION.items():
+                conn.execute(text(f"SET SESSION {setting} = {int(value)}"))
+            try:
+                for table, fact_df in facts.items():
+                    if not fact_df.empty:
+                        fact_df.to_sql(self._table(table), conn, if_exists='append', index=False,
+                                       method='multi', chunksize=WAREHOUSE_LOAD_CHUNKSIZE)
+                        self.logger.info(f"  → Loaded {len(fact_df)} rows into {table}")
+                    else:
+                        self.logger.warning(f"  → No data to load into {table}")
+                conn.commit()
+                
+                if WAREHOUSE_DEFER_INDEXES:
+                    for table in facts:
+                        start = datetime.now()
+                        conn.execute(text(add_constraints_sql(table, self._table,
+                                                              partitioned=table in (partitions or {}))))
+                        self.logger.info(f"  → Built indexes and foreign keys on {table} "
+                                         f"in {(datetime.now() - start).total_seconds():.1f}s")
+                    conn.commit()
+                self.logger.info(f"  → Workload index set v{WORKLOAD_INDEX_VERSION} applied")
+            finally:
+                for setting in WAREHOUSE_LOAD_SESSION:
+                    conn.execute(text(f"SET SESSION {setting} = 1"))
+    
+    def refresh_partitions(self, silver_data, since):
+        """Rebuild the partitions of the partitioned facts from date_key `since` onwards, in place
+        
+        Every partition whose range ends after `since` is rebuilt in a staging table and swapped
+        in with EXCHANGE PARTITION (or truncated when it has no rows any more), so the live
+        tables never see row-by-row deletes. Dimensions are not reloaded: fact rows referencing
+        keys missing from the live dimensions are quarantined, and need a full load.
+        """
+        self.logger.info("=" * 60)
+        self.logger.info(f"PARTITION REFRESH - facts from {since}")
+        self.logger.info("=" * 60)
+        print(f"Refreshing fact partitions from {since}...")
         
-        if not fact_grade.empty:
-            fact_grade.to_sql('fact_grade', engine, if_exists='append', index=False, method='multi', chunksize=50)
-            self.logger.info(f"  → Loaded {len(fact_grade)} grades into fact_grade")
-        else:
-            self.logger.warning("  → No grade data to load")
+        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        with engine.connect() as conn:
+            partitions = self._live_partitions(conn)
+        not_partitioned = [t for t in PARTITIONED_FACTS if t not in partitions]
+        if not_partitioned:
+            raise RuntimeError(f"{not_partitioned} are not partitioned; run a full load with "
+                               f"WAREHOUSE_PARTITIONING=year or semester first")
+        
+        facts = self._build_facts(engine, silver_data)
+        with engine.connect() as conn:
+            for table in PARTITIONED_FACTS:
+                fact_df = facts[table]
+                bounds = self._extend_partitions(conn, table, partitions[table], fact_df)
+                # Whole partitions are rebuilt, so rows before `since` in the first one are reloaded too
+                targets = [name for name, upper in bounds if upper > since] + ['pmax']
+                if 'date_key' not in fact_df.columns:
+                    fact_df = pd.DataFrame(columns=['date_key'])
+                # partition_for() per row, vectorized: index of the first bound above the key, past the last is pmax
+                names = np.asarray([name for name, _ in bounds] + ['pmax'], dtype=object)
+                uppers = np.asarray([upper for _, upper in bounds], dtype=np.float64)
+                date_keys = pd.to_numeric(fact_df['date_key'], errors='coerce').to_numpy(dtype=np.float64)
+                assigned = names[np.searchsorted(uppers, date_keys, side='right')]
+                for name in targets:
+                    rows = fact_df[assigned == name]
+                    if rows.empty:
+                        conn.execute(text(f"ALTER TABLE {table} TRUNCATE PARTITION {name}"))
+                        conn.commit()
+                        continue
+                    self._exchange_partition(conn, table, name, rows)
+                    self.logger.info(f"  → {table}.{name}: exchanged {len(rows)} rows")
+            self._record_generation(conn)
+            conn.commit()
+        self._purge_prediction_cache()
+        
+        if GOLD_PUBLISH_ENABLED:
+            with engine.connect() as conn:
+                # The gold generation also needs the tables this refresh did not touch
+                dimensions = {name: pd.read_sql_query(f"SELECT * FROM {name}", conn)
+                              for name in ('dim_student', 'dim_course')}
+                for table in FACT_SCHEMAS:
+                    if table not in PARTITIONED_FACTS:
+                        facts[table] = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+            self.publish_gold(facts, dimensions)
+        engine.dispose()
+        print("Partition refresh complete!")
+    
+    def _live_partitions(self, conn):
+        """{table: [(partition, exclusive upper date_key)]} of the partitioned live facts, without pmax"""
+        rows = pd.read_sql_query("""
+            SELECT table_name AS name, partition_name AS part, partition_description AS upper_bound
+            FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND partition_name IS NOT NULL
+            ORDER BY table_name, partition_ordinal_position
+        """, conn)
+        partitions = {}
+        for row in rows.itertuples(index=False):
+            if row.name in PARTITIONED_FACTS and row.upper_bound != 'MAXVALUE':
+                partitions.setdefault(row.name, []).append((row.part, int(row.upper_bound)))
+        return partitions
+    
+    def _extend_partitions(self, conn, table, bounds, fact_df):
+        """Split new year/semester partitions out of pmax when the facts run past the last bound"""
+        if fact_df.empty or fact_df['date_key'].max() < bounds[-1][1]:
+            return bounds
+        granularity = 'semester' if '_s' in bounds[-1][0] else 'year'
+        last_year = int(fact_df['date_key'].max()) // 10000
+        new_bounds = [b for b in partition_bounds(bounds[-1][1] // 10000, last_year, granularity)
+                      if b[1] > bounds[-1][1]]
+        conn.execute(text(split_pmax_sql(table, new_bounds)))
+        conn.commit()
+        self.logger.info(f"  → {table}: added partitions {', '.join(name for name, _ in new_bounds)}")
+        return bounds + new_bounds
+    
+    def _exchange_partition(self, conn, table, partition, rows):
+        """Load rows into an unpartitioned copy of the table and swap it with one partition"""
+        stage = f"{table}{EXCHANGE_SUFFIX}"
+        conn.execute(text(f"DROP TABLE IF EXISTS {stage}"))
+        conn.execute(text(f"CREATE TABLE {stage} LIKE {table}"))
+        conn.execute(text(f"ALTER TABLE {stage} REMOVE PARTITIONING"))
+        rows.to_sql(stage, conn, if_exists='append', index=False,
+                    method='multi', chunksize=WAREHOUSE_LOAD_CHUNKSIZE)
+        conn.execute(text(f"ALTER TABLE {table} EXCHANGE PARTITION {partition} WITH TABLE {stage}"))
+        # The staging table now holds the partition's previous rows
+        conn.execute(text(f"DROP TABLE {stage}"))
+        conn.commit()
+    
+    def _enforce_referential_integrity(self, engine, facts):
+        """Check all fact foreign keys against the dimensions, quarantine orphan rows and
+        replace the natural keys of the remaining rows with the integer warehouse keys"""
+        self.logger.info("Validating fact foreign keys...")
+        # One round-trip per dimension, shared by every fact that references it
+        dimension_keys = {}
+        with engine.connect() as conn:
+            for dimension, (natural, key) in DIMENSION_KEYS.items():
+                columns = natural if natural == key else f"{natural}, {key}"
+                keys = pd.read_sql_query(f"SELECT {columns} FROM {self._table(dimension)}", conn)
+                keys = keys.dropna(subset=[natural]).drop_duplicates(natural)
+                dimension_keys[dimension] = (pd.Index(keys[natural]), keys[key].to_numpy())
+        
+        valid_facts = {}
+        for table, fact_df in facts.items():
+            if fact_df.empty:
+                valid_facts[table] = fact_df
+                continue
+            orphans = {}
+            positions = {}
+            referenced = {}
+            for column, dimension in FACT_FOREIGN_KEYS[table].items():
+                natural = DIMENSION_KEYS[dimension][0]
+                if natural not in fact_df.columns:
+                    continue
+                referenced[natural] = dimension
+                key_index = dimension_keys[dimension][0]
+                if key_index.dtype == object:
+                    values = fact_df[natural].to_numpy(dtype=object)
+                else:
+                    # e.g. 'YYYYMMDD' strings against the INT date_key of dim_time
+                    values = pd.to_numeric(fact_df[natural], errors='coerce').to_numpy()
+                positions[column] = key_index.get_indexer(values)
+                orphans[natural] = positions[column] == -1
+            
+            orphans = pd.DataFrame(orphans, index=fact_df.index)
+            is_orphan = orphans.any(axis=1)
+            if is_orphan.any():
+                for natural, count in orphans.sum().items():
+                    if count:
+                        self.logger.warning(f"  → {table}: {count} rows with {natural} missing from "
+                                            f"{referenced[natural]}")
+                quarantined = fact_df[is_orphan].copy()
+                quarantined['_violation'] = orphans[is_orphan].dot(orphans.columns + ',').str.rstrip(',')
+                self._quarantine(table, quarantined)
+            
+            valid = fact_df[~is_orphan].copy()
+            keep = ~is_orphan.to_numpy()
+            for column, found in positions.items():
+                dimension = FACT_FOREIGN_KEYS[table][column]
+                natural = DIMENSION_KEYS[dimension][0]
+                valid[column] = dimension_keys[dimension][1][found[keep]]
+                if natural != column:
+                    valid = valid.drop(columns=natural)
+            schema_columns = [c for c, _ in FACT_SCHEMAS[table]['columns'] if c in valid.columns]
+            valid_facts[table] = valid[schema_columns]
+        return valid_facts
+    
+    def _quarantine(self, table, rows):
+        """Write fact rows that failed referential integrity to the quarantine area"""
+        QUARANTINE_PATH.mkdir(parents=True, exist_ok=True)
+        path = QUARANTINE_PATH / f"{table}_{self.run_id}.parquet"
+        rows.to_parquet(path, index=False)
+        self.logger.warning(f"  → Quarantined {len(rows)} {table} rows to {path}")
+        return path
+    
+    def publish_gold(self, facts, dimensions):
+        """Publish loaded facts, dimensions and key aggregates to partitioned parquet (Gold layer)"""
+        from gold_layer import GoldLayerWriter
+        try:
+            self.logger.info(f"Publishing gold layer generation {self.run_id}...")
+            manifest = GoldLayerWriter(self.gold_path).publish(self.run_id, facts, dimensions)
+            for table, rows in manifest['tables'].items():
+                self.logger.info(f"  → {table}: {rows} rows")
+            print(f"Gold layer generation {self.run_id} published to {self.gold_path}")
+        except Exception as e:
+            # The warehouse is already loaded; a failed publish only disables the columnar path
+            self.logger.warning(f"Gold layer publish failed, analytics will keep using MySQL: {e}", exc_info=True)
+    
+    def apply_lake_retention(self):
+        """Keep the latest bronze/silver snapshots and compact older ones"""
+        try:
+            summary = self.lake.apply_retention()
+            for layer, tables in summary.items():
+                for table, stats in tables.items():
+                    self.logger.info(f"  → Compacted {layer}/{table}: {stats['snapshots']} snapshots, "
+                                     f"{stats['rows_in']} → {stats['rows_out']} rows")
+        except Exception as e:
+            self.logger.warning(f"Lake retention failed, snapshots left in place: {e}", exc_info=True)
+    
+    def load_bronze_snapshot(self, snapshot_id='latest'):
+        """Load a bronze snapshot from the lake instead of extracting from the source databases"""
+        self.logger.info("=" * 60)
+        self.logger.info(f"REPLAY - Loading bronze snapshot '{snapshot_id}'")
+        self.logger.info("=" * 60)
+        snapshot_id, tables = self.lake.load_snapshot('bronze', snapshot_id)
+        bronze_data = {name: tables.get(name, pd.DataFrame()) for name in BRONZE_TABLES}
+        for name, df in bronze_data.items():
+            if not df.empty:
+                self.logger.info(f"  → {name}: {len(df)} rows")
+        self.bronze_snapshot_id = snapshot_id
+        print(f"Loaded bronze snapshot {snapshot_id}")
+        return bronze_data
+    
+    def _transform_fingerprint(self):
+        """Hash of the transform stage code, used as part of the silver stage cache key"""
+        digest = hashlib.sha256()
+        for name in self.TRANSFORM_STAGE:
+            digest.update(inspect.getsource(getattr(type(self), name)).encode('utf-8'))
+        digest.update(json.dumps([SILVER_SCHEMAS, KEY_SOURCES, KEY_LOOKUP_TABLES], sort_keys=True).encode('utf-8'))
+        digest.update(inspect.getsource(_format_key).encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def _stage_cache_file(self):
+        return self.silver_path / '_stage_cache.json'
     
-    def run(self):
-        """Run the complete ETL pipeline"""
+    def run_transform_stage(self, bronze_data, use_cache=True):
+        """Run transform, reusing the silver snapshot already produced from the same bronze snapshot and code"""
+        fingerprint = self._transform_fingerprint()
+        cache_key = f"{self.bronze_snapshot_id}:{fingerprint}"
+        cache_file = self._stage_cache_file()
+        cache = json.loads(cache_file.read_text(encoding='utf-8')) if cache_file.exists() else {}
+        
+        if use_cache and self.bronze_snapshot_id and cache_key in cache:
+            try:
+                silver_id, tables = self.lake.load_snapshot('silver', cache[cache_key])
+                silver_data = {name: tables.get(name, pd.DataFrame()) for name in SILVER_TABLES}
+                for name in PASSTHROUGH_TABLES:
+                    silver_data[name] = bronze_data.get(name, pd.DataFrame())
+                self.logger.info(f"Transform stage cache hit: reusing silver snapshot {silver_id} "
+                                 f"(bronze {self.bronze_snapshot_id}, transform {fingerprint})")
+                print(f"Reusing cached silver snapshot {silver_id}")
+                return silver_data
+            except FileNotFoundError:
+                self.logger.info(f"Cached silver snapshot {cache[cache_key]} no longer available, re-running transform")
+        
+        silver_data = self.transform(bronze_data)
+        silver_pointer = self.lake.get_latest('silver')
+        if self.bronze_snapshot_id and silver_pointer:
+            self.lake.set_latest('silver', silver_pointer['snapshot_id'],
+                                 source_snapshot=self.bronze_snapshot_id, transform_fingerprint=fingerprint)
+            cache[cache_key] = silver_pointer['snapshot_id']
+            cache_file.write_text(json.dumps(cache, indent=2), encoding='utf-8')
+        return silver_data
+    
+    def validate_silver(self, silver_data):
+        """Summarise the silver layer (row counts and unresolved keys) for validation runs"""
+        self.logger.info("=" * 60)
+        self.logger.info("SILVER VALIDATION")
+        self.logger.info("=" * 60)
+        report = {}
+        for name in SILVER_TABLES:
+            df = silver_data.get(name, pd.DataFrame())
+            table_report = {'rows': len(df)}
+            for key in ['student_id', 'course_code']:
+                if key in df.columns:
+                    missing = df[key].isna() | (df[key].astype(str) == '')
+                    table_report[f"missing_{key}"] = int(missing.sum())
+            report[name] = table_report
+            self.logger.info(f"  → {name}: {table_report}")
+            print(f"  {name}: {table_report}")
+        return report
+    
+    def run(self, mode='full', snapshot='latest', stop_after='load', use_stage_cache=True, refresh_since=None):
+        """Run the ETL pipeline
+        
+        mode='full' extracts from DB1, DB2 and the CSVs; mode='replay' starts from a bronze
+        snapshot ID (or 'latest') and never touches the source databases.
+        stop_after='transform' skips the warehouse load so the silver layer can be validated.
+        refresh_since (a yyyymmdd date_key) replaces the shadow-table load with an in-place
+        refresh of the partitioned facts from that date onwards.
+        """
+        if mode not in ('full', 'replay'):
+            raise ValueError(f"Unknown ETL mode: {mode}")
+        if stop_after not in ('transform', 'load'):
+            raise ValueError(f"Unknown stop_after stage: {stop_after}")
+        
         start_time = datetime.now()
         self.logger.info("=" * 60)
         self.logger.info("ETL PIPELINE STARTED")
         self.logger.info(f"Start time: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.logger.info(f"Mode: {mode}" + (f" (bronze snapshot: {snapshot})" if mode == 'replay' else '') +
+                         f", stop after: {stop_after}" +
+                         (f", refresh partitions from {refresh_since}" if refresh_since else ''))
         self.logger.info("=" * 60)
         print("Starting ETL Pipeline...")
         print(f"Log file: {self.log_file}")
         
         try:
-            bronze_data = self.extract()
-            silver_data = self.transform(bronze_data)
-            self.load_to_warehouse(silver_data)
+            if mode == 'replay':
+                bronze_data = self.load_bronze_snapshot(snapshot)
+            else:
+                bronze_data = self.extract()
+            silver_data = self.run_transform_stage(bronze_data, use_cache=use_stage_cache)
+            
+            if stop_after == 'transform':
+                self.validate_silver(silver_data)
+            elif refresh_since:
+                self.refresh_partitions(silver_data, refresh_since)
+            else:
+                self.load_to_warehouse(silver_data)
+            if stop_after == 'load' and RISK_SCORING_AFTER_ETL:
+                self.score_students()
+            self.apply_lake_retention()
             
             end_time = datetime.now()
             duration = end_time - start_time
@@ -1299,5 +1847,24 @@ class ETLPipeline:
             raise
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the UCU ETL pipeline")
+    parser.add_argument('--replay', nargs='?', const='latest', metavar='SNAPSHOT_ID',
+                        help="Transform and load from a bronze snapshot (default: latest) without extracting")
+    parser.add_argument('--transform-only', action='store_true',
+                        help="Stop after transform and print a silver validation summary")
+    parser.add_argument('--no-stage-cache', action='store_true',
+                        help="Always re-run transform when replaying")
+    parser.add_argument('--refresh-partitions', nargs='?', type=int, const=datetime.now().year * 10000 + 101,
+                        metavar='YYYYMMDD',
+                        help="Only rebuild the fact partitions from this date (default: start of this year)")
+    args = parser.parse_args()
+    
     pipeline = ETLPipeline()
-    pipeline.run()
+    pipeline.run(
+        mode='replay' if args.replay else 'full',
+        snapshot=args.replay or 'latest',
+        stop_after='transform' if args.transform_only else 'load',
+        use_stage_cache=not args.no_stage_cache,
+        refresh_since=args.refresh_partitions
+    )
@@ -0,0 +1,79 @@
+"""
+Feature Encoder
+Builds the scaled float64 feature vector of one student straight from a SQL
+result row, for the online /predict paths of MultiModelPredictor.
+
+The trained LabelEncoders are compiled once per model version into plain dicts
+(category -> code) with an explicit bucket for categories never seen in
+training, and the StandardScaler into its mean and scale arrays. Encoding a row
+is then one dict lookup or float() per feature; no DataFrame is built. The
+result equals the pandas path of MultiModelPredictor.encode_features().
+"""
+import numpy as np
+
+# Code of a category that was not seen in training, unless training had an 'Unknown' category
+UNKNOWN_CODE = -1.0
+# Value training used for missing categories
+MISSING_CATEGORY = 'Unknown'
+
+
+def category_codes(label_encoder):
+    """({category: code}, unknown code) of a fitted LabelEncoder"""
+    codes = {str(category): float(code) for code, category in enumerate(label_encoder.classes_)}
+    return codes, codes.get(MISSING_CATEGORY, UNKNOWN_CODE)
+
+
+def _to_float(value):
+    """float of a numeric SQL value; None, NaN and anything non-numeric become 0 as in training"""
+    if value is None:
+        return 0.0
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if value != value else value
+
+
+class CompiledFeatureEncoder:
+    """Label encoders, feature order and scaler of one trained model set, as lookup tables"""
+
+    def __init__(self, feature_cols, label_encoders, scaler):
+        self.feature_cols = list(feature_cols)
+        self.categories = {col: category_codes(le) for col, le in label_encoders.items()}
+        self._plan = [(col, self.categories.get(col)) for col in self.feature_cols]
+        # StandardScaler.transform: (X - mean_) / scale_, either step skipped when the attribute is None
+        self.mean = getattr(scaler, 'mean_', None)
+        self.scale = getattr(scaler, 'scale_', None)
+        self._warned_missing = False
+
+    def encode(self, row):
+        """Unscaled float64 vector of a mapping (e.g. a SQLAlchemy RowMapping); columns the row
+        lacks are 0"""
+        values = np.empty(len(self._plan), dtype=np.float64)
+        missing = []
+        for i, (col, category) in enumerate(self._plan):
+            if col not in row:
+                missing.append(col)
+                values[i] = 0.0
+            elif category is not None:
+                codes, unknown = category
+                value = row[col]
+                values[i] = codes.get(MISSING_CATEGORY if value is None else str(value), unknown)
+            else:
+                values[i] = _to_float(row[col])
+        if missing and not self._warned_missing:
+            print(f"Warning: Missing columns in prediction data (using 0): {missing}")
+            self._warned_missing = True
+        return values
+
+    def scale_matrix(self, X):
+        """Scale an encoded float64 matrix in place, as StandardScaler.transform would"""
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    def transform(self, row):
+        """Scaled (1, n_features) matrix of one row, ready for the models"""
+        return self.scale_matrix(self.encode(row).reshape(1, -1))
@@ -0,0 +1,351 @@
+"""
+Gold Layer - Columnar serving path for read-only analytics
+Publishes warehouse facts and key aggregates to partitioned parquet under data/gold/
+and answers dashboard queries from those files with pyarrow.
+MySQL stays the system of record; this module is only a read path.
+"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from config import GOLD_PATH, GOLD_SERVING_ENABLED, GOLD_KEEP_GENERATIONS
+
+MANIFEST_FILE = '_manifest.json'
+
+# Facts are partitioned by calendar year (from date_key) and semester
+PARTITIONING = ds.partitioning(
+    pa.schema([('calendar_year', pa.int32()), ('semester_id', pa.int32())]),
+    flavor='hive'
+)
+YEAR_PARTITIONING = ds.partitioning(pa.schema([('calendar_year', pa.int32())]), flavor='hive')
+
+FACT_TABLES = ['fact_enrollment', 'fact_attendance', 'fact_payment', 'fact_grade']
+DIMENSION_TABLES = ['dim_student', 'dim_course']
+
+# Same ordering as the CASE expression used by /api/dashboard/grade-distribution
+LETTER_GRADE_ORDER = {'A': 1, 'B+': 2, 'B': 3, 'C+': 4, 'C': 5, 'D+': 6, 'D': 7, 'F': 8}
+
+
+def semester_from_month(month):
+    """Map a calendar month to the UCU semester_id (Jan Easter, May Trinity, September Advent)"""
+    return pd.cut(month, bins=[0, 4, 8, 12], labels=[1, 2, 3]).astype(int)
+
+
+def _add_time_columns(df):
+    """Add calendar_year, quarter and (if missing) semester_id derived from date_key"""
+    date_key = df['date_key'].astype(str)
+    df['calendar_year'] = pd.to_numeric(date_key.str[:4], errors='coerce').fillna(0).astype('int32')
+    month = pd.to_numeric(date_key.str[4:6], errors='coerce').fillna(1).astype(int)
+    df['quarter'] = ((month - 1) // 3 + 1).astype('int8')
+    if 'semester_id' not in df.columns:
+        df['semester_id'] = semester_from_month(month)
+    df['semester_id'] = pd.to_numeric(df['semester_id'], errors='coerce').fillna(1).astype('int32')
+    return df
+
+
+def _to_arrow(df):
+    """Arrow table of a frame with categorical columns as plain strings. pyarrow's string
+    kernels (match_substring) have no dictionary variant, and parquet dictionary-encodes
+    repeated strings on disk anyway."""
+    categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if categorical:
+        df = df.astype({col: object for col in categorical})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class GoldLayerWriter:
+    """Publishes a warehouse generation to partitioned parquet"""
+
+    def __init__(self, gold_path=GOLD_PATH, keep_generations=GOLD_KEEP_GENERATIONS):
+        self.gold_path = Path(gold_path)
+        self.gold_path.mkdir(parents=True, exist_ok=True)
+        self.keep_generations = max(1, keep_generations)
+
+    def publish(self, generation, facts, dimensions):
+        """Write facts, dimensions and aggregates for one generation, then switch the manifest"""
+        generation_dir = self.gold_path / f"generation={generation}"
+        if generation_dir.exists():
+            shutil.rmtree(generation_dir)
+        generation_dir.mkdir(parents=True)
+
+        tables = {}
+        prepared = {}
+        for name in FACT_TABLES:
+            df = facts.get(name)
+            if df is None or df.empty:
+                continue
+            df = _add_time_columns(df.copy())
+            prepared[name] = df
+            self._write_partitioned(df, generation_dir / name, PARTITIONING)
+            tables[name] = len(df)
+
+        for name in DIMENSION_TABLES:
+            df = dimensions.get(name)
+            if df is None or df.empty:
+                continue
+            (generation_dir / name).mkdir(parents=True)
+            pa_table = _to_arrow(df)
+            ds.write_dataset(pa_table, generation_dir / name, format='parquet',
+                             basename_template='part-{i}.parquet')
+            tables[name] = len(df)
+
+        for name, df in self._build_aggregates(prepared, dimensions).items():
+            self._write_partitioned(df, generation_dir / name, YEAR_PARTITIONING)
+            tables[name] = len(df)
+
+        # Readers only ever follow the manifest, so swapping it makes the new generation visible atomically
+        manifest = {
+            'generation': generation,
+            'path': generation_dir.name,
+            'tables': tables,
+            'published_at': pd.Timestamp.now().isoformat()
+        }
+        tmp_manifest = self.gold_path / f"{MANIFEST_FILE}.tmp"
+        tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(tmp_manifest, self.gold_path / MANIFEST_FILE)
+
+        self._prune_generations(generation_dir.name)
+        return manifest
+
+    def _write_partitioned(self, df, base_dir, partitioning):
+        pa_table = _to_arrow(df)
+        ds.write_dataset(
+            pa_table, base_dir, format='parquet', partitioning=partitioning,
+            basename_template='part-{i}.parquet', existing_data_behavior='delete_matching'
+        )
+
+    def _build_aggregates(self, facts, dimensions):
+        """Pre-aggregate the trend and distribution tiles at (calendar_year, quarter) grain"""
+        aggregates = {}
+
+        grades = facts.get('fact_grade')
+        if grades is not None:
+            completed = grades['exam_status'] == 'Completed'
+            grades = grades.assign(
+                completed_grade=grades['grade'].where(completed),
+                is_completed=completed.astype(int),
+                is_mex=(grades['exam_status'] == 'MEX').astype(int),
+                is_fex=(grades['exam_status'] == 'FEX').astype(int)
+            )
+            aggregates['agg_grades_by_quarter'] = grades.groupby(['calendar_year', 'quarter'], as_index=False).agg(
+                avg_grade=('completed_grade', 'mean'),
+                completed_exams=('is_completed', 'sum'),
+                missed_exams=('is_mex', 'sum'),
+                failed_exams=('is_fex', 'sum'),
+                total_students=('student_key', 'nunique'),
+                total_courses=('course_key', 'nunique')
+            )
+            aggregates['agg_grade_distribution'] = grades.groupby(
+                ['calendar_year', 'semester_id', 'letter_grade'], as_index=False, observed=True
+            ).size().rename(columns={'size': 'count'})
+
+        attendance = facts.get('fact_attendance')
+        if attendance is not None:
+            aggregates['agg_attendance_by_quarter'] = attendance.groupby(['calendar_year', 'quarter'], as_index=False).agg(
+                avg_attendance=('total_hours', 'mean'),
+                avg_days_present=('days_present', 'mean'),
+                total_hours=('total_hours', 'sum'),
+                total_days_present=('days_present', 'sum'),
+                total_students=('student_key', 'nunique'),
+                total_courses=('course_key', 'nunique')
+            )
+            courses = dimensions.get('dim_course')
+            if courses is not None and not courses.empty:
+                by_course = attendance.merge(courses[['course_key', 'course_name']], on='course_key', how='inner')
+                aggregates['agg_attendance_by_course'] = by_course.groupby(
+                    ['calendar_year', 'course_name'], as_index=False
+                ).agg(hours_sum=('total_hours', 'sum'), hours_count=('total_hours', 'count'),
+                      total_days=('days_present', 'sum'))
+
+        payments = facts.get('fact_payment')
+        if payments is not None:
+            completed = payments['status'] == 'Completed'
+            payments = payments.assign(
+                completed_amount=payments['amount'].where(completed, 0),
+                is_completed=completed.astype(int),
+                is_pending=(payments['status'] == 'Pending').astype(int)
+            )
+            aggregates['agg_payments_by_quarter'] = payments.groupby(['calendar_year', 'quarter'], as_index=False).agg(
+                total_amount=('completed_amount', 'sum'),
+                completed_count=('is_completed', 'sum'),
+                pending_count=('is_pending', 'sum')
+            )
+            aggregates['agg_payment_status'] = payments.groupby(
+                ['calendar_year', 'semester_id', 'status'], as_index=False, observed=True
+            ).size().rename(columns={'size': 'count'})
+
+        return aggregates
+
+    def _prune_generations(self, current):
+        """Keep the current generation plus the most recent previous ones for in-flight readers"""
+        previous = sorted(p for p in self.gold_path.glob('generation=*') if p.is_dir() and p.name != current)
+        keep_previous = self.keep_generations - 1
+        stale = previous[:len(previous) - keep_previous] if keep_previous > 0 else previous
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class GoldQueryEngine:
+    """Answers read-only dashboard queries from the published gold layer"""
+
+    def __init__(self, gold_path=GOLD_PATH):
+        self.gold_path = Path(gold_path)
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._manifest = None
+        self._datasets = {}
+
+    # ---------- dataset cache ----------
+
+    def _refresh_manifest(self):
+        """Reload the manifest when the ETL publishes a new generation and drop cached datasets"""
+        manifest_file = self.gold_path / MANIFEST_FILE
+        mtime = manifest_file.stat().st_mtime
+        if mtime != self._manifest_mtime:
+            self._manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+            self._manifest_mtime = mtime
+            self._datasets = {}
+        return self._manifest
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._refresh_manifest()['generation']
+
+    def dataset(self, name):
+        """Get a (cached) pyarrow dataset for a published table"""
+        with self._lock:
+            manifest = self._refresh_manifest()
+            if name not in manifest['tables']:
+                raise KeyError(f"Table {name} not published in gold generation {manifest['generation']}")
+            if name not in self._datasets:
+                if name in FACT_TABLES:
+                    partitioning = PARTITIONING
+                elif name.startswith('agg_'):
+                    partitioning = YEAR_PARTITIONING
+                else:
+                    partitioning = None
+                self._datasets[name] = ds.dataset(
+                    self.gold_path / manifest['path'] / name, format='parquet', partitioning=partitioning
+                )
+            return self._datasets[name]
+
+    def read(self, name, columns=None, filter=None):
+        """Read a table with column pruning and predicate pushdown"""
+        return self.dataset(name).to_table(columns=columns, filter=filter)
+
+    def count(self, name, filter=None):
+        return self.dataset(name).count_rows(filter=filter)
+
+    # ---------- dashboard queries ----------
+
+    def dashboard_stats(self):
+        """Same payload as /api/dashboard/stats"""
+        exam_status = pc.field('exam_status')
+
+        students = self.read('dim_student', columns=['student_id', 'high_school', 'status']).to_pandas()
+        total_students = int(students['student_id'].nunique())
+        high_schools = students['high_school'].dropna()
+        total_high_schools = int(high_schools[high_schools != ''].nunique())
+        if total_students > 0:
+            avg_retention_rate = students.loc[students['status'] == 'Active', 'student_id'].nunique() / total_students * 100
+            avg_graduation_rate = students.loc[students['status'] == 'Graduated', 'student_id'].nunique() / total_students * 100
+        else:
+            avg_retention_rate = avg_graduation_rate = 0.0
+
+        completed_grades = self.read('fact_grade', columns=['grade'], filter=exam_status == 'Completed')['grade']
+        avg_grade = pc.mean(completed_grades).as_py() or 0.0
+
+        absence = pc.field('absence_reason')
+        tuition_mex_filter = (exam_status == 'MEX') & (
+            pc.match_substring(absence, 'Tuition', ignore_case=True) |
+            pc.match_substring(absence, 'Financial', ignore_case=True)
+        )
+
+        status = pc.field('status')
+        total_payments = pc.sum(self.read('fact_payment', columns=['amount'], filter=status == 'Completed')['amount']).as_py() or 0.0
+        outstanding_payments = pc.sum(self.read('fact_payment', columns=['amount'], filter=status == 'Pending')['amount']).as_py() or 0.0
+        avg_attendance = pc.mean(self.read('fact_attendance', columns=['total_hours'])['total_hours']).as_py() or 0.0
+
+        mex_count = self.count('fact_grade', filter=exam_status == 'MEX')
+        fex_count = self.count('fact_grade', filter=exam_status == 'FEX')
+        return {
+            'total_students': total_students,
+            'total_courses': self.count('dim_course'),
+            'total_enrollments': self.count('fact_enrollment'),
+            'avg_grade': round(float(avg_grade), 2),
+            'total_payments': round(float(total_payments), 2),
+            'outstanding_payments': round(float(outstanding_payments), 2),
+            'avg_attendance': round(float(avg_attendance), 2),
+            'missed_exams': mex_count,
+            'failed_exams': fex_count,
+            'tuition_related_missed': self.count('fact_grade', filter=tuition_mex_filter),
+            'total_high_schools': total_high_schools,
+            'high_schools_count': total_high_schools,
+            'avg_retention_rate': round(float(avg_retention_rate), 2),
+            'retention_rate': round(float(avg_retention_rate), 2),
+            'avg_graduation_rate': round(float(avg_graduation_rate), 2),
+            'graduation_rate': round(float(avg_graduation_rate), 2)
+        }
+
+    def _by_quarter(self, name):
+        df = self.read(name).to_pandas()
+        df = df.rename(columns={'calendar_year': 'year'}).sort_values(['year', 'quarter']).reset_index(drop=True)
+        df['period'] = 'Q' + df['quarter'].astype(str) + ' ' + df['year'].astype(str)
+        return df
+
+    def grades_over_time(self):
+        """Same columns as the grades-over-time SQL query"""
+        df = self._by_quarter('agg_grades_by_quarter')
+        return df[df['completed_exams'] > 0].reset_index(drop=True)
+
+    def attendance_trends(self):
+        """Same columns as the attendance-trends SQL query"""
+        df = self._by_quarter('agg_attendance_by_quarter')
+        return df[df['total_students'] > 0].reset_index(drop=True)
+
+    def payment_trends(self):
+        """Same columns as the payment-trends SQL query"""
+        return self._by_quarter('agg_payments_by_quarter')
+
+    def payment_status(self, semester_id=None):
+        """Payment count per status, optionally for one semester"""
+        filter = pc.field('semester_id') == int(semester_id) if semester_id else None
+        df = self.read('agg_payment_status', columns=['status', 'count'], filter=filter).to_pandas()
+        return df.groupby('status', as_index=False)['count'].sum()
+
+    def grade_distribution(self, semester_id=None):
+        """Letter grade counts, optionally for one semester"""
+        filter = pc.field('semester_id') == int(semester_id) if semester_id else None
+        df = self.read('agg_grade_distribution', columns=['letter_grade', 'count'], filter=filter).to_pandas()
+        df = df.groupby('letter_grade', as_index=False)['count'].sum()
+        order = df['letter_grade'].map(LETTER_GRADE_ORDER).fillna(9)
+        return df.assign(_order=order).sort_values('_order').drop(columns='_order').reset_index(drop=True)
+
+    def attendance_by_course(self, limit=10):
+        """Top courses by average attended hours"""
+        df = self.read('agg_attendance_by_course').to_pandas()
+        df = df.groupby('course_name', as_index=False)[['hours_sum', 'hours_count', 'total_days']].sum()
+        df['avg_hours'] = df['hours_sum'] / df['hours_count']
+        return df.sort_values('avg_hours', ascending=False).head(limit)[['course_name', 'avg_hours', 'total_days']]
+
+
+_gold_engine = None
+_gold_engine_lock = threading.Lock()
+
+
+def get_gold_engine():
+    """Return the shared gold query engine, or None when serving from gold is disabled or unpublished"""
+    global _gold_engine
+    if not GOLD_SERVING_ENABLED or not (GOLD_PATH / MANIFEST_FILE).exists():
+        return None
+    with _gold_engine_lock:
+        if _gold_engine is None:
+            _gold_engine = GoldQueryEngine()
+        return _gold_engine
@@ -0,0 +1,214 @@
+"""
+Index Advisor for the Data Warehouse
+Replays the captured API query workload (query_workload.py) with EXPLAIN, flags
+full scans, filesorts and temporary tables, and proposes composite/covering
+indexes from each query's equality filters, join keys, GROUP BY columns and
+referenced columns. Proposals already covered by an existing index or by the
+versioned WORKLOAD_INDEXES set in warehouse_schema.py are reported as such.
+
+Usage:
+    python index_advisor.py                 # report
+    python index_advisor.py --json out.json # also write the proposals
+    python index_advisor.py --apply         # add missing WORKLOAD_INDEXES to the live tables
+"""
+import argparse
+import json
+import re
+from collections import defaultdict
+
+import pymysql
+from config import DATA_WAREHOUSE_NAME, QUERY_WORKLOAD_PATH, get_pymysql_params
+from query_workload import load_workload
+from warehouse_schema import FACT_SCHEMAS, WORKLOAD_INDEXES, WORKLOAD_INDEX_VERSION, table_indexes
+
+MAX_INDEX_COLUMNS = 4
+# Plans scanning fewer rows than this are not worth an index
+MIN_SCANNED_ROWS = 1000
+
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|LEFT\b|RIGHT\b|INNER\b|JOIN\b|GROUP\b|ORDER\b|LIMIT\b)(\w+))?',
+                        re.IGNORECASE)
+_COLUMN_REF = re.compile(r'\b(\w+)\.(\w+)\b')
+_EQUALITY = re.compile(r'\b(?:(\w+)\.)?(\w+)\s*(?:=|IN\s*\()\s*(?=[\'"%:?\d(])', re.IGNORECASE)
+_JOIN_EQUALITY = re.compile(r'\b(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)\b')
+_GROUP_BY = re.compile(r'\bGROUP\s+BY\s+(.+?)(?:\bHAVING\b|\bORDER\b|\bLIMIT\b|\)|$)', re.IGNORECASE | re.DOTALL)
+_WHERE = re.compile(r'\bWHERE\s+(.+?)(?:\bGROUP\b|\bORDER\b|\bLIMIT\b|$)', re.IGNORECASE | re.DOTALL)
+
+
+def _table_columns():
+    return {table: [c for c, _ in schema['columns']] for table, schema in FACT_SCHEMAS.items()}
+
+
+def _aliases(sql):
+    """Map aliases (and bare table names) to the fact tables they refer to"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        if table in FACT_SCHEMAS:
+            aliases[table] = table
+            if alias:
+                aliases[alias] = table
+    return aliases
+
+
+def propose_indexes(sql):
+    """Heuristic candidate index per fact table: equality filters, join keys, GROUP BY, then covered columns"""
+    aliases = _aliases(sql)
+    if not aliases:
+        return {}
+    columns = _table_columns()
+    single_table = next(iter(set(aliases.values()))) if len(set(aliases.values())) == 1 else None
+
+    def resolve(alias, column):
+        table = aliases.get(alias) if alias else single_table
+        return table if table and column in columns[table] else None
+
+    parts = defaultdict(lambda: {'equality': [], 'join': [], 'group': [], 'covered': []})
+    where = _WHERE.search(sql)
+    for alias, column in _EQUALITY.findall(where.group(1) if where else ''):
+        table = resolve(alias, column)
+        if table:
+            parts[table]['equality'].append(column)
+    for left_alias, left_col, right_alias, right_col in _JOIN_EQUALITY.findall(sql):
+        for alias, column in ((left_alias, left_col), (right_alias, right_col)):
+            table = resolve(alias, column)
+            if table:
+                parts[table]['join'].append(column)
+    group_by = _GROUP_BY.search(sql)
+    if group_by:
+        for expr in group_by.group(1).split(','):
+            match = re.match(r'\s*(?:(\w+)\.)?(\w+)\s*$', expr)
+            if match and resolve(*match.groups()):
+                parts[resolve(*match.groups())]['group'].append(match.group(2))
+    for alias, column in _COLUMN_REF.findall(sql):
+        table = resolve(alias, column)
+        if table:
+            parts[table]['covered'].append(column)
+    if single_table:
+        for column in columns[single_table]:
+            if re.search(rf'\b{column}\b', sql):
+                parts[single_table]['covered'].append(column)
+
+    proposals = {}
+    for table, p in parts.items():
+        ordered = []
+        for column in p['equality'] + p['join'] + p['group'] + p['covered']:
+            if column not in ordered and column not in FACT_SCHEMAS[table]['primary_key']:
+                ordered.append(column)
+        # Without a filter, join or grouping column the index can only serve as a covering scan
+        if ordered and (p['equality'] or p['join'] or p['group']):
+            proposals[table] = ordered[:MAX_INDEX_COLUMNS]
+    return proposals
+
+
+def _covered_by(columns, indexes):
+    """Name of an index whose leading columns already start with the proposed columns"""
+    for name, index_columns in indexes.items():
+        if index_columns[:len(columns)] == columns:
+            return name
+    return None
+
+
+def _live_indexes(cursor, table):
+    cursor.execute(f"SHOW INDEX FROM {table}")
+    indexes = defaultdict(list)
+    for row in sorted(cursor.fetchall(), key=lambda r: (r['Key_name'], r['Seq_in_index'])):
+        indexes[row['Key_name']].append(row['Column_name'])
+    return dict(indexes)
+
+
+def explain(cursor, entry):
+    """EXPLAIN the sample statement of a workload entry and summarise problems per table"""
+    params = entry.get('parameters') or None
+    if isinstance(params, list):
+        params = tuple(params)
+    cursor.execute("EXPLAIN " + entry['sample'], params)
+    problems = defaultdict(list)
+    for row in cursor.fetchall():
+        table = row.get('table') or ''
+        extra = row.get('Extra') or ''
+        rows = row.get('rows') or 0
+        if row.get('type') == 'ALL' and rows >= MIN_SCANNED_ROWS:
+            problems[table].append(f"full scan (~{rows} rows)")
+        if 'Using filesort' in extra:
+            problems[table].append('filesort')
+        if 'Using temporary' in extra:
+            problems[table].append('temporary table')
+    return dict(problems)
+
+
+def advise(workload_path=QUERY_WORKLOAD_PATH):
+    """Proposals for every captured query, annotated with EXPLAIN findings and existing coverage"""
+    workload = load_workload(workload_path)
+    connection = pymysql.connect(**get_pymysql_params(DATA_WAREHOUSE_NAME), cursorclass=pymysql.cursors.DictCursor)
+    report = []
+    try:
+        with connection.cursor() as cursor:
+            live = {table: _live_indexes(cursor, table) for table in FACT_SCHEMAS}
+            for entry in workload:
+                try:
+                    problems = explain(cursor, entry)
+                except pymysql.MySQLError as e:
+                    problems = {'': [f"EXPLAIN failed: {e}"]}
+                # Problems are reported against the alias used in the query
+                aliases = _aliases(entry['sample'])
+                flagged = {aliases.get(name, name) for name in problems}
+                for table, columns in propose_indexes(entry['sample']).items():
+                    if table not in flagged:
+                        continue
+                    report.append({
+                        'query': entry['normalized'],
+                        'calls': entry['count'],
+                        'avg_ms': round(entry['total_ms'] / max(entry['count'], 1), 2),
+                        'table': table,
+                        'problems': [p for name, found in problems.items()
+                                     if aliases.get(name, name) == table for p in found],
+                        'proposed_columns': columns,
+                        'covered_by_live_index': _covered_by(columns, live[table]),
+                        'covered_by_workload_set': _covered_by(columns, table_indexes(table)),
+                    })
+    finally:
+        connection.close()
+    report.sort(key=lambda r: r['calls'] * r['avg_ms'], reverse=True)
+    return report
+
+
+def apply_workload_indexes():
+    """Add the WORKLOAD_INDEXES missing from the live fact tables (the ETL applies them on every load)"""
+    connection = pymysql.connect(**get_pymysql_params(DATA_WAREHOUSE_NAME), cursorclass=pymysql.cursors.DictCursor)
+    try:
+        with connection.cursor() as cursor:
+            for table, indexes in WORKLOAD_INDEXES.items():
+                live = _live_indexes(cursor, table)
+                missing = {name: cols for name, cols in indexes.items() if name not in live}
+                if missing:
+                    clauses = [f"ADD INDEX {name} ({', '.join(cols)})" for name, cols in missing.items()]
+                    cursor.execute(f"ALTER TABLE {table} " + ', '.join(clauses))
+                    print(f"  {table}: added {', '.join(missing)}")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose warehouse indexes from the captured API workload")
+    parser.add_argument('--workload', default=str(QUERY_WORKLOAD_PATH), help="Captured workload JSON")
+    parser.add_argument('--json', metavar='PATH', help="Write the proposals as JSON")
+    parser.add_argument('--apply', action='store_true',
+                        help=f"Add missing workload index set v{WORKLOAD_INDEX_VERSION} to the live tables")
+    args = parser.parse_args()
+
+    if args.apply:
+        print(f"Applying workload index set v{WORKLOAD_INDEX_VERSION}...")
+        apply_workload_indexes()
+
+    report = advise(args.workload)
+    print(f"\n{len(report)} index proposals (workload index set v{WORKLOAD_INDEX_VERSION})\n")
+    for item in report:
+        status = ('covered by ' + item['covered_by_live_index']) if item['covered_by_live_index'] else (
+            'in workload set as ' + item['covered_by_workload_set'] if item['covered_by_workload_set'] else 'NEW')
+        print(f"[{status}] {item['table']} ({', '.join(item['proposed_columns'])})")
+        print(f"    {item['calls']} calls, {item['avg_ms']} ms avg, {', '.join(item['problems'])}")
+        print(f"    {item['query'][:160]}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nProposals written to {args.json}")
@@ -0,0 +1,347 @@
+"""
+Background Jobs
+Runs PDF reports, Excel exports and batch predictions in a local process pool
+instead of the request thread, so slow jobs no longer hold the Flask workers
+that serve the dashboard. Job state (status, progress, result, artifact) is a
+row in a sqlite table at JOBS_DB_PATH that the worker updates itself; no
+external broker is needed. Finished jobs and their artifacts are removed after
+JOB_RESULT_TTL_HOURS.
+
+Submitting (each returns 202 with the job):
+    POST /api/report/generate?async=true
+    GET|POST /api/export/excel?async=true
+    POST /api/predictions/batch-predict  {"async": true, ...}
+Polling and download (api/jobs.py):
+    GET /api/jobs/<job_id>, GET /api/jobs/<job_id>/download
+"""
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import JOBS_DB_PATH, JOBS_ARTIFACT_PATH, JOB_WORKERS, JOB_RESULT_TTL_HOURS
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Minimum seconds between two progress writes from a worker
+PROGRESS_INTERVAL = 1.0
+
+_JOB_COLUMNS = [
+    ('job_id', 'TEXT PRIMARY KEY'),
+    ('job_type', 'TEXT NOT NULL'),
+    ('owner', 'TEXT'),
+    # API process that submitted the job; its pool is the only one that can still run it
+    ('server_host', 'TEXT'),
+    ('server_pid', 'INTEGER'),
+    ('status', 'TEXT NOT NULL'),
+    ('progress', 'REAL NOT NULL DEFAULT 0'),
+    ('message', 'TEXT'),
+    ('result', 'TEXT'),
+    ('error', 'TEXT'),
+    ('artifact_path', 'TEXT'),
+    ('download_name', 'TEXT'),
+    ('mimetype', 'TEXT'),
+    ('created_at', 'TEXT NOT NULL'),
+    ('started_at', 'TEXT'),
+    ('finished_at', 'TEXT'),
+]
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _pid_alive(pid):
+    """Whether a process with this id is running on this host"""
+    if os.name == 'nt':
+        import ctypes
+        # PROCESS_QUERY_LIMITED_INFORMATION; os.kill would terminate the process on Windows
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """The job table; shared by the API process and the pool workers"""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            columns = ', '.join(f"{name} {ddl}" for name, ddl in _JOB_COLUMNS)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS jobs ({columns})")
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, ddl in _JOB_COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {ddl}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, job_type, owner):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (job_id, job_type, owner, server_host, server_pid, status, created_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, job_type, owner, socket.gethostname(), os.getpid(), QUEUED, _now()))
+        return job_id
+
+    def update(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, owner=None, limit=50):
+        with self._connect() as conn:
+            if owner is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+            else:
+                rows = conn.execute("SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?",
+                                    (owner, limit))
+            return [dict(row) for row in rows.fetchall()]
+
+    def fail_orphaned(self, reason):
+        """Mark jobs as failed that are queued/running for a server process of this host that has
+        exited; jobs of live workers (and of other hosts sharing the file) are left alone"""
+        host, pid = socket.gethostname(), os.getpid()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT job_id, server_pid FROM jobs WHERE status IN (?, ?) "
+                                "AND (server_host = ? OR server_host IS NULL)",
+                                (QUEUED, RUNNING, host)).fetchall()
+            orphaned = [row['job_id'] for row in rows
+                        if row['server_pid'] is None
+                        or (row['server_pid'] != pid and not _pid_alive(row['server_pid']))]
+            conn.executemany("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                             [(FAILED, reason, _now(), job_id) for job_id in orphaned])
+        return len(orphaned)
+
+    def purge(self, older_than):
+        """Delete jobs finished before older_than together with their artifacts"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT job_id, artifact_path FROM jobs WHERE finished_at < ?",
+                                (older_than,)).fetchall()
+            for row in rows:
+                if row['artifact_path']:
+                    Path(row['artifact_path']).unlink(missing_ok=True)
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(row['job_id'],) for row in rows])
+        return len(rows)
+
+
+class JobContext:
+    """Handed to a job handler inside the worker: progress reporting and the artifact location"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self._last_progress = 0.0
+
+    def progress(self, fraction, message=None):
+        now = time.monotonic()
+        if fraction < 1 and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        fields = {'progress': round(min(max(fraction, 0.0), 1.0), 3)}
+        if message is not None:
+            fields['message'] = message
+        self.store.update(self.job_id, **fields)
+
+    def artifact_path(self, suffix):
+        JOBS_ARTIFACT_PATH.mkdir(parents=True, exist_ok=True)
+        return JOBS_ARTIFACT_PATH / f"{self.job_id}{suffix}"
+
+
+# Job handlers run in the pool workers: handler(ctx, payload) returns any of
+# result (JSON-serializable summary), artifact_path, download_name and mimetype
+
+def _report_job(ctx, payload):
+    from pdf_generator import PDFReportGenerator
+    ctx.progress(0.1, 'Collecting dashboard data')
+    generator = PDFReportGenerator(api_base_url=payload['api_base_url'], token=payload['token'])
+    path = generator.generate_report(output_path=ctx.artifact_path('.pdf'))
+    return {
+        'artifact_path': path,
+        'download_name': f'nextgen_report_{datetime.now().strftime("%Y%m%d")}.pdf',
+        'mimetype': 'application/pdf',
+    }
+
+
+def _excel_export_job(ctx, payload):
+    from api.export import build_excel_export, XLSX_MIMETYPE
+    ctx.progress(0.1, 'Querying the warehouse')
+    output, download_name = build_excel_export(payload['export_type'])
+    path = ctx.artifact_path('.xlsx')
+    path.write_bytes(output.getvalue())
+    return {'artifact_path': path, 'download_name': download_name, 'mimetype': XLSX_MIMETYPE}
+
+
+def _batch_predict_job(ctx, payload):
+    from api.predictions import scoped_student_ids, batch_prediction_results
+    ctx.progress(0.0, 'Checking access')
+    student_ids = scoped_student_ids(payload['user_scope'], payload['student_ids'])
+    predictions = batch_prediction_results(
+        student_ids, payload['model_type'],
+        progress=lambda done, total: ctx.progress(done / total, f"{done}/{total} students"))
+    path = ctx.artifact_path('.json')
+    path.write_text(json.dumps(predictions), encoding='utf-8')
+    summary = {k: v for k, v in predictions.items() if k != 'results'}
+    return {
+        'result': summary,
+        'artifact_path': path,
+        'download_name': f'batch_predictions_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
+        'mimetype': 'application/json',
+    }
+
+
+JOB_HANDLERS = {
+    'report': _report_job,
+    'excel_export': _excel_export_job,
+    'batch_predict': _batch_predict_job,
+}
+
+
+def _run_job(job_id, job_type, payload, db_path):
+    """Worker entry point; the job row is the only channel back to the API process"""
+    store = JobStore(db_path)
+    store.update(job_id, status=RUNNING, started_at=_now(), message='Started')
+    try:
+        outcome = JOB_HANDLERS[job_type](JobContext(store, job_id), payload) or {}
+    except Exception as e:
+        print(f"Job {job_id} ({job_type}) failed: {e}")
+        print(traceback.format_exc())
+        store.update(job_id, status=FAILED, error=str(e), finished_at=_now())
+        return
+    store.update(job_id, status=SUCCEEDED, progress=1.0, message='Done', finished_at=_now(),
+                 result=json.dumps(outcome['result']) if 'result' in outcome else None,
+                 artifact_path=str(outcome['artifact_path']) if outcome.get('artifact_path') else None,
+                 download_name=outcome.get('download_name'),
+                 mimetype=outcome.get('mimetype'))
+
+
+class JobQueue:
+    """Submits jobs to a lazily started process pool owned by this API process"""
+
+    def __init__(self, workers=JOB_WORKERS, store=None):
+        self.workers = workers
+        self._store = store
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        # Created on first use, so importing this module does not create the database
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+    
+    def _pool(self):
+        if self._executor is None:
+            # Jobs whose server process exited (restart, crash) never finish
+            self.store.fail_orphaned('Interrupted by a server restart')
+            # spawn: forking a threaded Flask server can copy held locks into the workers
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def submit(self, job_type, owner, payload):
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job type: {job_type}")
+        self.cleanup()
+        with self._lock:
+            pool = self._pool()
+            job_id = self.store.create(job_type, owner)
+            try:
+                future = pool.submit(_run_job, job_id, job_type, payload, self.store.path)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool
+                self._executor = None
+                future = self._pool().submit(_run_job, job_id, job_type, payload, self.store.path)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return self.status(job_id)
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            self.store.update(job_id, status=CANCELLED, finished_at=_now())
+        elif future.exception() is not None:
+            # The worker process itself went away; _run_job could not record the outcome
+            job = self.store.get(job_id)
+            if job and job['status'] not in FINISHED_STATUSES:
+                self.store.update(job_id, status=FAILED, error=str(future.exception()), finished_at=_now())
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet; running jobs finish normally"""
+        with self._lock:
+            future = self._futures.get(job_id)
+        return bool(future and future.cancel())
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def status(self, job_id):
+        job = self.store.get(job_id)
+        return public_job(job) if job else None
+
+    def cleanup(self, ttl_hours=JOB_RESULT_TTL_HOURS):
+        cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat(timespec='seconds')
+        return self.store.purge(cutoff)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def public_job(job):
+    """The job as returned by the API (no owner or server-side paths)"""
+    return {
+        'job_id': job['job_id'],
+        'type': job['job_type'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'error': job['error'],
+        'result': json.loads(job['result']) if job['result'] else None,
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'status_url': f"/api/jobs/{job['job_id']}",
+        'download_url': f"/api/jobs/{job['job_id']}/download" if job['artifact_path'] else None,
+    }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,173 @@
+"""
+Data Lake Manager for the Bronze and Silver layers
+Keeps the latest N snapshots per layer, compacts older snapshots into one
+deduplicated, zstd-compressed dataset per table, and maintains a "latest
+snapshot" pointer so transform or a replay can start from bronze without
+re-extracting from the source databases.
+"""
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from config import BRONZE_PATH, SILVER_PATH, LAKE_KEEP_SNAPSHOTS
+
+# e.g. bronze_students_db1_20251118_202133.parquet, silver_grades_20251118_202140.parquet
+SNAPSHOT_FILE_PATTERN = re.compile(r'^(?P<layer>bronze|silver)_(?P<table>.+)_(?P<snapshot>\d{8}_\d{6})\.parquet$')
+LATEST_POINTER = '_LATEST.json'
+COMPACTED_DIR = '_compacted'
+FIRST_SNAPSHOT_COL = '_first_snapshot'
+
+
+def _arrow_safe(df):
+    """Convert mixed-type object columns (e.g. '' sentinels next to numbers) to strings so parquet accepts them"""
+    for col in df.columns:
+        if df[col].dtype == object:
+            types = df[col].dropna().map(type).unique()
+            if len(types) > 1:
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+class LakeManager:
+    """Snapshot bookkeeping, retention and compaction for the bronze/silver layers"""
+
+    def __init__(self, bronze_path=BRONZE_PATH, silver_path=SILVER_PATH, keep_snapshots=LAKE_KEEP_SNAPSHOTS):
+        self.paths = {'bronze': Path(bronze_path), 'silver': Path(silver_path)}
+        self.keep_snapshots = max(1, keep_snapshots)
+
+    def layer_path(self, layer):
+        if layer not in self.paths:
+            raise ValueError(f"Unknown layer: {layer}")
+        return self.paths[layer]
+
+    # ---------- snapshots ----------
+
+    def list_snapshots(self, layer):
+        """Return {snapshot_id: {table: path}} for the snapshot files of a layer, oldest first"""
+        snapshots = {}
+        for path in self.layer_path(layer).glob(f"{layer}_*.parquet"):
+            match = SNAPSHOT_FILE_PATTERN.match(path.name)
+            if match:
+                snapshots.setdefault(match.group('snapshot'), {})[match.group('table')] = path
+        return dict(sorted(snapshots.items()))
+
+    def set_latest(self, layer, snapshot_id, **metadata):
+        """Point the layer's latest-snapshot pointer at snapshot_id"""
+        tables = self.list_snapshots(layer).get(snapshot_id)
+        if not tables:
+            raise FileNotFoundError(f"No {layer} files found for snapshot {snapshot_id}")
+        pointer = {
+            'snapshot_id': snapshot_id,
+            'tables': {table: path.name for table, path in sorted(tables.items())},
+            'updated_at': datetime.now().isoformat(),
+            **metadata
+        }
+        pointer_file = self.layer_path(layer) / LATEST_POINTER
+        tmp_file = pointer_file.with_suffix('.tmp')
+        tmp_file.write_text(json.dumps(pointer, indent=2), encoding='utf-8')
+        os.replace(tmp_file, pointer_file)
+        return pointer
+
+    def get_latest(self, layer):
+        """Return the latest-snapshot pointer, rebuilding it from the files if it is missing or stale"""
+        pointer_file = self.layer_path(layer) / LATEST_POINTER
+        snapshots = self.list_snapshots(layer)
+        if pointer_file.exists():
+            pointer = json.loads(pointer_file.read_text(encoding='utf-8'))
+            if pointer.get('snapshot_id') in snapshots:
+                return pointer
+        if not snapshots:
+            return None
+        return self.set_latest(layer, list(snapshots)[-1])
+
+    def resolve_snapshot(self, layer, snapshot_id='latest'):
+        """Translate 'latest' (or None) into a concrete snapshot id"""
+        if snapshot_id in (None, 'latest'):
+            pointer = self.get_latest(layer)
+            if pointer is None:
+                raise FileNotFoundError(f"No {layer} snapshots found in {self.layer_path(layer)}")
+            return pointer['snapshot_id']
+        if snapshot_id not in self.list_snapshots(layer):
+            raise FileNotFoundError(f"{layer} snapshot {snapshot_id} not found (it may have been compacted)")
+        return snapshot_id
+
+    def load_snapshot(self, layer, snapshot_id='latest'):
+        """Load every table of a snapshot into DataFrames keyed by table name"""
+        snapshot_id = self.resolve_snapshot(layer, snapshot_id)
+        tables = self.list_snapshots(layer)[snapshot_id]
+        return snapshot_id, {table: pd.read_parquet(path) for table, path in tables.items()}
+
+    # ---------- retention / compaction ----------
+
+    def compact(self, layer):
+        """Fold snapshots older than the newest keep_snapshots into one deduplicated dataset per table"""
+        snapshots = self.list_snapshots(layer)
+        old_snapshots = list(snapshots)[:-self.keep_snapshots]
+        if not old_snapshots:
+            return {}
+
+        by_table = {}
+        for snapshot_id in old_snapshots:
+            for table, path in snapshots[snapshot_id].items():
+                by_table.setdefault(table, []).append((snapshot_id, path))
+
+        compacted_dir = self.layer_path(layer) / COMPACTED_DIR
+        compacted_dir.mkdir(parents=True, exist_ok=True)
+        summary = {}
+        for table, files in by_table.items():
+            target = compacted_dir / f"{layer}_{table}.parquet"
+            frames = []
+            if target.exists():
+                frames.append(pd.read_parquet(target))
+            for snapshot_id, path in files:
+                df = pd.read_parquet(path)
+                df[FIRST_SNAPSHOT_COL] = snapshot_id
+                frames.append(df)
+
+            combined = pd.concat(frames, ignore_index=True, sort=False)
+            data_cols = [c for c in combined.columns if c != FIRST_SNAPSHOT_COL]
+            before = len(combined)
+            # Keep the earliest snapshot in which each distinct row appeared
+            combined = combined.sort_values(FIRST_SNAPSHOT_COL, kind='stable')
+            combined = combined.drop_duplicates(subset=data_cols, keep='first').reset_index(drop=True)
+
+            tmp_target = target.with_suffix('.tmp')
+            pq.write_table(
+                pa.Table.from_pandas(_arrow_safe(combined), preserve_index=False),
+                tmp_target, compression='zstd'
+            )
+            os.replace(tmp_target, target)
+            for _, path in files:
+                path.unlink()
+            summary[table] = {'rows_in': before, 'rows_out': len(combined), 'snapshots': len(files)}
+        return summary
+
+    def apply_retention(self):
+        """Compact both layers and refresh their latest pointers"""
+        summary = {}
+        for layer in self.paths:
+            summary[layer] = self.compact(layer)
+            self.get_latest(layer)
+        return summary
+
+    def load_compacted(self, layer, table):
+        """Load the compacted history of one table (all distinct rows from retired snapshots)"""
+        path = self.layer_path(layer) / COMPACTED_DIR / f"{layer}_{table}.parquet"
+        return pd.read_parquet(path) if path.exists() else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    manager = LakeManager()
+    for layer in manager.paths:
+        snapshots = manager.list_snapshots(layer)
+        latest = manager.get_latest(layer)
+        print(f"{layer}: {len(snapshots)} snapshots, latest = {latest['snapshot_id'] if latest else None}")
+    print("\nApplying retention...")
+    for layer, tables in manager.apply_retention().items():
+        for table, stats in tables.items():
+            print(f"  {layer}/{table}: {stats['snapshots']} snapshots, {stats['rows_in']} → {stats['rows_out']} rows")
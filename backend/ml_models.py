@@ -4,15 +4,60 @@ Includes: Random Forest, Gradient Boosting, and Neural Network
 """
 import pandas as pd
 import numpy as np
+import os
+import json
+import time
 import pickle
+from datetime import datetime
 from pathlib import Path
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.neural_network import MLPRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
 from sqlalchemy import create_engine, text
-from config import DATA_WAREHOUSE_CONN_STRING
+from config import (DATA_WAREHOUSE_CONN_STRING, RETRAIN_DRIFT_THRESHOLD, RETRAIN_FULL_DRIFT_THRESHOLD,
+                    RETRAIN_WARM_START_TREES, RETRAIN_MAX_BOOSTING_STAGES, RETRAIN_MLP_EPOCHS, TUNE_ON_RETRAIN)
+from model_registry import model_registry
+from model_tuning import tune_models, best_params
+from feature_encoder import CompiledFeatureEncoder
+from tree_compiler import compile_models, predict_with
+
+MODEL_SET = 'standard'
+MODEL_NAMES = ('random_forest', 'gradient_boosting', 'neural_network')
+# Monolithic pickle written before the model registry; still loaded when nothing is registered
+LEGACY_MODEL_FILE = 'multi_model_predictor.pkl'
+TRAINING_SNAPSHOT_FILE = 'training_snapshot.pkl'
+TRAINING_RUNS_FILE = 'training_runs.jsonl'
+
+
+def cpu_seconds():
+    """CPU time of this process and its finished child processes (joblib workers)"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def feature_fingerprints(features_df):
+    """One hash per student_id over all of a prepare_features() row, target included;
+    a student whose hash differs from the training snapshot has changed inputs"""
+    frame = features_df.drop(columns=['student_key'], errors='ignore').set_index('student_id')
+    frame = frame[sorted(frame.columns)]
+    return pd.Series(pd.util.hash_pandas_object(frame, index=False).values, index=frame.index)
+
+
+def record_training_run(model_path, run, started, cpu_started):
+    """Append one training run with its wall-clock and CPU cost to models/training_runs.jsonl"""
+    run = {
+        'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        **run,
+        'wall_seconds': round(time.time() - started, 3),
+        'cpu_seconds': round(cpu_seconds() - cpu_started, 3),
+    }
+    with open(Path(model_path) / TRAINING_RUNS_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, default=float) + '\n')
+    print(f"Training run ({run['mode']}): {run['wall_seconds']:.1f}s wall, {run['cpu_seconds']:.1f}s CPU")
+    return run
+
 
 class MultiModelPredictor:
     """Multiple ML models for student performance prediction"""
@@ -28,6 +73,9 @@ class MultiModelPredictor:
         self.model_path.mkdir(parents=True, exist_ok=True)
         self.feature_cols = None
         self.label_encoders = {}  # Store label encoders for categorical variables
+        self.compiled_models = {}  # Array-backed copies of the tree ensembles (tree_compiler.py)
+        self.model_version = None  # Registry version the models were loaded from (model_registry.py)
+        self.feature_encoder = None  # Lookup-table encoder of single SQL rows (feature_encoder.py)
     
     def prepare_features(self):
         """Prepare features from data warehouse with enhanced features including high school"""
@@ -36,6 +84,7 @@ class MultiModelPredictor:
         # Get student demographic data with high school
         student_query = """
         SELECT 
+            ds.student_key,
             ds.student_id,
             ds.gender,
             ds.nationality,
@@ -52,10 +101,10 @@ class MultiModelPredictor:
         # Get attendance data
         attendance_query = """
         SELECT 
-            fa.student_id,
+            fa.student_key,
             SUM(fa.total_hours) as total_attendance_hours,
             SUM(fa.days_present) as total_days_present,
-            COUNT(DISTINCT fa.course_code) as courses_attended,
+            COUNT(DISTINCT fa.course_key) as courses_attended,
             AVG(fa.total_hours) as avg_hours_per_course,
             COUNT(*) as total_attendance_records,
             CASE 
@@ -64,14 +113,14 @@ class MultiModelPredictor:
                 ELSE 0 
             END as attendance_rate
         FROM fact_attendance fa
-        GROUP BY fa.student_id
+        GROUP BY fa.student_key
         """
         attendance_df = pd.read_sql_query(attendance_query, engine)
         
         # Get payment data with tuition completion metrics
         payment_query = """
         SELECT 
-            fp.student_id,
+            fp.student_key,
             SUM(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) as total_paid,
             SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END) as total_pending,
             SUM(fp.amount) as total_required,
@@ -88,25 +137,25 @@ class MultiModelPredictor:
                 THEN 1 ELSE 0 
             END as has_significant_balance
         FROM fact_payment fp
-        GROUP BY fp.student_id
+        GROUP BY fp.student_key
         """
         payment_df = pd.read_sql_query(payment_query, engine)
         
         # Get enrollment data
         enrollment_query = """
         SELECT 
-            fe.student_id,
-            COUNT(DISTINCT fe.course_code) as total_enrollments,
+            fe.student_key,
+            COUNT(DISTINCT fe.course_key) as total_enrollments,
             COUNT(DISTINCT fe.semester_id) as semesters_enrolled
         FROM fact_enrollment fe
-        GROUP BY fe.student_id
+        GROUP BY fe.student_key
         """
         enrollment_df = pd.read_sql_query(enrollment_query, engine)
         
         # Get grade data (target variable) with high school performance metrics
         grade_query = """
         SELECT 
-            fg.student_id,
+            fg.student_key,
             AVG(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as avg_grade,
             MIN(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as min_grade,
             MAX(CASE WHEN fg.exam_status = 'Completed' THEN fg.grade ELSE NULL END) as max_grade,
@@ -127,7 +176,7 @@ class MultiModelPredictor:
             AVG(fg.coursework_score) as avg_coursework_score,
             AVG(fg.exam_score) as avg_exam_score
         FROM fact_grade fg
-        GROUP BY fg.student_id
+        GROUP BY fg.student_key
         """
         grade_df = pd.read_sql_query(grade_query, engine)
         
@@ -140,8 +189,8 @@ class MultiModelPredictor:
             AVG(CASE WHEN fp.status = 'Completed' THEN fp.amount ELSE 0 END) as school_avg_payment,
             SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END) / NULLIF(SUM(fp.amount), 0) * 100 as school_pending_rate
         FROM dim_student ds
-        LEFT JOIN fact_grade fg ON ds.student_id = fg.student_id
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
+        LEFT JOIN fact_grade fg ON ds.student_key = fg.student_key
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
         WHERE ds.high_school IS NOT NULL
         GROUP BY ds.high_school
         """
@@ -149,10 +198,10 @@ class MultiModelPredictor:
         
         # Merge all data
         features_df = student_df.copy()
-        features_df = features_df.merge(attendance_df, on='student_id', how='left')
-        features_df = features_df.merge(payment_df, on='student_id', how='left')
-        features_df = features_df.merge(enrollment_df, on='student_id', how='left')
-        features_df = features_df.merge(grade_df, on='student_id', how='left')
+        features_df = features_df.merge(attendance_df, on='student_key', how='left')
+        features_df = features_df.merge(payment_df, on='student_key', how='left')
+        features_df = features_df.merge(enrollment_df, on='student_key', how='left')
+        features_df = features_df.merge(grade_df, on='student_key', how='left')
         
         # Merge high school performance metrics
         features_df = features_df.merge(
@@ -186,14 +235,19 @@ class MultiModelPredictor:
         engine.dispose()
         return features_df
     
-    def train_all_models(self, use_grid_search=False):
-        """Train all models"""
+    def train_all_models(self, use_grid_search=False, tune=TUNE_ON_RETRAIN):
+        """Train all models.
+        With tune (or use_grid_search) the random forest and gradient boosting hyperparameters are
+        searched first (model_tuning.py); otherwise the best ones of the last search are used."""
+        started, cpu_started = time.time(), cpu_seconds()
         print("Preparing features...")
         features_df = self.prepare_features()
+        fingerprints = feature_fingerprints(features_df)
+        raw_columns = sorted(features_df.columns)
         
         # Prepare target variable
         target = features_df['avg_grade'].fillna(0)
-        features_df = features_df.drop(['student_id', 'avg_grade'], axis=1, errors='ignore')
+        features_df = features_df.drop(['student_key', 'student_id', 'avg_grade'], axis=1, errors='ignore')
         
         # Encode categorical variables - ensure all strings are converted
         categorical_cols = ['gender', 'nationality', 'high_school', 'high_school_district']
@@ -234,19 +288,17 @@ class MultiModelPredictor:
         
         results = {}
         
+        if tune or use_grid_search:
+            tuned_params = tune_models(X_train_scaled, y_train, self.model_path)
+        else:
+            tuned_params = {name: best_params(self.model_path, name) for name in ('random_forest', 'gradient_boosting')}
+        
         # Train Random Forest
         print("\nTraining Random Forest...")
         rf = RandomForestRegressor(n_estimators=100, max_depth=15, random_state=42, n_jobs=-1)
-        if use_grid_search:
-            param_grid = {
-                'n_estimators': [50, 100, 200],
-                'max_depth': [10, 15, 20],
-                'min_samples_split': [2, 5]
-            }
-            rf = GridSearchCV(rf, param_grid, cv=5, scoring='r2', n_jobs=-1)
+        if tuned_params.get('random_forest'):
+            rf.set_params(**tuned_params['random_forest'])
         rf.fit(X_train_scaled, y_train)
-        if use_grid_search:
-            rf = rf.best_estimator_
         self.models['random_forest'] = rf
         rf_pred = rf.predict(X_test_scaled)
         results['random_forest'] = {
@@ -259,16 +311,9 @@ class MultiModelPredictor:
         # Train Gradient Boosting
         print("\nTraining Gradient Boosting...")
         gb = GradientBoostingRegressor(n_estimators=100, max_depth=5, learning_rate=0.1, random_state=42)
-        if use_grid_search:
-            param_grid = {
-                'n_estimators': [50, 100, 200],
-                'max_depth': [3, 5, 7],
-                'learning_rate': [0.05, 0.1, 0.2]
-            }
-            gb = GridSearchCV(gb, param_grid, cv=5, scoring='r2', n_jobs=-1)
+        if tuned_params.get('gradient_boosting'):
+            gb.set_params(**tuned_params['gradient_boosting'])
         gb.fit(X_train_scaled, y_train)
-        if use_grid_search:
-            gb = gb.best_estimator_
         self.models['gradient_boosting'] = gb
         gb_pred = gb.predict(X_test_scaled)
         results['gradient_boosting'] = {
@@ -291,14 +336,145 @@ class MultiModelPredictor:
         }
         print(f"Neural Network - R²: {results['neural_network']['r2']:.4f}, RMSE: {results['neural_network']['rmse']:.2f}")
         
+        self._compile()
+        
         # Save models
-        self.save_models()
+        self.save_models(metrics=results)
+        self.save_training_snapshot(fingerprints, raw_columns)
+        record_training_run(self.model_path, {'mode': 'full', 'models': 'standard', 'students': len(fingerprints),
+                                              'metrics': results},
+                            started, cpu_started)
+        
+        return results
+    
+    def train_incremental(self, drift_threshold=RETRAIN_DRIFT_THRESHOLD):
+        """Update the trained models with the students whose features changed since the
+        last training snapshot instead of training from scratch.
+        Nothing is retrained when less than drift_threshold of the students changed. Otherwise
+        the random forest replaces its oldest RETRAIN_WARM_START_TREES trees with trees grown on
+        current data, gradient boosting fits as many extra stages and the neural network runs
+        partial_fit over the changed students. Falls back to train_all_models() without a
+        snapshot, when the features changed shape, when at least RETRAIN_FULL_DRIFT_THRESHOLD
+        of the students changed or when boosting would exceed RETRAIN_MAX_BOOSTING_STAGES."""
+        started, cpu_started = time.time(), cpu_seconds()
+        snapshot = self.load_training_snapshot()
+        if snapshot is None or not self.has_saved_models():
+            print("No training snapshot, running a full training")
+            return self.train_all_models()
+        self.load_models()
+        
+        print("Preparing features...")
+        features_df = self.prepare_features()
+        fingerprints = feature_fingerprints(features_df)
+        previous = snapshot['fingerprints']
+        common = fingerprints.index.intersection(previous.index)
+        changed = fingerprints.index.difference(previous.index).union(
+            common[fingerprints[common].values != previous[common].values])
+        removed = previous.index.difference(fingerprints.index)
+        drift = (len(changed) + len(removed)) / max(len(previous), 1)
+        run = {
+            'mode': 'incremental',
+            'models': 'standard',
+            'students': len(fingerprints),
+            'changed_students': len(changed),
+            'removed_students': len(removed),
+            'drift': round(drift, 4),
+        }
+        print(f"{len(changed)} students changed, {len(removed)} removed (drift {drift:.2%})")
+        
+        if drift < drift_threshold:
+            print(f"Drift below {drift_threshold:.2%}, models kept")
+            record_training_run(self.model_path, {**run, 'mode': 'skipped'}, started, cpu_started)
+            return {}
+        gb = self.models.get('gradient_boosting')
+        if (drift >= RETRAIN_FULL_DRIFT_THRESHOLD or snapshot['columns'] != sorted(features_df.columns)
+                or (gb is not None and gb.n_estimators + RETRAIN_WARM_START_TREES > RETRAIN_MAX_BOOSTING_STAGES)):
+            print("Running a full training")
+            return self.train_all_models()
+        
+        # The scaler and label encoders stay as trained, so the existing trees and weights keep their meaning
+        target = features_df['avg_grade'].fillna(0).values
+        X = self.encode_features(features_df)
+        is_changed = features_df['student_id'].isin(changed).values
+        X_train, X_test, y_train, y_test, changed_train, _ = train_test_split(
+            X, target, is_changed, test_size=0.2, random_state=42)
+        rng = np.random.default_rng(int(started))
+        
+        rf = self.models.get('random_forest')
+        if rf is not None:
+            print(f"\nRandom Forest: replacing the {RETRAIN_WARM_START_TREES} oldest trees...")
+            kept = rf.estimators_[min(RETRAIN_WARM_START_TREES, len(rf.estimators_)):]
+            rf.estimators_ = kept
+            # A new seed, or warm start would grow the same trees as the ones just dropped
+            rf.set_params(warm_start=True, n_estimators=len(kept) + RETRAIN_WARM_START_TREES,
+                          random_state=int(rng.integers(2 ** 31)))
+            rf.fit(X_train, y_train)
+            rf.set_params(warm_start=False)
+        
+        if gb is not None:
+            print(f"Gradient Boosting: adding {RETRAIN_WARM_START_TREES} stages...")
+            gb.set_params(warm_start=True, n_estimators=gb.n_estimators + RETRAIN_WARM_START_TREES)
+            gb.fit(X_train, y_train)
+            gb.set_params(warm_start=False)
+        
+        nn = self.models.get('neural_network')
+        if nn is not None:
+            # Changed students plus as many unchanged ones, so the network does not forget the rest
+            changed_rows = np.flatnonzero(changed_train)
+            unchanged_rows = np.flatnonzero(~changed_train)
+            rows = np.concatenate([changed_rows, rng.choice(unchanged_rows, min(len(changed_rows), len(unchanged_rows)),
+                                                            replace=False)])
+            if len(rows):
+                print(f"Neural Network: {RETRAIN_MLP_EPOCHS} partial_fit epochs over {len(rows)} students...")
+                # partial_fit has no validation split; it tracks the training loss instead
+                early_stopping = nn.early_stopping
+                nn.set_params(early_stopping=False)
+                if nn.best_loss_ is None:
+                    nn.best_loss_ = min(nn.loss_curve_)
+                for _ in range(RETRAIN_MLP_EPOCHS):
+                    nn.partial_fit(X_train[rows], y_train[rows])
+                nn.set_params(early_stopping=early_stopping)
         
+        results = {}
+        for model_name, model in self.models.items():
+            if model is None:
+                continue
+            pred = model.predict(X_test)
+            results[model_name] = {
+                'r2': r2_score(y_test, pred),
+                'rmse': np.sqrt(mean_squared_error(y_test, pred)),
+                'mae': mean_absolute_error(y_test, pred)
+            }
+        
+        self._compile()
+        self.save_models(metrics=results)
+        self.save_training_snapshot(fingerprints, sorted(features_df.columns))
+        record_training_run(self.model_path, {**run, 'metrics': results}, started, cpu_started)
         return results
     
+    def save_training_snapshot(self, fingerprints, columns):
+        """Remember which inputs the saved models were trained on (see train_incremental)"""
+        snapshot_file = self.model_path / TRAINING_SNAPSHOT_FILE
+        tmp_file = snapshot_file.with_suffix('.pkl.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({
+                'fingerprints': fingerprints,
+                'columns': columns,
+                'trained_at': datetime.now().isoformat(timespec='seconds'),
+            }, f)
+        os.replace(tmp_file, snapshot_file)
+    
+    def load_training_snapshot(self):
+        snapshot_file = self.model_path / TRAINING_SNAPSHOT_FILE
+        if not snapshot_file.exists():
+            return None
+        with open(snapshot_file, 'rb') as f:
+            return pickle.load(f)
+    
     def predict(self, student_id, model_type='ensemble'):
         """Predict student performance using specified model or ensemble"""
-        engine = create_engine(DATA_WAREHOUSE_CONN_STRING)
+        from async_warehouse import get_warehouse_engine
+        engine = get_warehouse_engine()
         
         # Get student features
         query = text("""
@@ -314,7 +490,7 @@ class MultiModelPredictor:
             ds.year_of_study,
             COALESCE(SUM(fa.total_hours), 0) as total_attendance_hours,
             COALESCE(SUM(fa.days_present), 0) as total_days_present,
-            COALESCE(COUNT(DISTINCT fa.course_code), 0) as courses_attended,
+            COALESCE(COUNT(DISTINCT fa.course_key), 0) as courses_attended,
             COALESCE(AVG(fa.total_hours), 0) as avg_hours_per_course,
             COALESCE(COUNT(*), 0) as total_attendance_records,
             CASE 
@@ -336,7 +512,7 @@ class MultiModelPredictor:
                 WHEN SUM(CASE WHEN fp.status = 'Pending' THEN fp.amount ELSE 0 END) > 500000 
                 THEN 1 ELSE 0 
             END as has_significant_balance,
-            COALESCE(COUNT(DISTINCT fe.course_code), 0) as total_enrollments,
+            COALESCE(COUNT(DISTINCT fe.course_key), 0) as total_enrollments,
             COALESCE(COUNT(DISTINCT fe.semester_id), 0) as semesters_enrolled,
             COALESCE(AVG(dc.credits), 0) as avg_course_credits,
             COALESCE(SUM(dc.credits), 0) as total_credits,
@@ -346,122 +522,25 @@ class MultiModelPredictor:
             COALESCE(AVG(fg.coursework_score), 0) as avg_coursework_score,
             COALESCE(AVG(fg.exam_score), 0) as avg_exam_score
         FROM dim_student ds
-        LEFT JOIN fact_attendance fa ON ds.student_id = fa.student_id
-        LEFT JOIN fact_payment fp ON ds.student_id = fp.student_id
-        LEFT JOIN fact_enrollment fe ON ds.student_id = fe.student_id
-        LEFT JOIN dim_course dc ON fe.course_code = dc.course_code
-        LEFT JOIN fact_grade fg ON ds.student_id = fg.student_id
+        LEFT JOIN fact_attendance fa ON ds.student_key = fa.student_key
+        LEFT JOIN fact_payment fp ON ds.student_key = fp.student_key
+        LEFT JOIN fact_enrollment fe ON ds.student_key = fe.student_key
+        LEFT JOIN dim_course dc ON fe.course_key = dc.course_key
+        LEFT JOIN fact_grade fg ON ds.student_key = fg.student_key
         WHERE ds.student_id = :student_id
         GROUP BY ds.student_id, ds.gender, ds.nationality, ds.high_school, ds.high_school_district, ds.admission_date, ds.program_id, ds.year_of_study
         """)
         
-        student_data = pd.read_sql_query(query, engine, params={'student_id': student_id})
-        engine.dispose()
+        with engine.connect() as conn:
+            row = conn.execute(query, {'student_id': student_id}).mappings().first()
         
-        if student_data.empty:
+        if row is None:
             raise ValueError(f"Student {student_id} not found")
         
-        # Encode categorical variables - MUST match training encoding
-        # Use the same label encoders from training, or encode in place like training does
-        categorical_cols = ['gender', 'nationality', 'high_school', 'high_school_district']
-        
-        for col in categorical_cols:
-            if col in student_data.columns:
-                if col in self.label_encoders:
-                    # Use saved label encoder from training
-                    le = self.label_encoders[col]
-                    # Convert to string, handle NaN/None values (same as training)
-                    student_data[col] = student_data[col].fillna('Unknown').astype(str)
-                    # Handle unseen values - use 'Unknown' for values not in training
-                    try:
-                        student_data[col] = le.transform(student_data[col])
-                    except ValueError:
-                        # If value not seen during training, map to 'Unknown' first
-                        student_data[col] = student_data[col].replace(
-                            [v for v in student_data[col].unique() if v not in le.classes_],
-                            'Unknown'
-                        )
-                        student_data[col] = le.transform(student_data[col])
-                else:
-                    # Fallback: encode using same method as training
-                    # Convert to string, handle NaN/None values
-                    student_data[col] = student_data[col].fillna('Unknown').astype(str)
-                    # For gender, use simple mapping
-                    if col == 'gender':
-                        student_data[col] = student_data[col].map({'M': 1, 'F': 0, 'Male': 1, 'Female': 0}).fillna(0)
-                    else:
-                        # Use categorical codes as fallback
-                        student_data[col] = pd.Categorical(student_data[col]).codes
-        
-        # Prepare feature vector
-        if not self.feature_cols:
+        # Encoded with the training label encoders and scaler; unseen categories get the unknown code
+        if not self.feature_cols or self.feature_encoder is None or not hasattr(self.scaler, 'mean_'):
             raise ValueError("Model not trained. Please train models first.")
-        
-        # Check for missing columns and add them with default values
-        missing_cols = set(self.feature_cols) - set(student_data.columns)
-        if missing_cols:
-            print(f"Warning: Missing columns in prediction data: {missing_cols}")
-            for col in missing_cols:
-                student_data[col] = 0  # Add missing columns with default value 0
-        
-        # Use all feature_cols to match training (in correct order)
-        X_df = student_data[self.feature_cols].copy()
-        
-        # Ensure all columns are numeric before converting to array
-        # This is a safety check - encoding above should have made them numeric, but double-check
-        for col in X_df.columns:
-            # First replace common non-numeric strings (case-insensitive) - safety check
-            if X_df[col].dtype == 'object' or X_df[col].dtype == 'string':
-                # Replace any string values that look like 'M', 'N/A', etc.
-                X_df[col] = X_df[col].astype(str).replace(['M', 'm', 'N/A', 'n/a', 'NULL', 'null', 'NONE', 'none', '', 'nan', 'NaN', 'None'], '0')
-            # Then convert to numeric - this will handle any remaining non-numeric values
-            X_df[col] = pd.to_numeric(X_df[col], errors='coerce').fillna(0)
-        # Ensure final array is float64 - this will raise an error if there are still non-numeric values
-        try:
-            X = X_df.values.astype(np.float64)
-        except (ValueError, TypeError) as e:
-            # If conversion fails, log the problematic columns and force conversion
-            print(f"Warning: Error converting to float64: {e}")
-            print(f"Problematic columns and their dtypes: {X_df.dtypes}")
-            print(f"Sample values:\n{X_df.head()}")
-            # Force all columns to be numeric one more time
-            for col in X_df.columns:
-                X_df[col] = pd.to_numeric(X_df[col], errors='coerce').fillna(0)
-            X = X_df.values.astype(np.float64)
-        
-        if not hasattr(self.scaler, 'mean_'):
-            raise ValueError("Model scaler not fitted. Please train models first.")
-        
-        try:
-            X_scaled = self.scaler.transform(X)
-        except (ValueError, TypeError) as e:
-            # If transform fails, check for any remaining non-numeric values
-            error_msg = str(e)
-            print(f"Error transforming features: {error_msg}")
-            print(f"Feature columns: {available_cols}")
-            print(f"X shape: {X.shape}, X dtype: {X.dtype}")
-            print(f"X_df dtypes:\n{X_df.dtypes}")
-            print(f"X_df sample:\n{X_df.head()}")
-            # Check if X is still object type (contains strings)
-            if X.dtype == 'object':
-                print("WARNING: X array is object type - contains non-numeric values!")
-                # Force all values to be numeric one more time, more aggressively
-                for col in X_df.columns:
-                    # Convert to string first, replace all non-numeric patterns
-                    col_series = X_df[col].astype(str)
-                    # Replace any single character 'M' or other problematic values
-                    col_series = col_series.replace(['M', 'm', 'N/A', 'n/a', 'NULL', 'null', 'NONE', 'none', '', 'nan', 'NaN', 'None'], '0')
-                    X_df[col] = pd.to_numeric(col_series, errors='coerce').fillna(0)
-                X = X_df.values.astype(np.float64)
-            else:
-                # Just retry with the same X
-                pass
-            # Try transform again
-            try:
-                X_scaled = self.scaler.transform(X)
-            except Exception as e2:
-                print(f"Second transform attempt also failed: {e2}")
-                raise ValueError(f"Unable to transform features. Error: {error_msg}. Retry error: {e2}")
+        X_scaled = self.feature_encoder.transform(row)
         
         # Make predictions
         if model_type == 'ensemble':
@@ -469,36 +548,96 @@ class MultiModelPredictor:
             predictions = []
             for model_name, model in self.models.items():
                 if model is not None:
-                    pred = model.predict(X_scaled)[0]
+                    pred = predict_with(model, self.compiled_models.get(model_name), X_scaled)[0]
                     predictions.append(pred)
             prediction = np.mean(predictions) if predictions else 0
         elif model_type in self.models and self.models[model_type] is not None:
-            prediction = self.models[model_type].predict(X_scaled)[0]
+            prediction = predict_with(self.models[model_type], self.compiled_models.get(model_type), X_scaled)[0]
         else:
             raise ValueError(f"Model {model_type} not available")
         
         return max(0, min(100, prediction))  # Clamp between 0 and 100
     
+    def _compile(self):
+        """Array-backed tree ensembles and the row encoder of the current models"""
+        self.compiled_models = compile_models(self.models)
+        self.feature_encoder = CompiledFeatureEncoder(self.feature_cols, self.label_encoders, self.scaler)
+    
+    def encode_features(self, features_df):
+        """Scaled feature matrix of a prepare_features() frame, encoded with the trained label encoders"""
+        encoder = self.feature_encoder or CompiledFeatureEncoder(self.feature_cols, self.label_encoders, self.scaler)
+        X_df = features_df.copy()
+        for col, (codes, unknown) in encoder.categories.items():
+            if col not in X_df.columns:
+                continue
+            # Categories never seen in training become 'Unknown' (or fall outside the trained codes)
+            X_df[col] = X_df[col].fillna('Unknown').astype(str).map(codes).fillna(unknown)
+        for col in set(self.feature_cols) - set(X_df.columns):
+            X_df[col] = 0
+        X_df = X_df[self.feature_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+        return encoder.scale_matrix(X_df.values.astype(np.float64))
+    
+    def predict_batch(self, features_df):
+        """Predict every row of a prepare_features() frame with each model in one call per model.
+        Returns {model_name: array of grades clamped to 0-100}, plus 'ensemble' (their mean)."""
+        if not self.feature_cols or not hasattr(self.scaler, 'mean_'):
+            raise ValueError("Model not trained. Please train models first.")
+        X_scaled = self.encode_features(features_df)
+        
+        predictions = {}
+        for model_name, model in self.models.items():
+            if model is not None:
+                predictions[model_name] = predict_with(model, self.compiled_models.get(model_name), X_scaled)
+        if predictions:
+            predictions['ensemble'] = np.mean(list(predictions.values()), axis=0)
+        return {name: np.clip(values, 0, 100) for name, values in predictions.items()}
+    
     def predict_scenario(self, scenario_params):
         """Predict performance for a hypothetical scenario"""
         # Create feature vector from scenario parameters
         # This allows "what-if" analysis
         pass
     
-    def save_models(self):
-        """Save all models"""
-        model_data = {
-            'models': self.models,
-            'scaler': self.scaler,
-            'feature_cols': self.feature_cols,
-            'label_encoders': self.label_encoders
+    def save_models(self, metrics=None):
+        """Publish the models as a new registry version: one artifact per model plus the
+        shared scaler, feature columns and label encoders ('preprocessing')"""
+        metrics = metrics or {}
+        artifacts = {
+            'preprocessing': {
+                'payload': {
+                    'scaler': self.scaler,
+                    'feature_cols': self.feature_cols,
+                    'label_encoders': self.label_encoders
+                },
+                'feature_cols': self.feature_cols,
+            }
         }
-        with open(self.model_path / 'multi_model_predictor.pkl', 'wb') as f:
-            pickle.dump(model_data, f)
+        for model_name, model in self.models.items():
+            if model is not None:
+                artifacts[model_name] = {'payload': model, 'metrics': metrics.get(model_name),
+                                         'feature_cols': self.feature_cols}
+        self.model_version = model_registry.publish(MODEL_SET, artifacts)
+        print(f"Models saved as {MODEL_SET} {self.model_version}")
+    
+    def has_saved_models(self):
+        return (model_registry.current_version(MODEL_SET) is not None
+                or (self.model_path / LEGACY_MODEL_FILE).exists())
     
-    def load_models(self):
-        """Load saved models"""
-        model_file = self.model_path / 'multi_model_predictor.pkl'
+    def load_models(self, model_names=None):
+        """Load saved models (only those in model_names, when given)"""
+        manifest, payloads = model_registry.load(
+            MODEL_SET, names=None if model_names is None else set(model_names) | {'preprocessing'})
+        if manifest is not None:
+            preprocessing = payloads.pop('preprocessing')
+            self.models = {model_name: payloads.get(model_name) for model_name in MODEL_NAMES}
+            self.scaler = preprocessing['scaler']
+            self.feature_cols = preprocessing['feature_cols']
+            self.label_encoders = preprocessing['label_encoders']
+            self.model_version = manifest['version']
+            self._compile()
+            return
+        
+        model_file = self.model_path / LEGACY_MODEL_FILE
         if model_file.exists():
             with open(model_file, 'rb') as f:
                 model_data = pickle.load(f)
@@ -506,6 +645,10 @@ class MultiModelPredictor:
                 self.scaler = model_data['scaler']
                 self.feature_cols = model_data['feature_cols']
                 self.label_encoders = model_data.get('label_encoders', {})  # Load label encoders if available
+            if model_names is not None:
+                self.models = {name: model if name in model_names else None for name, model in self.models.items()}
+            # Compiled once per load rather than pickled, so older model files still work
+            self._compile()
         else:
             print("Models not found. Training new models...")
             self.train_all_models()
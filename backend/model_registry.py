@@ -0,0 +1,199 @@
+"""
+Model Registry
+Versioned storage for trained models: one compressed joblib artifact per model
+and a manifest per version, instead of one pickle holding every model.
+
+    models/registry/<model set>/
+        CURRENT                 version being served, e.g. "v7"
+        v7/manifest.json        version, created_at, warehouse generation and per model:
+                                file, size, metrics, feature columns and schema hash
+        v7/random_forest.joblib
+        v7/preprocessing.joblib
+        ...
+
+Model sets are 'standard' (MultiModelPredictor) and 'enhanced' (EnhancedPredictor).
+A server loads only the artifacts it serves (SERVED_MODELS), and rolling back is
+pointing CURRENT at an earlier version:
+    python model_registry.py list [standard|enhanced]
+    python model_registry.py rollback standard v6
+Servers pick up the change within MODEL_RELOAD_CHECK_SECONDS (predictor_service.py).
+The MODEL_REGISTRY_KEEP_VERSIONS newest versions are kept.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from config import MODEL_REGISTRY_PATH, MODEL_REGISTRY_COMPRESS, MODEL_REGISTRY_KEEP_VERSIONS
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_SUFFIX = '.joblib'
+
+
+def feature_schema_hash(feature_cols):
+    """Short hash of the ordered feature columns a model expects"""
+    return hashlib.sha1(json.dumps(list(feature_cols or [])).encode()).hexdigest()[:16]
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _version_number(version):
+    try:
+        return int(version.lstrip('v'))
+    except (AttributeError, ValueError):
+        return -1
+
+
+def _write_atomic(path, data):
+    tmp_file = path.with_name(path.name + '.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+
+
+class ModelRegistry:
+    """Publishes, lists, loads and activates model versions under one directory"""
+
+    def __init__(self, root=MODEL_REGISTRY_PATH, compress=MODEL_REGISTRY_COMPRESS,
+                 keep_versions=MODEL_REGISTRY_KEEP_VERSIONS):
+        self.root = Path(root)
+        self.compress = compress
+        self.keep_versions = keep_versions
+
+    def _set_path(self, model_set):
+        return self.root / model_set
+
+    def current_version(self, model_set):
+        """Version being served, or None when nothing was published"""
+        try:
+            return (self._set_path(model_set) / CURRENT_FILE).read_text(encoding='utf-8').strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self, model_set):
+        """Published versions, oldest first"""
+        set_path = self._set_path(model_set)
+        if not set_path.exists():
+            return []
+        return sorted((p.name for p in set_path.iterdir() if (p / MANIFEST_FILE).exists()), key=_version_number)
+
+    def manifest(self, model_set, version=None):
+        version = version or self.current_version(model_set)
+        if version is None:
+            return None
+        manifest_file = self._set_path(model_set) / version / MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    def publish(self, model_set, artifacts, version=None, activate=True):
+        """Write {name: {'payload': object, 'metrics': dict, 'feature_cols': list}} as a new
+        version (or over `version`, for a training run that saves as it goes) and make it current.
+        Returns the version."""
+        from async_warehouse import current_generation
+
+        set_path = self._set_path(model_set)
+        set_path.mkdir(parents=True, exist_ok=True)
+        if version is None:
+            version = f"v{max([_version_number(v) for v in self.versions(model_set)] + [0]) + 1}"
+        version_path = set_path / version
+        version_path.mkdir(exist_ok=True)
+
+        models = {}
+        for name, artifact in artifacts.items():
+            artifact_file = version_path / (name + ARTIFACT_SUFFIX)
+            tmp_file = artifact_file.with_name(artifact_file.name + '.tmp')
+            joblib.dump(artifact['payload'], tmp_file, compress=self.compress)
+            os.replace(tmp_file, artifact_file)
+            feature_cols = artifact.get('feature_cols')
+            models[name] = {
+                'file': artifact_file.name,
+                'size_bytes': artifact_file.stat().st_size,
+                'metrics': artifact.get('metrics'),
+                'feature_cols': list(feature_cols) if feature_cols is not None else None,
+                'feature_schema_hash': feature_schema_hash(feature_cols) if feature_cols is not None else None,
+            }
+        # Artifacts of an earlier save of this version that are no longer part of it
+        for stale in version_path.glob('*' + ARTIFACT_SUFFIX):
+            if stale.name[:-len(ARTIFACT_SUFFIX)] not in models:
+                stale.unlink()
+
+        manifest = {
+            'model_set': model_set,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'generation': current_generation(),
+            'size_bytes': sum(entry['size_bytes'] for entry in models.values()),
+            'models': models,
+        }
+        _write_atomic(version_path / MANIFEST_FILE, json.dumps(manifest, indent=2, default=_json_default))
+        if activate:
+            self.activate(model_set, version)
+        self.prune(model_set)
+        return version
+
+    def load(self, model_set, names=None, version=None):
+        """(manifest, {name: payload}) of the current (or given) version; only the artifacts in
+        `names` are read when it is given. (None, {}) when nothing was published."""
+        manifest = self.manifest(model_set, version)
+        if manifest is None:
+            return None, {}
+        version_path = self._set_path(model_set) / manifest['version']
+        payloads = {}
+        for name, entry in manifest['models'].items():
+            if names is None or name in names:
+                payloads[name] = joblib.load(version_path / entry['file'])
+        return manifest, payloads
+
+    def activate(self, model_set, version):
+        """Serve `version` from now on (rollback or roll forward)"""
+        if self.manifest(model_set, version) is None:
+            raise ValueError(f"Unknown {model_set} model version: {version}")
+        _write_atomic(self._set_path(model_set) / CURRENT_FILE, version)
+
+    def prune(self, model_set):
+        """Delete all but the keep_versions newest versions; the current one is always kept"""
+        if self.keep_versions <= 0:
+            return
+        current = self.current_version(model_set)
+        for version in self.versions(model_set)[:-self.keep_versions]:
+            if version != current:
+                shutil.rmtree(self._set_path(model_set) / version, ignore_errors=True)
+
+
+model_registry = ModelRegistry()
+
+
+def _print_versions(model_set):
+    current = model_registry.current_version(model_set)
+    print(f"{model_set}:")
+    for version in model_registry.versions(model_set):
+        manifest = model_registry.manifest(model_set, version)
+        marker = '*' if version == current else ' '
+        print(f"  {marker} {version}  {manifest['created_at']}  generation={manifest.get('generation')}  "
+              f"{manifest['size_bytes'] / 1e6:.1f} MB  {', '.join(manifest['models'])}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'list':
+        for model_set in sys.argv[2:] or ['standard', 'enhanced']:
+            _print_versions(model_set)
+    elif len(sys.argv) == 4 and sys.argv[1] == 'rollback':
+        model_registry.activate(sys.argv[2], sys.argv[3])
+        print(f"{sys.argv[2]} models now at {sys.argv[3]}")
+    else:
+        print("Usage: python model_registry.py list [standard|enhanced]")
+        print("       python model_registry.py rollback <standard|enhanced> <version>")
+        sys.exit(1)
@@ -0,0 +1,194 @@
+"""
+Model Tuning
+Hyperparameter search for the tree ensembles of MultiModelPredictor by
+successive halving: a random sample of candidates is scored on a small share of
+the training rows, the best third moves on to three times as many rows, and so
+on until one candidate is left or every row is used.
+
+The cross-validation folds are drawn once and shared by every candidate and
+both estimators, on the feature matrix train_all_models() has already scaled.
+Every score is kept in models/tuning_results.json together with a fingerprint
+of the training data, so a later search on the same data reuses them instead of
+refitting, and the previous best parameters are always among the candidates.
+Each model gets an equal share of what is left of TUNING_TIME_BUDGET_SECONDS
+(time a model does not use passes to the next one); a search that runs out keeps
+the best candidate of the largest resource level reached.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.model_selection import KFold, ParameterSampler, cross_val_score
+
+from config import TUNING_TIME_BUDGET_SECONDS, TUNING_CANDIDATES, TUNING_CV_FOLDS
+
+TUNING_RESULTS_FILE = 'tuning_results.json'
+
+# Halving factor: each level keeps 1/HALVING_FACTOR of the candidates on HALVING_FACTOR times the rows
+HALVING_FACTOR = 3
+MIN_RESOURCE_ROWS = 200
+
+SEARCH_SPACES = {
+    'random_forest': (
+        RandomForestRegressor(n_estimators=100, max_depth=15, random_state=42, n_jobs=-1),
+        {
+            'n_estimators': [50, 100, 150, 200, 300],
+            'max_depth': [8, 10, 15, 20, None],
+            'min_samples_split': [2, 5, 10],
+            'min_samples_leaf': [1, 2, 4],
+            'max_features': [1.0, 0.5, 'sqrt'],
+        },
+    ),
+    'gradient_boosting': (
+        GradientBoostingRegressor(n_estimators=100, max_depth=5, learning_rate=0.1, random_state=42),
+        {
+            'n_estimators': [50, 100, 150, 200, 300],
+            'max_depth': [3, 4, 5, 7],
+            'learning_rate': [0.02, 0.05, 0.1, 0.2],
+            'subsample': [0.7, 0.85, 1.0],
+            'min_samples_leaf': [1, 5, 20],
+        },
+    ),
+}
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def data_fingerprint(X, y):
+    """Hash of the training matrix and target; scores are only reused on identical data"""
+    digest = hashlib.sha1()
+    digest.update(str(X.shape).encode())
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def load_tuning_results(model_path):
+    results_file = Path(model_path) / TUNING_RESULTS_FILE
+    if not results_file.exists():
+        return {}
+    with open(results_file, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_tuning_results(model_path, results):
+    results_file = Path(model_path) / TUNING_RESULTS_FILE
+    tmp_file = results_file.with_suffix('.json.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, default=str)
+    os.replace(tmp_file, results_file)
+
+
+def best_params(model_path, model_name):
+    """Best parameters found by an earlier search, or None"""
+    return load_tuning_results(model_path).get(model_name, {}).get('best_params')
+
+
+def shared_folds(n_rows, n_folds=TUNING_CV_FOLDS):
+    """(train, test) index arrays drawn once and reused by every candidate"""
+    return list(KFold(n_splits=n_folds, shuffle=True, random_state=42).split(np.arange(n_rows)))
+
+
+def _resource_levels(n_rows, n_candidates):
+    """Training rows per fold at each halving level, smallest first"""
+    n_levels = 1
+    while HALVING_FACTOR ** n_levels < n_candidates and n_rows // HALVING_FACTOR ** n_levels >= MIN_RESOURCE_ROWS:
+        n_levels += 1
+    return [n_rows // HALVING_FACTOR ** (n_levels - 1 - level) for level in range(n_levels)]
+
+
+def successive_halving(model_name, X, y, folds, previous=None, n_candidates=TUNING_CANDIDATES,
+                       deadline=None, seed=None):
+    """Search one model's space. Returns its results entry:
+    best_params, best_score (mean R² over the folds), resource and evaluations."""
+    estimator, space = SEARCH_SPACES[model_name]
+    fingerprint = data_fingerprint(X, y)
+    previous = previous or {}
+    # Scores from an earlier search on the same data are reused as they are
+    known = {}
+    if previous.get('data_fingerprint') == fingerprint:
+        known = {(e['params_key'], e['resource']): e['score'] for e in previous.get('evaluations', [])}
+
+    # Same data, same candidates: a search cut short by the budget resumes where it stopped
+    rng = np.random.RandomState(seed if seed is not None else int(fingerprint[:8], 16))
+    candidates = list(ParameterSampler(space, n_iter=n_candidates, random_state=rng))
+    if previous.get('best_params'):
+        candidates = [previous['best_params']] + [c for c in candidates
+                                                  if _params_key(c) != _params_key(previous['best_params'])]
+    candidates = candidates[:n_candidates]
+
+    evaluations = []
+    best = None
+    n_train = min(len(train) for train, _ in folds)
+    for resource in _resource_levels(n_train, len(candidates)):
+        # Each fold trains on the first `resource` of its (already shuffled) training rows
+        level_folds = [(train[:resource], test) for train, test in folds]
+        scored = []
+        for params in candidates:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            key = (_params_key(params), resource)
+            score = known.get(key)
+            if score is None:
+                model = clone(estimator).set_params(**params)
+                score = float(np.mean(cross_val_score(model, X, y, cv=level_folds, scoring='r2', n_jobs=-1)))
+            evaluations.append({'params': params, 'params_key': key[0], 'resource': resource, 'score': score})
+            scored.append((score, params))
+        if not scored:
+            print(f"  {model_name}: time budget reached")
+            break
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best = {'best_params': scored[0][1], 'best_score': scored[0][0], 'resource': resource}
+        print(f"  {model_name}: {len(scored)} candidates on {resource} rows, best R² {scored[0][0]:.4f}")
+        if len(scored) < len(candidates):
+            print(f"  {model_name}: time budget reached")
+            break
+        candidates = [params for _, params in scored[:max(1, len(scored) // HALVING_FACTOR)]]
+
+    if best is None:
+        return previous or None
+    if known and previous.get('resource', 0) > best['resource']:
+        # A cut-short search does not replace a winner that got further on the same data
+        best = {key: previous[key] for key in ('best_params', 'best_score', 'resource')}
+    merged = {(e['params_key'], e['resource']): e for e in previous.get('evaluations', []) if known}
+    merged.update({(e['params_key'], e['resource']): e for e in evaluations})
+    return {
+        **best,
+        'data_fingerprint': fingerprint,
+        'tuned_at': datetime.now().isoformat(timespec='seconds'),
+        'evaluations': list(merged.values()),
+    }
+
+
+def tune_models(X, y, model_path, model_names=None, time_budget=TUNING_TIME_BUDGET_SECONDS,
+                n_candidates=TUNING_CANDIDATES):
+    """Search every model in SEARCH_SPACES (or model_names) within one shared time budget.
+    X is the scaled training matrix. Returns {model_name: best_params} and saves all results."""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    model_names = list(model_names or SEARCH_SPACES)
+    end = time.monotonic() + time_budget if time_budget else None
+    folds = shared_folds(len(X))
+    results = load_tuning_results(model_path)
+
+    print(f"\nTuning {', '.join(model_names)} (budget {time_budget:.0f}s)...")
+    for i, model_name in enumerate(model_names):
+        # An equal share of the remaining budget, so the first model cannot starve the others
+        deadline = None
+        if end is not None:
+            now = time.monotonic()
+            deadline = now + max(0.0, end - now) / (len(model_names) - i)
+        entry = successive_halving(model_name, X, y, folds, previous=results.get(model_name),
+                                   n_candidates=n_candidates, deadline=deadline)
+        if entry:
+            results[model_name] = entry
+        save_tuning_results(model_path, results)
+    return {name: results[name]['best_params'] for name in model_names if results.get(name)}
@@ -0,0 +1,188 @@
+"""
+Prediction Cache
+Remembers per-student prediction results until their inputs can change: entries
+are keyed by (student_id, model, model version, warehouse generation), so a new
+model file (predictor_service) or an ETL swap (etl_generation) makes the old
+entries unreachable without any coordination between workers.
+
+Two tiers:
+    - a bounded in-process LRU (PREDICTION_CACHE_SIZE entries)
+    - optionally a sqlite table at PREDICTION_CACHE_DB_PATH shared by every worker
+      on the host (PREDICTION_CACHE_PERSIST=true)
+
+The ETL purges rows of earlier generations after a swap and train_models.py
+clears the cache after training. Without a generation marker in the warehouse
+(loads from before etl_generation existed) nothing is cached.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from config import (PREDICTION_CACHE_SIZE, PREDICTION_CACHE_PERSIST, PREDICTION_CACHE_DB_PATH,
+                    WAREHOUSE_GENERATION_CHECK_SECONDS)
+
+_MISSING = object()
+
+
+class PredictionCache:
+    """LRU of JSON-serializable prediction results with an optional shared sqlite tier"""
+
+    def __init__(self, max_entries=PREDICTION_CACHE_SIZE, persist=PREDICTION_CACHE_PERSIST,
+                 db_path=PREDICTION_CACHE_DB_PATH, generation_check_seconds=WAREHOUSE_GENERATION_CHECK_SECONDS):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.db_path = Path(db_path)
+        self.generation_check_seconds = generation_check_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._generation_checked = 0.0
+        self._db_ready = False
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    # ---- warehouse generation ----
+
+    def generation(self):
+        """Current warehouse generation, re-read at most every generation_check_seconds"""
+        if self._generation_checked and time.monotonic() - self._generation_checked < self.generation_check_seconds:
+            return self._generation
+        from async_warehouse import current_generation
+        generation = current_generation()
+        with self._lock:
+            if generation != self._generation:
+                # Entries of the previous generation can never be hit again
+                self._entries.clear()
+            self._generation = generation
+            self._generation_checked = time.monotonic()
+        return generation
+
+    # ---- persistent tier ----
+
+    def _connect(self):
+        """Connection to the shared table; callers close it (`with conn:` only commits)"""
+        if not self._db_ready:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        if not self._db_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prediction_cache (
+                    student_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    generation TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (student_id, model, model_version, generation)
+                )
+            """)
+            self._db_ready = True
+        return conn
+
+    def _load(self, key):
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT result FROM prediction_cache WHERE student_id = ? AND model = ? "
+                                   "AND model_version = ? AND generation = ?", key).fetchone()
+        except sqlite3.Error as e:
+            print(f"Prediction cache read failed: {e}")
+            return _MISSING
+        return json.loads(row[0]) if row else _MISSING
+
+    def _store(self, key, value):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO prediction_cache "
+                             "(student_id, model, model_version, generation, result, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             (*key, json.dumps(value), datetime.now().isoformat(timespec='seconds')))
+        except sqlite3.Error as e:
+            print(f"Prediction cache write failed: {e}")
+
+    # ---- lookups ----
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, student_id, model_name, model_version, compute):
+        """Cached result of compute() for this student and model version in the current
+        warehouse generation. Results that raise are not cached."""
+        generation = self.generation() if model_version else None
+        if not model_version or generation is None or self.max_entries <= 0:
+            return compute()
+        key = (str(student_id), model_name, str(model_version), str(generation))
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.persist:
+            value = self._load(key)
+            if value is not _MISSING:
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return value
+        value = compute()
+        with self._lock:
+            self.misses += 1
+        self._remember(key, value)
+        if self.persist:
+            self._store(key, value)
+        return value
+
+    # ---- invalidation ----
+
+    def invalidate(self, model_name=None):
+        """Drop every cached result (or those of one model) from memory and the shared table"""
+        with self._lock:
+            if model_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[1] == model_name]:
+                    del self._entries[key]
+        if self.persist:
+            try:
+                with closing(self._connect()) as conn, conn:
+                    if model_name is None:
+                        conn.execute("DELETE FROM prediction_cache")
+                    else:
+                        conn.execute("DELETE FROM prediction_cache WHERE model = ?", (model_name,))
+            except sqlite3.Error as e:
+                print(f"Prediction cache invalidation failed: {e}")
+
+    def purge_stale(self, generation):
+        """Delete shared rows of every warehouse generation except `generation`"""
+        if not self.persist:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM prediction_cache WHERE generation != ?", (str(generation),)).rowcount
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'persistent': self.persist,
+                'generation': self._generation,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,162 @@
+"""
+Predictor Service
+Owns the trained models of one server process: the MultiModelPredictor
+(random forest, gradient boosting, neural network) and the EnhancedPredictor.
+app.py, the predictions blueprint and the background jobs all use the shared
+`predictor_service`, so each process holds a single copy of every model.
+
+Hot reload: at most every MODEL_RELOAD_CHECK_SECONDS the service compares the
+current registry versions (model_registry.py) with the ones it loaded. When
+train_models.py has published new versions, or a version was rolled back, they
+are loaded into fresh predictor objects and swapped in; requests already
+running keep the objects they started with. Only the models in SERVED_MODELS
+are loaded when it is set.
+"""
+import threading
+import time
+from datetime import datetime
+
+from config import MODEL_RELOAD_CHECK_SECONDS, SERVED_MODELS
+from ml_models import MultiModelPredictor, MODEL_NAMES as STANDARD_MODEL_NAMES
+from model_registry import model_registry
+
+try:
+    from enhanced_predictions import EnhancedPredictor
+except ImportError:
+    EnhancedPredictor = None
+    print("Enhanced predictions module not available")
+
+# Pickles written before the model registry, used until a version is published
+STANDARD_MODEL_FILE = 'multi_model_predictor.pkl'
+ENHANCED_MODEL_FILE = 'enhanced_predictor.pkl'
+
+
+def _file_version(path):
+    """(mtime, size) of a model file, or None when it has not been trained yet"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _current_version(model_set, legacy_file):
+    """Version label of a model set as used in cache keys (prediction_cache.py): the current
+    registry version, else the (mtime, size) of its legacy pickle, else None"""
+    version = model_registry.current_version(model_set)
+    if version is not None:
+        return version
+    legacy = _file_version(legacy_file)
+    return f"{legacy[0]}-{legacy[1]}" if legacy else None
+
+
+class PredictorService:
+    """Loads each model set once and swaps in new versions without a restart"""
+
+    def __init__(self, check_interval=MODEL_RELOAD_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._standard = None
+        self._enhanced = None
+        self._versions = {}
+        self._loaded_at = {}
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    # Callers should take one reference per request (predictor = predictor_service.standard)
+    # so a model, its scaler and its feature columns always come from the same version
+
+    @property
+    def standard(self):
+        self._maybe_reload()
+        return self._standard
+
+    @property
+    def enhanced(self):
+        self._maybe_reload()
+        return self._enhanced
+
+    def _maybe_reload(self):
+        if self._last_check and time.monotonic() - self._last_check < self.check_interval:
+            return
+        # One thread checks (and loads) at a time; the others keep serving the current models
+        if not self._reload_lock.acquire(blocking=self._standard is None and self._enhanced is None):
+            return
+        try:
+            if not self._last_check or time.monotonic() - self._last_check >= self.check_interval:
+                self._reload_changed()
+        finally:
+            self._reload_lock.release()
+
+    def _reload_changed(self, force=False):
+        reloaded = []
+        standard = MultiModelPredictor()
+        model_path = standard.model_path
+        served = SERVED_MODELS or None
+
+        version = _current_version('standard', model_path / STANDARD_MODEL_FILE)
+        if served is not None and not set(served) & set(STANDARD_MODEL_NAMES):
+            version = None
+        if version is not None and (force or version != self._versions.get('standard')):
+            try:
+                # load_models() trains when no models are saved; only call it when there are
+                standard.load_models(served)
+                standard.model_version = standard.model_version or version
+                self._standard = standard
+                self._versions['standard'] = standard.model_version
+                self._loaded_at['standard'] = datetime.now().isoformat(timespec='seconds')
+                reloaded.append('standard')
+            except Exception as e:
+                print(f"Standard models not reloaded: {e}")
+        elif version is None and not self._last_check:
+            print("Models not loaded. Train models first.")
+
+        if EnhancedPredictor is not None:
+            version = _current_version('enhanced', model_path / ENHANCED_MODEL_FILE)
+            if version is not None and (force or version != self._versions.get('enhanced')):
+                try:
+                    enhanced = EnhancedPredictor()
+                    if enhanced.load_all_models(served):
+                        enhanced.model_version = enhanced.model_version or version
+                        self._enhanced = enhanced
+                        self._versions['enhanced'] = enhanced.model_version
+                        self._loaded_at['enhanced'] = datetime.now().isoformat(timespec='seconds')
+                        reloaded.append('enhanced')
+                except Exception as e:
+                    print(f"Enhanced models not reloaded: {e}")
+            elif version is None and not self._last_check:
+                print("Enhanced models not loaded. Train models first.")
+
+        self._last_check = time.monotonic()
+        if reloaded:
+            print(f"Loaded models: {', '.join(reloaded)}")
+        return reloaded
+
+    def reload(self, force=True):
+        """Load the model files now (all of them when force, else only those that changed)"""
+        with self._reload_lock:
+            return self._reload_changed(force=force)
+
+    def status(self):
+        enhanced = self._enhanced
+        return {
+            'standard': {
+                'loaded': self._standard is not None,
+                'loaded_at': self._loaded_at.get('standard'),
+                'version': getattr(self._standard, 'model_version', None),
+                'models': sorted(name for name, model in (self._standard.models if self._standard else {}).items()
+                                 if model is not None),
+            },
+            'enhanced': {
+                'available': EnhancedPredictor is not None,
+                'loaded': enhanced is not None,
+                'loaded_at': self._loaded_at.get('enhanced'),
+                'version': getattr(enhanced, 'model_version', None),
+                'models': sorted(enhanced.models) if enhanced else [],
+            },
+            'served_models': SERVED_MODELS or 'all',
+            'registry': {model_set: model_registry.versions(model_set) for model_set in ('standard', 'enhanced')},
+            'check_interval_seconds': self.check_interval,
+        }
+
+
+predictor_service = PredictorService()
@@ -0,0 +1,144 @@
+"""
+Query Workload Capture
+Records the normalized SELECT statements the API sends to the data warehouse,
+with call counts, timings and one sample (statement + parameters) each, so
+index_advisor.py can EXPLAIN the real dashboard workload.
+Enabled with QUERY_WORKLOAD_CAPTURE=true; the workload is written to
+QUERY_WORKLOAD_PATH as JSON.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import QUERY_WORKLOAD_PATH
+
+# Only statements touching the star schema are interesting to the advisor
+WAREHOUSE_TABLE_PATTERN = re.compile(r'\b(?:fact|dim)_\w+', re.IGNORECASE)
+FLUSH_EVERY = 50
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """Collapse a statement to its shape: literals and placeholders become ?, IN lists become IN (...)"""
+    sql = _STRING_LITERAL.sub('?', statement)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class WorkloadRecorder:
+    """Aggregates executed statements by normalized shape"""
+
+    def __init__(self, path=QUERY_WORKLOAD_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # Serializes this process's writers of the workload file, which share one temporary file
+        self.flush_lock = threading.Lock()
+        self.entries = self._load()
+        self.pending = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {entry['normalized']: entry for entry in json.load(f)}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def record(self, statement, parameters, elapsed_ms):
+        normalized = normalize_sql(statement)
+        with self.lock:
+            entry = self.entries.get(normalized)
+            if entry is None:
+                entry = self.entries[normalized] = {
+                    'normalized': normalized,
+                    'sample': statement,
+                    'parameters': _json_safe(parameters),
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['last_seen'] = datetime.now().isoformat(timespec='seconds')
+            self.pending += 1
+            should_flush = self.pending >= FLUSH_EVERY
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                # Copies, so record() can keep updating the entries while they are written
+                entries = sorted((dict(e) for e in self.entries.values()), key=lambda e: e['total_ms'], reverse=True)
+                self.pending = 0
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+_recorder = None
+
+
+def enable_capture(path=QUERY_WORKLOAD_PATH):
+    """Start recording warehouse SELECTs from every SQLAlchemy engine in this process"""
+    global _recorder
+    if _recorder is not None:
+        return _recorder
+    _recorder = WorkloadRecorder(path)
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_workload_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('_workload_start')
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000 if started else 0.0
+        if executemany or not statement.lstrip()[:6].upper() == 'SELECT':
+            return
+        if not WAREHOUSE_TABLE_PATTERN.search(statement):
+            return
+        try:
+            _recorder.record(statement, parameters, elapsed_ms)
+        except OSError as e:
+            # Workload capture must never fail the query that triggered it
+            print(f"Query workload capture failed: {e}")
+
+    atexit.register(_recorder.flush)
+    print(f"Query workload capture enabled: {path}")
+    return _recorder
+
+
+def load_workload(path=QUERY_WORKLOAD_PATH):
+    """Captured workload entries, most expensive first"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
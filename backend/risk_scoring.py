@@ -0,0 +1,168 @@
+"""
+Risk Scoring
+Scores every active student with each trained model in one batch per model and
+publishes the results as fact_prediction, so ranked at-risk lists
+(GET /api/predictions/at-risk) are one indexed query instead of thousands of
+on-demand predictions.
+
+Runs after the ETL load (RISK_SCORING_AFTER_ETL) and after train_models.py,
+or by hand:
+    python risk_scoring.py
+The new scores are written to fact_prediction_next and swapped in with one
+RENAME TABLE, so readers never see a half-scored table.
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+backend_dir = Path(__file__).parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from config import DATA_WAREHOUSE_CONN_STRING
+
+PREDICTION_TABLE = 'fact_prediction'
+NEXT_SUFFIX = '_next'
+OLD_SUFFIX = '_old'
+
+# Upper bounds (exclusive) of the predicted grade for each risk level; same bands as the scenario analysis
+RISK_LEVELS = [
+    (50, 'high'),
+    (60, 'medium-high'),
+    (70, 'medium'),
+]
+RISK_LEVEL_NAMES = [name for _, name in RISK_LEVELS] + ['low']
+
+FACT_PREDICTION_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    student_key INT NOT NULL,
+    student_id VARCHAR(20) NOT NULL,
+    model VARCHAR(50) NOT NULL,
+    model_version VARCHAR(40),
+    generation VARCHAR(20),
+    program_id INT,
+    department_id INT,
+    faculty_id INT,
+    predicted_grade DECIMAL(5,2) NOT NULL,
+    risk_level VARCHAR(20) NOT NULL,
+    scored_at DATETIME NOT NULL,
+    PRIMARY KEY (model, student_key),
+    INDEX idx_model_grade (model, predicted_grade),
+    INDEX idx_model_department (model, department_id, predicted_grade),
+    INDEX idx_model_faculty (model, faculty_id, predicted_grade),
+    INDEX idx_student (student_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+# Students that are scored, with the program/department/faculty their scores are listed under
+SCORING_POPULATION_QUERY = """
+SELECT
+    ds.student_key,
+    ds.student_id,
+    ds.program_id,
+    dp.department_id,
+    ddept.faculty_id
+FROM dim_student ds
+LEFT JOIN dim_program dp ON ds.program_id = dp.program_id
+LEFT JOIN dim_department ddept ON dp.department_id = ddept.department_id
+WHERE ds.status IS NULL OR ds.status = 'Active'
+"""
+
+
+def risk_levels(grades):
+    """Risk level for each predicted grade"""
+    bounds = [bound for bound, _ in RISK_LEVELS]
+    return np.array(RISK_LEVEL_NAMES, dtype=object)[np.searchsorted(bounds, grades, side='right')]
+
+
+def _score_frame(population, model_name, model_version, grades):
+    scores = population[['student_key', 'student_id', 'program_id', 'department_id', 'faculty_id']].copy()
+    scores['model'] = model_name
+    scores['model_version'] = model_version
+    scores['predicted_grade'] = np.round(np.asarray(grades, dtype=np.float64), 2)
+    scores['risk_level'] = risk_levels(scores['predicted_grade'].values)
+    return scores
+
+
+def score_standard_models(predictor, population):
+    """Scores of the random forest, gradient boosting, neural network and their ensemble"""
+    features = predictor.prepare_features()
+    features = population[['student_key']].merge(features, on='student_key', how='left')
+    version = getattr(predictor, 'model_version', None)
+    return [_score_frame(population, name, version, grades)
+            for name, grades in predictor.predict_batch(features).items()]
+
+
+def score_tuition_attendance_model(enhanced, population, engine):
+    """Scores of the tuition-attendance-performance model, from its serving features"""
+    from enhanced_predictions import load_tuition_attendance_features
+    name = 'tuition_attendance_performance'
+    features = population[['student_id']].merge(load_tuition_attendance_features(engine=engine),
+                                                on='student_id', how='left')
+    feature_cols = enhanced.feature_cols[name]
+    for col in set(feature_cols) - set(features.columns):
+        features[col] = 0
+    X = features[feature_cols].apply(pd.to_numeric, errors='coerce').fillna(0).values.astype(np.float64)
+    grades = np.clip(enhanced.predict_model(name, enhanced.scalers[name].transform(X)), 0, 100)
+    return [_score_frame(population, name, getattr(enhanced, 'model_version', None), grades)]
+
+
+def publish_scores(scores, engine):
+    """Load the scores into fact_prediction_next and swap it in for fact_prediction"""
+    live, shadow, retired = PREDICTION_TABLE, PREDICTION_TABLE + NEXT_SUFFIX, PREDICTION_TABLE + OLD_SUFFIX
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {shadow}"))
+        conn.execute(text(FACT_PREDICTION_DDL.format(table=shadow)))
+        conn.commit()
+    scores.to_sql(shadow, engine, if_exists='append', index=False, chunksize=5000, method='multi')
+    with engine.connect() as conn:
+        conn.execute(text(FACT_PREDICTION_DDL.format(table=live)))
+        conn.execute(text(f"DROP TABLE IF EXISTS {retired}"))
+        conn.execute(text(f"RENAME TABLE {live} TO {retired}, {shadow} TO {live}"))
+        conn.execute(text(f"DROP TABLE {retired}"))
+        conn.commit()
+
+
+def run_risk_scoring(engine=None):
+    """Score every active student with every loaded model and publish fact_prediction.
+    Returns {model: students scored}; models that are not trained are skipped."""
+    from async_warehouse import current_generation
+    from predictor_service import predictor_service
+
+    own_engine = engine is None
+    engine = engine or create_engine(DATA_WAREHOUSE_CONN_STRING)
+    try:
+        population = pd.read_sql_query(text(SCORING_POPULATION_QUERY), engine)
+        if population.empty:
+            print("Risk scoring: no active students")
+            return {}
+
+        frames = []
+        standard = predictor_service.standard
+        if standard is not None:
+            frames += score_standard_models(standard, population)
+        else:
+            print("Risk scoring: standard models not trained, skipped")
+        enhanced = predictor_service.enhanced
+        if enhanced is not None and 'tuition_attendance_performance' in enhanced.models:
+            frames += score_tuition_attendance_model(enhanced, population, engine)
+        if not frames:
+            return {}
+
+        scores = pd.concat(frames, ignore_index=True)
+        scores['generation'] = current_generation(engine)
+        scores['scored_at'] = datetime.now().replace(microsecond=0)
+        publish_scores(scores, engine)
+        summary = scores.groupby('model').size().to_dict()
+        print(f"Risk scoring: {len(population)} students scored with {', '.join(sorted(summary))}")
+        return summary
+    finally:
+        if own_engine:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    run_risk_scoring()
@@ -6,7 +6,8 @@ USE UCU_DataWarehouse;
 
 -- Dimension: Student
 CREATE TABLE IF NOT EXISTS dim_student (
-    student_id VARCHAR(20) PRIMARY KEY,
+    student_key INT PRIMARY KEY,                 -- Surrogate key referenced by the facts
+    student_id VARCHAR(20) NOT NULL UNIQUE,      -- Natural key
     reg_no VARCHAR(50),
     access_number VARCHAR(10) UNIQUE,
     first_name VARCHAR(50),
@@ -31,7 +32,8 @@ CREATE TABLE IF NOT EXISTS dim_student (
 
 -- Dimension: Course
 CREATE TABLE IF NOT EXISTS dim_course (
-    course_code VARCHAR(20) PRIMARY KEY,
+    course_key INT PRIMARY KEY,                  -- Surrogate key referenced by the facts
+    course_code VARCHAR(20) NOT NULL UNIQUE,     -- Natural key
     course_name VARCHAR(100),
     credits INT,
     department VARCHAR(50),
@@ -40,7 +42,7 @@ CREATE TABLE IF NOT EXISTS dim_course (
 
 -- Dimension: Time
 CREATE TABLE IF NOT EXISTS dim_time (
-    date_key VARCHAR(8) PRIMARY KEY,
+    date_key INT PRIMARY KEY,
     date DATE,
     year INT,
     quarter INT,
@@ -96,43 +98,50 @@ CREATE TABLE IF NOT EXISTS dim_program (
 -- Fact: Enrollment
 CREATE TABLE IF NOT EXISTS fact_enrollment (
     enrollment_id VARCHAR(20) PRIMARY KEY,
-    student_id VARCHAR(20),
-    course_code VARCHAR(20),
-    date_key VARCHAR(8),
+    student_key INT,
+    course_key INT,
+    date_key INT,
     semester_id INT,
     status VARCHAR(20),
-    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
+    FOREIGN KEY (student_key) REFERENCES dim_student(student_key) ON DELETE CASCADE,
+    FOREIGN KEY (course_key) REFERENCES dim_course(course_key) ON DELETE CASCADE,
     FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
     FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-    INDEX idx_student (student_id),
-    INDEX idx_course (course_code),
+    INDEX idx_student (student_key),
+    INDEX idx_course (course_key),
     INDEX idx_date (date_key),
-    INDEX idx_semester (semester_id)
+    INDEX idx_semester (semester_id),
+    -- Workload composite indexes (warehouse_schema.WORKLOAD_INDEXES v2)
+    INDEX idx_wk_student_course (student_key, course_key),
+    INDEX idx_wk_course_student (course_key, student_key)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Fact: Attendance
 CREATE TABLE IF NOT EXISTS fact_attendance (
     attendance_id INT AUTO_INCREMENT PRIMARY KEY,
-    student_id VARCHAR(20),
-    course_code VARCHAR(20),
-    date_key VARCHAR(8),
+    student_key INT,
+    course_key INT,
+    date_key INT,
     total_hours DECIMAL(10,2),
     days_present INT,
-    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
+    FOREIGN KEY (student_key) REFERENCES dim_student(student_key) ON DELETE CASCADE,
+    FOREIGN KEY (course_key) REFERENCES dim_course(course_key) ON DELETE CASCADE,
     FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
-    INDEX idx_student (student_id),
-    INDEX idx_course (course_code),
-    INDEX idx_date (date_key)
+    INDEX idx_student (student_key),
+    INDEX idx_course (course_key),
+    INDEX idx_date (date_key),
+    -- Workload composite indexes (warehouse_schema.WORKLOAD_INDEXES v2)
+    INDEX idx_wk_course_hours (course_key, total_hours, days_present),
+    INDEX idx_wk_date_hours (date_key, total_hours, days_present),
+    INDEX idx_wk_student_hours (student_key, total_hours, days_present)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Fact: Payment
 -- Updated to include fees breakdown: tuition (national/international) + functional fees
 CREATE TABLE IF NOT EXISTS fact_payment (
     payment_id VARCHAR(20) PRIMARY KEY,
-    student_id VARCHAR(20),
-    date_key VARCHAR(8),
+    student_key INT,
+    date_key INT,
     semester_id INT,
     year INT,  -- Academic year
     tuition_national DECIMAL(15,2),  -- National student tuition
@@ -148,17 +157,22 @@ CREATE TABLE IF NOT EXISTS fact_payment (
     deadline_type VARCHAR(50),  -- Which deadline: prompt_payment, registration, midterm, full_fees, late_penalty_week1, late_penalty_week2
     weeks_from_deadline DECIMAL(5,2),  -- Weeks from the relevant deadline (negative if before, positive if after)
     late_penalty DECIMAL(15,2) DEFAULT 0,  -- Late penalty amount if applicable
-    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (student_key) REFERENCES dim_student(student_key) ON DELETE CASCADE,
     FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
     FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-    INDEX idx_student (student_id),
+    INDEX idx_student (student_key),
     INDEX idx_date (date_key),
     INDEX idx_semester (semester_id),
     INDEX idx_year (year),
     INDEX idx_status (status),
     INDEX idx_payment_timestamp (payment_timestamp),
     INDEX idx_deadline_met (deadline_met),
-    INDEX idx_deadline_type (deadline_type)
+    INDEX idx_deadline_type (deadline_type),
+    -- Workload composite indexes (warehouse_schema.WORKLOAD_INDEXES v2)
+    INDEX idx_wk_status_year_amount (status, year, amount),
+    INDEX idx_wk_semester_status (semester_id, status),
+    INDEX idx_wk_student_status_amount (student_key, status, amount),
+    INDEX idx_wk_date_status_amount (date_key, status, amount)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Fact: Grade
@@ -167,9 +181,9 @@ CREATE TABLE IF NOT EXISTS fact_payment (
 -- letter_grade: Letter grade (A, B+, B, C, D, F, MEX, FEX, FCW), calculated from grade and exam_status
 CREATE TABLE IF NOT EXISTS fact_grade (
     grade_id VARCHAR(20) PRIMARY KEY,
-    student_id VARCHAR(20),
-    course_code VARCHAR(20),
-    date_key VARCHAR(8),
+    student_key INT,
+    course_key INT,
+    date_key INT,
     semester_id INT,
     coursework_score DECIMAL(5,2) NOT NULL,  -- Coursework score (0-100)
     exam_score DECIMAL(5,2),                  -- Exam score (0-100), NULL if MEX
@@ -178,17 +192,49 @@ CREATE TABLE IF NOT EXISTS fact_grade (
     fcw BOOLEAN DEFAULT FALSE,                -- Failed Coursework flag
     exam_status VARCHAR(10),                  -- Completed, MEX, FEX, FCW
     absence_reason VARCHAR(200),
-    FOREIGN KEY (student_id) REFERENCES dim_student(student_id) ON DELETE CASCADE,
-    FOREIGN KEY (course_code) REFERENCES dim_course(course_code) ON DELETE CASCADE,
+    FOREIGN KEY (student_key) REFERENCES dim_student(student_key) ON DELETE CASCADE,
+    FOREIGN KEY (course_key) REFERENCES dim_course(course_key) ON DELETE CASCADE,
     FOREIGN KEY (date_key) REFERENCES dim_time(date_key) ON DELETE CASCADE,
     FOREIGN KEY (semester_id) REFERENCES dim_semester(semester_id) ON DELETE CASCADE,
-    INDEX idx_student (student_id),
-    INDEX idx_course (course_code),
+    INDEX idx_student (student_key),
+    INDEX idx_course (course_key),
     INDEX idx_date (date_key),
     INDEX idx_semester (semester_id),
-    INDEX idx_grade (grade)
+    INDEX idx_grade (grade),
+    -- Workload composite indexes (warehouse_schema.WORKLOAD_INDEXES v2)
+    INDEX idx_wk_status_student_grade (exam_status, student_key, grade),
+    INDEX idx_wk_student_course_status (student_key, course_key, exam_status, grade),
+    INDEX idx_wk_semester_letter (semester_id, letter_grade),
+    INDEX idx_wk_date_status_grade (date_key, exam_status, grade)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Fact: Prediction
+-- Nightly risk scores of every active student per model (risk_scoring.py swaps in a new copy each run)
+CREATE TABLE IF NOT EXISTS fact_prediction (
+    student_key INT NOT NULL,
+    student_id VARCHAR(20) NOT NULL,
+    model VARCHAR(50) NOT NULL,
+    model_version VARCHAR(40),
+    generation VARCHAR(20),
+    program_id INT,
+    department_id INT,
+    faculty_id INT,
+    predicted_grade DECIMAL(5,2) NOT NULL,
+    risk_level VARCHAR(20) NOT NULL,             -- high, medium-high, medium, low
+    scored_at DATETIME NOT NULL,
+    PRIMARY KEY (model, student_key),
+    INDEX idx_model_grade (model, predicted_grade),
+    INDEX idx_model_department (model, department_id, predicted_grade),
+    INDEX idx_model_faculty (model, faculty_id, predicted_grade),
+    INDEX idx_student (student_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ETL generations: one row per warehouse load swapped in by the ETL (blue/green *_next tables)
+CREATE TABLE IF NOT EXISTS etl_generation (
+    generation VARCHAR(20) PRIMARY KEY,
+    swapped_at DATETIME NOT NULL
+) ENGINE=InnoDB;
+
 -- Insert default semester data
 INSERT INTO dim_semester (semester_id, semester_name, academic_year) VALUES
 (1, 'Fall 2023', '2023-2024'),
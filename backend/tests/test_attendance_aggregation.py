@@ -0,0 +1,58 @@
+"""aggregate_attendance() must give the same result with method='groupby' and method='bincount'"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl_pipeline import aggregate_attendance
+
+
+def _attendance(n_rows=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        # String keys with NULLs; 'S10' sorts before 'S2'
+        'student_id': rng.choice(['S1', 'S2', 'S10', 'S11', None], n_rows),
+        # Category key with a category that never occurs
+        'course_code': pd.Categorical(rng.choice(['CS101', 'BA201', 'ED110'], n_rows),
+                                      categories=['BA201', 'CS101', 'ED110', 'LAW100']),
+        'date_key': rng.choice([20240108, 20240115, 20240122, np.nan], n_rows),
+        'hours_attended': np.round(rng.rand(n_rows) * 3, 2),
+        'Status': rng.choice(['Present', 'Absent', 'Late', None], n_rows),
+    })
+
+
+@pytest.mark.parametrize('status_col', ['Status', 'status', None])
+def test_groupby_and_bincount_agree(status_col):
+    attendance = _attendance()
+    if status_col is None:
+        attendance = attendance.drop(columns='Status')
+    elif status_col != 'Status':
+        attendance = attendance.rename(columns={'Status': status_col})
+
+    by_groupby = aggregate_attendance(attendance, method='groupby')
+    by_bincount = aggregate_attendance(attendance, method='bincount')
+    pd.testing.assert_frame_equal(by_groupby, by_bincount)
+
+
+def test_rows_with_missing_keys_are_dropped():
+    result = aggregate_attendance(_attendance(), method='bincount')
+    assert not result[['student_id', 'course_code', 'date_key']].isna().any().any()
+    assert 'LAW100' not in set(result['course_code'])
+
+
+def test_days_present_counts_present_rows():
+    attendance = pd.DataFrame({
+        'student_id': ['S1', 'S1', 'S1', 'S2'],
+        'course_code': ['CS101'] * 4,
+        'date_key': [20240108] * 4,
+        'hours_attended': [1.5, 2.0, 0.0, 1.0],
+        'Status': ['Present', 'Present', 'Absent', None],
+    })
+    for method in ('groupby', 'bincount'):
+        result = aggregate_attendance(attendance, method=method)
+        assert result['total_hours'].tolist() == [3.5, 1.0]
+        assert result['days_present'].tolist() == [2, 0]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        aggregate_attendance(_attendance(10), method='hash')
@@ -0,0 +1,70 @@
+"""load_to_warehouse() must swap the *_next shadow tables it loaded into place"""
+from unittest import mock
+
+import pytest
+
+import etl_pipeline
+from etl_pipeline import ETLPipeline, WAREHOUSE_TABLES, SHADOW_SUFFIX, OLD_SUFFIX
+
+
+class FakeConnection:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+    def commit(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self):
+        self.statements = []
+
+    def connect(self):
+        return FakeConnection(self.statements)
+
+    def dispose(self):
+        pass
+
+
+def _load(live_tables):
+    pipeline = ETLPipeline()
+    engine = FakeEngine()
+    with mock.patch.object(etl_pipeline, 'create_engine', return_value=engine), \
+            mock.patch.object(etl_pipeline, 'GOLD_PUBLISH_ENABLED', False), \
+            mock.patch.object(ETLPipeline, 'create_data_warehouse'), \
+            mock.patch.object(ETLPipeline, '_drop_stale_tables'), \
+            mock.patch.object(ETLPipeline, '_create_dimensions', return_value={}), \
+            mock.patch.object(ETLPipeline, '_populate_time_dimension'), \
+            mock.patch.object(ETLPipeline, '_create_facts', return_value={}), \
+            mock.patch.object(ETLPipeline, '_purge_prediction_cache'), \
+            mock.patch.object(ETLPipeline, '_live_tables', return_value=set(live_tables)):
+        pipeline.load_to_warehouse({})
+    return pipeline, [s for s in engine.statements if s.startswith('RENAME TABLE')]
+
+
+def test_first_load_renames_shadow_tables_into_place():
+    pipeline, renames = _load(f"{t}{SHADOW_SUFFIX}" for t in WAREHOUSE_TABLES)
+    assert pipeline.table_suffix == ''
+    assert renames == ["RENAME TABLE " + ", ".join(f"{t}{SHADOW_SUFFIX} TO {t}" for t in WAREHOUSE_TABLES)]
+
+
+def test_reload_retires_live_tables_and_swaps_in_shadow_tables():
+    live = set(WAREHOUSE_TABLES) | {f"{t}{SHADOW_SUFFIX}" for t in WAREHOUSE_TABLES}
+    _, renames = _load(live)
+    expected = [f"{t} TO {t}{OLD_SUFFIX}" for t in WAREHOUSE_TABLES]
+    expected += [f"{t}{SHADOW_SUFFIX} TO {t}" for t in WAREHOUSE_TABLES]
+    assert renames == ["RENAME TABLE " + ", ".join(expected)]
+
+
+def test_missing_shadow_table_aborts_the_swap():
+    with pytest.raises(RuntimeError, match="Shadow tables missing"):
+        _load(f"{t}{SHADOW_SUFFIX}" for t in WAREHOUSE_TABLES[1:])
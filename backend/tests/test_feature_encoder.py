@@ -0,0 +1,52 @@
+"""CompiledFeatureEncoder.transform() must equal MultiModelPredictor.encode_features() row by row"""
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from feature_encoder import CompiledFeatureEncoder
+from ml_models import MultiModelPredictor
+
+FEATURE_COLS = ['gender', 'program', 'attendance_rate', 'total_credits', 'age']
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    predictor = MultiModelPredictor()
+    predictor.feature_cols = FEATURE_COLS
+    # 'program' was trained with an 'Unknown' category, 'gender' was not
+    predictor.label_encoders = {
+        'gender': LabelEncoder().fit(['F', 'M']),
+        'program': LabelEncoder().fit(['BSc CS', 'BBA', 'Unknown']),
+    }
+    rng = np.random.RandomState(0)
+    predictor.scaler = StandardScaler().fit(rng.normal(size=(50, len(FEATURE_COLS))))
+    predictor.feature_encoder = CompiledFeatureEncoder(FEATURE_COLS, predictor.label_encoders, predictor.scaler)
+    return predictor
+
+
+ROWS = {
+    'known': {'gender': 'F', 'program': 'BBA', 'attendance_rate': 0.9, 'total_credits': 30, 'age': 21},
+    'none': {'gender': None, 'program': None, 'attendance_rate': None, 'total_credits': None, 'age': None},
+    'nan': {'gender': np.nan, 'program': np.nan, 'attendance_rate': np.nan, 'total_credits': 30, 'age': 22},
+    'unseen': {'gender': 'X', 'program': 'BSc Nursing', 'attendance_rate': 0.5, 'total_credits': 12, 'age': 30},
+    'decimal': {'gender': 'M', 'program': 'BSc CS', 'attendance_rate': Decimal('0.875'),
+                'total_credits': Decimal('45'), 'age': 19},
+    'non_numeric': {'gender': 'M', 'program': 'BBA', 'attendance_rate': 'M', 'total_credits': 'n/a', 'age': 20},
+    'missing_columns': {'gender': 'F', 'attendance_rate': 0.7},
+}
+
+
+@pytest.mark.parametrize('name', list(ROWS))
+def test_transform_matches_encode_features(predictor, name):
+    row = ROWS[name]
+    expected = predictor.encode_features(pd.DataFrame([row]))
+    np.testing.assert_array_equal(predictor.feature_encoder.transform(row), expected)
+
+
+def test_unseen_categories_get_the_unknown_code(predictor):
+    encoded = predictor.feature_encoder.encode(ROWS['unseen'])
+    assert encoded[0] == -1.0
+    assert encoded[1] == float(list(predictor.label_encoders['program'].classes_).index('Unknown'))
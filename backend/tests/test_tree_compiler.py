@@ -0,0 +1,76 @@
+"""Compiled tree ensembles must predict exactly what scikit-learn predicts"""
+import numpy as np
+import pytest
+from sklearn.datasets import make_regression
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+
+from tree_compiler import PREDICT_CHUNK_ROWS, compile_tree_ensemble, predict_with
+
+N_FEATURES = 8
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_regression(n_samples=600, n_features=N_FEATURES, noise=10.0, random_state=0)
+    return X, y
+
+
+MODELS = {
+    'random_forest': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0),
+    'gradient_boosting_zero_init': lambda: GradientBoostingRegressor(n_estimators=30, init='zero', random_state=0),
+    'gradient_boosting_huber_subsample': lambda: GradientBoostingRegressor(
+        n_estimators=30, loss='huber', subsample=0.7, random_state=0),
+}
+
+
+@pytest.fixture(scope='module', params=list(MODELS))
+def fitted(request, data):
+    X, y = data
+    return MODELS[request.param]().fit(X, y)
+
+
+def test_matches_sklearn(fitted, data):
+    X, _ = data
+    compiled = compile_tree_ensemble(fitted)
+    np.testing.assert_array_equal(compiled.predict(X), fitted.predict(X))
+
+
+def test_single_row_matches_sklearn(fitted, data):
+    X, _ = data
+    compiled = compile_tree_ensemble(fitted)
+    for row in X[:20]:
+        np.testing.assert_array_equal(compiled.predict(row.reshape(1, -1)), fitted.predict(row.reshape(1, -1)))
+
+
+def test_chunked_rows_match_sklearn(fitted):
+    X = np.random.RandomState(1).normal(size=(2 * PREDICT_CHUNK_ROWS + 17, N_FEATURES))
+    compiled = compile_tree_ensemble(fitted)
+    np.testing.assert_array_equal(compiled.predict(X), fitted.predict(X))
+
+
+def test_other_models_are_not_compiled(data):
+    X, y = data
+    assert compile_tree_ensemble(LinearRegression().fit(X, y)) is None
+
+
+def test_rows_with_nan_fall_back_to_sklearn(data):
+    X, y = data
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    compiled = compile_tree_ensemble(model)
+    X_nan = X[:3].copy()
+    X_nan[1, 2] = np.nan
+
+    class Recorder:
+        seen = None
+
+        def predict(self, X):
+            self.seen = X
+            return np.zeros(len(X))
+
+    fallback = Recorder()
+    np.testing.assert_array_equal(predict_with(fallback, compiled, X[:3]), model.predict(X[:3]))
+    assert fallback.seen is None
+    predict_with(fallback, compiled, X_nan)
+    assert fallback.seen is X_nan
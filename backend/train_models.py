@@ -1,18 +1,29 @@
-"""Script to train all prediction models"""
+"""Script to train all prediction models
+
+    python train_models.py                  # train everything from scratch
+    python train_models.py --incremental    # update the models with the students that changed
+    python train_models.py --tune           # search hyperparameters before training (model_tuning.py)
+"""
+import argparse
 import sys
+import time
 from pathlib import Path
 backend_dir = Path(__file__).parent
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
+from config import RETRAIN_DRIFT_THRESHOLD, TUNE_ON_RETRAIN
 from enhanced_predictions import EnhancedPredictor
-from ml_models import MultiModelPredictor
+from ml_models import MultiModelPredictor, cpu_seconds, record_training_run
+from prediction_cache import prediction_cache
 
-def train_all_models():
-    """Train all prediction models"""
+def train_all_models(incremental=False, drift_threshold=RETRAIN_DRIFT_THRESHOLD, tune=TUNE_ON_RETRAIN):
+    """Train all prediction models. With incremental, the standard models are updated from the
+    last training snapshot and the enhanced models are only retrained when the standard ones were."""
     print("=" * 80)
-    print("TRAINING ALL PREDICTION MODELS")
+    print("UPDATING PREDICTION MODELS" if incremental else "TRAINING ALL PREDICTION MODELS")
     print("=" * 80)
+    retrained = True
     
     # Train standard models
     print("\n" + "=" * 80)
@@ -20,7 +31,11 @@ def train_all_models():
     print("=" * 80)
     try:
         standard_predictor = MultiModelPredictor()
-        standard_results = standard_predictor.train_all_models(use_grid_search=False)
+        if incremental:
+            standard_results = standard_predictor.train_incremental(drift_threshold=drift_threshold)
+            retrained = bool(standard_results)
+        else:
+            standard_results = standard_predictor.train_all_models(tune=tune)
         print("\nStandard Models Training Results:")
         for model_name, metrics in standard_results.items():
             print(f"  {model_name}: R²={metrics['r2']:.4f}, RMSE={metrics['rmse']:.2f}, MAE={metrics['mae']:.2f}")
@@ -29,13 +44,20 @@ def train_all_models():
         import traceback
         traceback.print_exc()
     
+    if not retrained:
+        print("\nWarehouse data barely changed since the last training; nothing retrained.")
+        return
+    
     # Train enhanced models
     print("\n" + "=" * 80)
     print("2. TRAINING ENHANCED MODELS (Tuition-Attendance, Enrollment, etc.)")
     print("=" * 80)
     try:
+        started, cpu_started = time.time(), cpu_seconds()
         enhanced_predictor = EnhancedPredictor()
         enhanced_results = enhanced_predictor.train_all_models()
+        record_training_run(enhanced_predictor.model_path, {'mode': 'full', 'models': 'enhanced'},
+                            started, cpu_started)
         print("\nEnhanced Models Training Results:")
         for model_name, metrics in enhanced_results.items():
             print(f"  {model_name}: {metrics}")
@@ -44,6 +66,16 @@ def train_all_models():
         import traceback
         traceback.print_exc()
     
+    # Servers key cached predictions by model version; this also empties the shared table
+    prediction_cache.invalidate()
+    
+    # Re-score every student with the new models (fact_prediction)
+    try:
+        from risk_scoring import run_risk_scoring
+        run_risk_scoring()
+    except Exception as e:
+        print(f"Error scoring students: {e}")
+    
     print("\n" + "=" * 80)
     print("TRAINING COMPLETE!")
     print("=" * 80)
@@ -53,5 +85,13 @@ def train_all_models():
     print("  - /api/predictions/scenario (scenario analysis)")
 
 if __name__ == "__main__":
-    train_all_models()
+    parser = argparse.ArgumentParser(description="Train the prediction models")
+    parser.add_argument('--incremental', action='store_true',
+                        help="update the models with the students whose features changed since the last training")
+    parser.add_argument('--drift-threshold', type=float, default=RETRAIN_DRIFT_THRESHOLD,
+                        help="fraction of changed students below which --incremental retrains nothing")
+    parser.add_argument('--tune', action='store_true', default=TUNE_ON_RETRAIN,
+                        help="search the random forest and gradient boosting hyperparameters before training")
+    args = parser.parse_args()
+    train_all_models(incremental=args.incremental, drift_threshold=args.drift_threshold, tune=args.tune)
 
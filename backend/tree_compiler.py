@@ -0,0 +1,159 @@
+"""
+Tree Ensemble Compiler
+Flattens fitted RandomForestRegressor and GradientBoostingRegressor models into
+contiguous NumPy arrays (feature, threshold, child pointers, leaf value) and
+evaluates every tree of the ensemble at once with a vectorized traversal.
+
+scikit-learn's predict() validates its input and dispatches tree by tree, which
+costs milliseconds for a single row; the compiled ensemble skips that and is used
+by the interactive /predict and /scenario paths. Outputs match scikit-learn:
+rows are compared as float32 against the float64 thresholds, and leaf values are
+summed in estimator order exactly as RandomForestRegressor (single job) and
+GradientBoostingRegressor do.
+"""
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+# Rows evaluated together; bounds the (rows x trees) working arrays of a batch
+PREDICT_CHUNK_ROWS = 2048
+
+TREE_LEAF = -1
+
+
+class CompiledTreeEnsemble:
+    """Array-backed regression tree ensemble: prediction = base + sum(leaf values) / divisor.
+    children holds (right, left) per node, so a step is children[2 * node + went_left]."""
+
+    def __init__(self, feature, threshold, children, value, roots, depth, n_features,
+                 base=0.0, divisor=1.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.n_features = n_features
+        self.base = base
+        self.divisor = divisor
+
+    @classmethod
+    def from_trees(cls, trees, n_features, value_scale=1.0, base=0.0, divisor=1.0):
+        """Concatenate fitted sklearn Tree objects into one set of node arrays.
+        Leaves point at themselves, so every row can take the same number of steps."""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        depth = 0
+        for tree in trees:
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == TREE_LEAF
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            pairs = np.empty(2 * tree.node_count, dtype=np.int32)
+            pairs[0::2] = np.where(is_leaf, node_ids, tree.children_right) + offset
+            pairs[1::2] = np.where(is_leaf, node_ids, tree.children_left) + offset
+            children.append(pairs)
+            # Same double product as sklearn's predict_stages (scale * value)
+            values.append(value_scale * tree.value[:, 0, 0] if value_scale != 1.0 else tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            depth=depth,
+            n_features=n_features,
+            base=base,
+            divisor=divisor,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value, self.roots))
+
+    def _predict_chunk(self, X):
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        # One slot per (row, tree); row_start locates the row's features in flat_X
+        nodes = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows) * self.n_features, self.n_trees) if n_rows > 1 else None
+        for _ in range(self.depth):
+            feature = self.feature.take(nodes)
+            if row_start is not None:
+                feature += row_start
+            went_left = flat_X.take(feature) <= self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + went_left)
+        leaf_values = self.value.take(nodes).reshape(n_rows, self.n_trees)
+        if self.base != 0.0:
+            leaf_values = np.concatenate([np.full((n_rows, 1), self.base), leaf_values], axis=1)
+        # cumsum adds strictly left to right, like the estimators' own loops
+        total = np.cumsum(leaf_values, axis=1)[:, -1]
+        return total / self.divisor if self.divisor != 1.0 else total
+
+    def predict(self, X):
+        """Predict a 2-D array of already-scaled features"""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[-1]} features, but the model expects {self.n_features}")
+        if X.shape[0] <= PREDICT_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([self._predict_chunk(X[start:start + PREDICT_CHUNK_ROWS])
+                               for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS)])
+
+
+def compile_tree_ensemble(model):
+    """CompiledTreeEnsemble for a fitted single-output RandomForestRegressor or
+    GradientBoostingRegressor; None for any other model (it keeps using sklearn)"""
+    if isinstance(model, RandomForestRegressor) and getattr(model, 'n_outputs_', 1) == 1:
+        return CompiledTreeEnsemble.from_trees(
+            [estimator.tree_ for estimator in model.estimators_],
+            n_features=model.n_features_in_,
+            divisor=float(len(model.estimators_)),
+        )
+    if isinstance(model, GradientBoostingRegressor):
+        if isinstance(model.init_, str) and model.init_ == 'zero':
+            base = 0.0
+        elif isinstance(model.init_, DummyRegressor):
+            base = float(np.ravel(model.init_.constant_)[0])
+        else:
+            # Any other init estimator varies per row; not worth compiling
+            return None
+        return CompiledTreeEnsemble.from_trees(
+            [estimator.tree_ for estimator in model.estimators_[:, 0]],
+            n_features=model.n_features_in_,
+            value_scale=model.learning_rate,
+            base=base,
+        )
+    return None
+
+
+def compile_models(models):
+    """{name: CompiledTreeEnsemble} for every compilable model in {name: estimator}"""
+    compiled = {}
+    for name, model in models.items():
+        if model is None:
+            continue
+        try:
+            ensemble = compile_tree_ensemble(model)
+        except Exception as e:
+            print(f"Could not compile {name}: {e}")
+            continue
+        if ensemble is not None:
+            compiled[name] = ensemble
+    return compiled
+
+
+def predict_with(model, compiled, X):
+    """Predict with the compiled ensemble when there is one, else with the sklearn model.
+    Rows with missing values always go through sklearn."""
+    if compiled is not None and not np.isnan(X).any():
+        return compiled.predict(X)
+    return model.predict(X)
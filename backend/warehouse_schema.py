@@ -0,0 +1,277 @@
+"""
+Warehouse Fact Table Schema
+Columns, primary keys, secondary indexes and foreign keys of the fact tables.
+The ETL creates each fact with only its primary key, bulk-inserts, and then adds
+the secondary indexes and foreign keys in one ALTER TABLE per table, so InnoDB
+builds them once instead of maintaining them row by row during the load.
+Optionally the large, date-driven facts are RANGE COLUMNS-partitioned on date_key
+by calendar year or UCU semester (see WAREHOUSE_PARTITIONING in config.py).
+Facts reference the dimensions through integer keys: date_key is the INT yyyymmdd
+date and student_key/course_key are surrogate keys; the natural student_id and
+course_code stay on dim_student and dim_course.
+"""
+
+TABLE_OPTIONS = "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+
+FACT_SCHEMAS = {
+    'fact_enrollment': {
+        'columns': [
+            ('enrollment_id', 'VARCHAR(20)'),
+            ('student_key', 'INT'),
+            ('course_key', 'INT'),
+            ('date_key', 'INT'),
+            ('semester_id', 'INT'),
+            ('status', 'VARCHAR(20)'),
+        ],
+        'primary_key': ['enrollment_id'],
+        'indexes': {
+            'idx_student': ['student_key'],
+            'idx_course': ['course_key'],
+            'idx_date': ['date_key'],
+            'idx_semester': ['semester_id'],
+        },
+        'foreign_keys': [
+            ('student_key', 'dim_student', 'student_key'),
+            ('course_key', 'dim_course', 'course_key'),
+            ('date_key', 'dim_time', 'date_key'),
+            ('semester_id', 'dim_semester', 'semester_id'),
+        ],
+    },
+    'fact_attendance': {
+        'columns': [
+            ('attendance_id', 'INT AUTO_INCREMENT'),
+            ('student_key', 'INT'),
+            ('course_key', 'INT'),
+            ('date_key', 'INT'),
+            ('total_hours', 'DECIMAL(10,2)'),
+            ('days_present', 'INT'),
+        ],
+        'primary_key': ['attendance_id'],
+        'indexes': {
+            'idx_student': ['student_key'],
+            'idx_course': ['course_key'],
+            'idx_date': ['date_key'],
+        },
+        'foreign_keys': [
+            ('student_key', 'dim_student', 'student_key'),
+            ('course_key', 'dim_course', 'course_key'),
+            ('date_key', 'dim_time', 'date_key'),
+        ],
+    },
+    'fact_payment': {
+        'columns': [
+            ('payment_id', 'VARCHAR(20)'),
+            ('student_key', 'INT'),
+            ('date_key', 'INT'),
+            ('semester_id', 'INT'),
+            ('year', 'INT'),
+            ('tuition_national', 'DECIMAL(15,2)'),
+            ('tuition_international', 'DECIMAL(15,2)'),
+            ('functional_fees', 'DECIMAL(15,2)'),
+            ('amount', 'DECIMAL(15,2)'),
+            ('payment_method', 'VARCHAR(50)'),
+            ('status', 'VARCHAR(20)'),
+            ('student_type', "VARCHAR(20) DEFAULT 'national'"),
+            ('payment_timestamp', 'DATETIME'),
+            ('semester_start_date', 'DATE'),
+            ('deadline_met', 'BOOLEAN DEFAULT FALSE'),
+            ('deadline_type', 'VARCHAR(50)'),
+            ('weeks_from_deadline', 'DECIMAL(5,2)'),
+            ('late_penalty', 'DECIMAL(15,2) DEFAULT 0'),
+        ],
+        'primary_key': ['payment_id'],
+        'indexes': {
+            'idx_student': ['student_key'],
+            'idx_date': ['date_key'],
+            'idx_semester': ['semester_id'],
+            'idx_year': ['year'],
+            'idx_status': ['status'],
+            'idx_payment_timestamp': ['payment_timestamp'],
+            'idx_deadline_met': ['deadline_met'],
+            'idx_deadline_type': ['deadline_type'],
+        },
+        'foreign_keys': [
+            ('student_key', 'dim_student', 'student_key'),
+            ('date_key', 'dim_time', 'date_key'),
+            ('semester_id', 'dim_semester', 'semester_id'),
+        ],
+    },
+    'fact_grade': {
+        'columns': [
+            ('grade_id', 'VARCHAR(20)'),
+            ('student_key', 'INT'),
+            ('course_key', 'INT'),
+            ('date_key', 'INT'),
+            ('semester_id', 'INT'),
+            ('coursework_score', 'DECIMAL(5,2) NOT NULL'),
+            ('exam_score', 'DECIMAL(5,2)'),
+            ('grade', 'DECIMAL(5,2) NOT NULL'),
+            ('letter_grade', 'VARCHAR(5) NOT NULL'),
+            ('fcw', 'BOOLEAN DEFAULT FALSE'),
+            ('exam_status', 'VARCHAR(10)'),
+            ('absence_reason', 'VARCHAR(200)'),
+        ],
+        'primary_key': ['grade_id'],
+        'indexes': {
+            'idx_student': ['student_key'],
+            'idx_course': ['course_key'],
+            'idx_date': ['date_key'],
+            'idx_semester': ['semester_id'],
+            'idx_grade': ['grade'],
+        },
+        'foreign_keys': [
+            ('student_key', 'dim_student', 'student_key'),
+            ('course_key', 'dim_course', 'course_key'),
+            ('date_key', 'dim_time', 'date_key'),
+            ('semester_id', 'dim_semester', 'semester_id'),
+        ],
+    },
+}
+
+# Composite/covering indexes derived from the captured dashboard workload (see index_advisor.py).
+# Bump WORKLOAD_INDEX_VERSION whenever this set changes; every load applies the current set.
+WORKLOAD_INDEX_VERSION = 2
+WORKLOAD_INDEXES = {
+    'fact_grade': {
+        # WHERE exam_status = ? with AVG(grade)/COUNT and per-student grouping (stats, top students, MEX/FEX)
+        'idx_wk_status_student_grade': ['exam_status', 'student_key', 'grade'],
+        # Per-student/course aggregates and joins from dim_student (analytics, predictions)
+        'idx_wk_student_course_status': ['student_key', 'course_key', 'exam_status', 'grade'],
+        # Grade distribution by semester
+        'idx_wk_semester_letter': ['semester_id', 'letter_grade'],
+        # Quarterly trends joined through dim_time
+        'idx_wk_date_status_grade': ['date_key', 'exam_status', 'grade'],
+    },
+    'fact_payment': {
+        # WHERE status = ? [AND year = ?] with SUM(amount)
+        'idx_wk_status_year_amount': ['status', 'year', 'amount'],
+        # Payment status per semester and per-student payment totals
+        'idx_wk_semester_status': ['semester_id', 'status'],
+        'idx_wk_student_status_amount': ['student_key', 'status', 'amount'],
+        # Quarterly payment trends joined through dim_time
+        'idx_wk_date_status_amount': ['date_key', 'status', 'amount'],
+    },
+    'fact_attendance': {
+        # Attendance by course and quarterly trends, covered without touching the rows
+        'idx_wk_course_hours': ['course_key', 'total_hours', 'days_present'],
+        'idx_wk_date_hours': ['date_key', 'total_hours', 'days_present'],
+        'idx_wk_student_hours': ['student_key', 'total_hours', 'days_present'],
+    },
+    'fact_enrollment': {
+        'idx_wk_student_course': ['student_key', 'course_key'],
+        'idx_wk_course_student': ['course_key', 'student_key'],
+    },
+}
+
+
+def _same_name(name):
+    return name
+
+
+# Facts that can be RANGE-partitioned on date_key. MySQL requires the partitioning column in
+# every unique key and does not support foreign keys on partitioned InnoDB tables, so when
+# partitioned these facts get (primary key, date_key) as primary key and no foreign keys;
+# the ETL enforces their referential integrity before loading (quarantining orphans).
+PARTITIONED_FACTS = ['fact_attendance', 'fact_payment', 'fact_grade']
+PARTITION_COLUMN = 'date_key'
+# UCU semesters start in January (Easter), May (Trinity) and September (Advent)
+SEMESTER_START_MONTHS = (1, 5, 9)
+
+
+def partition_bounds(first_year, last_year, granularity='year'):
+    """[(partition name, exclusive upper date_key)] covering first_year..last_year
+
+    granularity='year' gives one partition per calendar year, 'semester' one per UCU semester.
+    """
+    if granularity not in ('year', 'semester'):
+        raise ValueError(f"Unknown partition granularity: {granularity}")
+    bounds = []
+    for year in range(first_year, last_year + 1):
+        if granularity == 'year':
+            bounds.append((f"p{year}", (year + 1) * 10000 + 101))
+            continue
+        next_starts = list(SEMESTER_START_MONTHS[1:]) + [None]
+        for number, next_month in enumerate(next_starts, start=1):
+            upper = year * 10000 + next_month * 100 + 1 if next_month else (year + 1) * 10000 + 101
+            bounds.append((f"p{year}_s{number}", upper))
+    return bounds
+
+
+def partition_for(date_key, bounds):
+    """Name of the partition holding date_key ('pmax' beyond the last bound)"""
+    for name, upper in bounds:
+        if date_key < upper:
+            return name
+    return 'pmax'
+
+
+def _partition_definitions(bounds):
+    definitions = [f"PARTITION {name} VALUES LESS THAN ({upper})" for name, upper in bounds]
+    return definitions + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+
+
+def partition_clause(bounds):
+    """PARTITION BY clause for a fact; rows older than the first bound land in the first partition"""
+    return (f"PARTITION BY RANGE COLUMNS({PARTITION_COLUMN}) (\n    "
+            + ',\n    '.join(_partition_definitions(bounds)) + "\n)")
+
+
+def split_pmax_sql(table, bounds, resolve=_same_name):
+    """Carve new partitions for bounds out of the catch-all pmax partition"""
+    definitions = ', '.join(_partition_definitions(bounds))
+    return f"ALTER TABLE {resolve(table)} REORGANIZE PARTITION pmax INTO ({definitions})"
+
+
+def table_indexes(table):
+    """Base secondary indexes of a fact plus the current workload index set"""
+    return {**FACT_SCHEMAS[table]['indexes'], **WORKLOAD_INDEXES.get(table, {})}
+
+
+def _index_clauses(table):
+    return [f"INDEX {name} ({', '.join(columns)})" for name, columns in table_indexes(table).items()]
+
+
+def _foreign_key_clauses(schema, resolve):
+    return [
+        f"FOREIGN KEY ({column}) REFERENCES {resolve(parent)}({parent_column}) ON DELETE CASCADE"
+        for column, parent, parent_column in schema['foreign_keys']
+    ]
+
+
+def primary_key(table, partitioned=False):
+    """Primary key columns of a fact; partitioned tables must include the partitioning column"""
+    columns = list(FACT_SCHEMAS[table]['primary_key'])
+    if partitioned and PARTITION_COLUMN not in columns:
+        columns.append(PARTITION_COLUMN)
+    return columns
+
+
+def create_table_sql(table, resolve=_same_name, deferred=True, partitions=None):
+    """CREATE TABLE for a fact; with deferred=True only the primary key is declared
+
+    resolve maps a logical table name to the physical one (e.g. the *_next shadow table).
+    partitions (from partition_bounds) RANGE-partitions the table on date_key.
+    """
+    schema = FACT_SCHEMAS[table]
+    partitioned = partitions is not None
+    clauses = [f"{column} {definition}" for column, definition in schema['columns']]
+    clauses.append(f"PRIMARY KEY ({', '.join(primary_key(table, partitioned))})")
+    if not deferred:
+        if not partitioned:
+            clauses += _foreign_key_clauses(schema, resolve)
+        clauses += _index_clauses(table)
+    body = ',\n    '.join(clauses)
+    sql = f"CREATE TABLE {resolve(table)} (\n    {body}\n) {TABLE_OPTIONS}"
+    if partitioned:
+        sql += "\n" + partition_clause(partitions)
+    return sql
+
+
+def add_constraints_sql(table, resolve=_same_name, partitioned=False):
+    """Single ALTER TABLE adding every secondary index (and, unless partitioned, foreign key) of a fact"""
+    schema = FACT_SCHEMAS[table]
+    foreign_keys = [] if partitioned else _foreign_key_clauses(schema, resolve)
+    clauses = [f"ADD {clause}" for clause in _index_clauses(table) + foreign_keys]
+    if not clauses:
+        return None
+    return f"ALTER TABLE {resolve(table)}\n    " + ',\n    '.join(clauses)